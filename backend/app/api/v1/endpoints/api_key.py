@@ -14,7 +14,13 @@ from app.schemas.api_key import (
     ApiKeyPickResponse,
     ApiKeyUpdate,
 )
-from app.services.api_key_pool import masked_out, pick_api_key
+from app.services.api_key_pool import (
+    get_key_health,
+    invalidate_key_ring,
+    masked_out,
+    pick_api_key,
+    reset_key_health,
+)
 from app.services.user_service import is_admin
 
 router = APIRouter()
@@ -42,6 +48,7 @@ def create_api_key(
     db.add(row)
     db.commit()
     db.refresh(row)
+    invalidate_key_ring(row.provider)
 
     out = ApiKeyOut.model_validate(row)
     out.key_masked = masked_out(row)
@@ -70,10 +77,12 @@ def list_api_keys(
         q = q.filter(ApiKey.provider == prov)
     rows = q.order_by(ApiKey.provider.asc(), ApiKey.id.asc()).all()
 
+    health = get_key_health([r.id for r in rows])
     items: list[ApiKeyOut] = []
     for r in rows:
         out = ApiKeyOut.model_validate(r)
         out.key_masked = masked_out(r)
+        out.health = health.get(r.id)
         items.append(out)
 
     return ApiKeyListResponse(total=len(items), items=items)
@@ -90,13 +99,17 @@ def update_api_key(
     if not row:
         raise HTTPException(status_code=404, detail="API Key 不存在")
 
+    # 中文说明：更换密钥或重新启用后，旧的失败计数/熔断状态不再适用，需要一并清除
+    reset_health = False
     if payload.name is not None:
         row.name = payload.name
     if payload.key is not None:
         if not payload.key.strip():
             raise HTTPException(status_code=400, detail="key 不能为空")
+        reset_health = reset_health or row.key != payload.key.strip()
         row.key = payload.key.strip()
     if payload.is_active is not None:
+        reset_health = reset_health or (bool(payload.is_active) and not row.is_active)
         row.is_active = bool(payload.is_active)
 
     if payload.extra is not None:
@@ -105,9 +118,13 @@ def update_api_key(
     db.add(row)
     db.commit()
     db.refresh(row)
+    invalidate_key_ring(row.provider)
+    if reset_health:
+        reset_key_health(row.id)
 
     out = ApiKeyOut.model_validate(row)
     out.key_masked = masked_out(row)
+    out.health = get_key_health([row.id]).get(row.id)
     return out
 
 
@@ -120,8 +137,11 @@ def delete_api_key(
     row = db.query(ApiKey).filter(ApiKey.id == key_id).first()
     if not row:
         raise HTTPException(status_code=404, detail="API Key 不存在")
+    provider = row.provider
     db.delete(row)
     db.commit()
+    invalidate_key_ring(provider)
+    reset_key_health(key_id)
     return {"ok": True}
 
 
@@ -135,7 +155,8 @@ def pick_one(
     if not provider:
         raise HTTPException(status_code=400, detail="provider 不能为空")
 
-    k = pick_api_key(db, provider, mark_used=True)
+    # 中文说明：接口只返回 key，调用结果不会回报，因此不占用半开探测名额
+    k = pick_api_key(db, provider, mark_used=True, probe=False)
     if not k:
         raise HTTPException(status_code=404, detail=f"未找到可用 key: {provider}")
 
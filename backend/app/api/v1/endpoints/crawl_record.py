@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import base64
 from datetime import datetime, timedelta
 import hashlib
 import os
@@ -8,12 +9,13 @@ from typing import Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import desc
+from sqlalchemy import and_, desc, func, or_
 from bs4 import BeautifulSoup
 
 from app import deps
+from app.core.config import get_settings
 from app.models.datasource import DataSource
-from app.models.datasource_content import DataSourceContent
+from app.models.datasource_content import CONTENT_PREVIEW_MAX_LEN, DataSourceContent, build_content_preview
 from app.models.user import User
 from app.schemas.crawl_record import (
     CrawlRecordDetailOut,
@@ -26,25 +28,16 @@ from app.schemas.crawl_record import (
     CrawlRecordQuickFetchPreviewRequest,
     CrawlRecordQuickFetchPreviewResponse,
 )
-from app.services.api_key_pool import pick_api_key
+from app.services.api_key_pool import PickedKey, pick_api_key
 from app.services.crawler import apply_parser, get_crawler_by_engine
 from app.services.readability_extractor import extract_main_text
 from app.services.text_cleaner import clean_text
+from app.services.ttl_cache import cache_get_json, cache_key, cache_set_json
 from app.services.user_service import is_admin
 
 router = APIRouter()
 
 
-def _build_preview(content: str, max_len: int = 200) -> str:
-    """构建内容预览：去掉多余空白并截断，避免列表接口返回超长文本。"""
-    if content is None:
-        return ""
-    text = content.strip().replace("\r\n", "\n").replace("\r", "\n")
-    if len(text) <= max_len:
-        return text
-    return text[:max_len] + "..."
-
-
 def _apply_css_selector_text(raw_html: str, css_selector: str) -> str:
     sel = (css_selector or "").strip()
     if not sel:
@@ -146,18 +139,34 @@ def _build_extract_items(
     return items
 
 
-def _resolve_firecrawl_key(db: Session) -> tuple[Optional[str], Optional[str]]:
+def _resolve_firecrawl_key(db: Session) -> tuple[Optional[str], Optional[str], Optional[PickedKey]]:
     # 优先环境变量（兼容旧部署）；否则从 API Key 池轮询
+    # 中文说明：来自 API Key 池时一并返回该 key，抓取器据其 id/extra 上报健康度并按 key 限流
     key = os.getenv("FIRECRAWL_API_KEY")
     base = os.getenv("FIRECRAWL_API_BASE")
     if key:
-        return key, base
+        return key, base, None
     ak = pick_api_key(db, "firecrawl", mark_used=True)
     if not ak:
-        return None, base
+        return None, base, None
     extra = ak.extra if isinstance(ak.extra, dict) else {}
     api_base = extra.get("api_base") if isinstance(extra, dict) else None
-    return ak.key, (str(api_base).strip() if api_base else base)
+    return ak.key, (str(api_base).strip() if api_base else base), ak
+
+
+def _encode_cursor(fetched_at: datetime, record_id: int) -> str:
+    raw = f"{fetched_at.isoformat()}|{int(record_id)}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8")
+        ts, rid = raw.rsplit("|", 1)
+        return datetime.fromisoformat(ts), int(rid)
+    except Exception:
+        raise HTTPException(status_code=400, detail="cursor 无效")
 
 
 @router.get("/", response_model=CrawlRecordListResponse, summary="抓取记录列表")
@@ -166,16 +175,17 @@ def list_crawl_records(
     start_date: Optional[str] = Query(None, description="开始日期，YYYY-MM-DD"),
     end_date: Optional[str] = Query(None, description="结束日期，YYYY-MM-DD"),
     limit: int = Query(20, ge=1, le=200, description="分页大小"),
-    offset: int = Query(0, ge=0, description="偏移量"),
+    offset: int = Query(0, ge=0, description="偏移量（兼容跳页；顺序翻页请使用 cursor）"),
+    cursor: Optional[str] = Query(None, description="游标：上一页返回的 next_cursor；传入后忽略 offset"),
     db: Session = Depends(deps.get_db),
     current_user: User = Depends(deps.require_user),
 ) -> CrawlRecordListResponse:
-    # 列表查询：支持 datasource_id、日期范围筛选 + limit/offset 分页
-    q = db.query(DataSourceContent)
+    # 列表查询：支持 datasource_id、日期范围筛选 + 游标（keyset）分页，offset 仅用于跳页
+    filters = []
     if not is_admin(current_user):
-        q = q.filter(DataSourceContent.user_id == current_user.id)
+        filters.append(DataSourceContent.user_id == current_user.id)
     if datasource_id is not None:
-        q = q.filter(DataSourceContent.datasource_id == datasource_id)
+        filters.append(DataSourceContent.datasource_id == datasource_id)
 
     # 日期范围：闭区间 [start, end]
     if start_date:
@@ -183,28 +193,59 @@ def list_crawl_records(
             start_dt = datetime.strptime(start_date, "%Y-%m-%d")
         except ValueError:
             raise HTTPException(status_code=400, detail="start_date 格式需为 YYYY-MM-DD")
-        q = q.filter(DataSourceContent.fetched_at >= start_dt)
+        filters.append(DataSourceContent.fetched_at >= start_dt)
     if end_date:
         try:
             end_dt = datetime.strptime(end_date, "%Y-%m-%d") + timedelta(days=1)
         except ValueError:
             raise HTTPException(status_code=400, detail="end_date 格式需为 YYYY-MM-DD")
-        q = q.filter(DataSourceContent.fetched_at < end_dt)
-
-    total = q.count()
-    rows = (
-        q.order_by(desc(DataSourceContent.fetched_at), desc(DataSourceContent.id))
-        .offset(offset)
-        .limit(limit)
-        .all()
+        filters.append(DataSourceContent.fetched_at < end_dt)
+
+    # 中文说明：总数按筛选条件短时缓存，翻页时不再对大表重复 COUNT(*)
+    scope = "all" if is_admin(current_user) else f"u{current_user.id}"
+    count_key = cache_key("crawl_records_total", scope, datasource_id or "", start_date or "", end_date or "")
+    total = cache_get_json(count_key)
+    if not isinstance(total, int):
+        total = db.query(func.count(DataSourceContent.id)).filter(*filters).scalar() or 0
+        cache_set_json(count_key, total, get_settings().CRAWL_RECORD_COUNT_CACHE_SECONDS)
+
+    # 中文说明：只投影列表需要的列；预览优先用写入时生成的 content_preview，历史数据回退为 SQL 截取前缀
+    preview_col = func.coalesce(
+        DataSourceContent.content_preview,
+        func.substr(DataSourceContent.content, 1, CONTENT_PREVIEW_MAX_LEN + 1),
     )
+    q = db.query(
+        DataSourceContent.id,
+        DataSourceContent.datasource_id,
+        DataSourceContent.source_type,
+        DataSourceContent.title,
+        DataSourceContent.url,
+        DataSourceContent.extra,
+        DataSourceContent.fetched_at,
+        preview_col.label("content_preview"),
+    ).filter(*filters)
+    if cursor:
+        cur_fetched_at, cur_id = _decode_cursor(cursor)
+        q = q.filter(
+            or_(
+                DataSourceContent.fetched_at < cur_fetched_at,
+                and_(DataSourceContent.fetched_at == cur_fetched_at, DataSourceContent.id < cur_id),
+            )
+        )
+    q = q.order_by(desc(DataSourceContent.fetched_at), desc(DataSourceContent.id))
+    if not cursor and offset:
+        q = q.offset(offset)
+    rows = q.limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = _encode_cursor(rows[-1].fetched_at, rows[-1].id) if has_more and rows else None
 
     # 为了前端展示友好，补充 datasource_name（避免前端额外请求 N 次）
     ds_ids = list({r.datasource_id for r in rows})
     name_map: dict[int, str] = {}
     if ds_ids:
-        for ds in db.query(DataSource).filter(DataSource.id.in_(ds_ids)).all():
-            name_map[ds.id] = ds.name
+        for ds_id, ds_name in db.query(DataSource.id, DataSource.name).filter(DataSource.id.in_(ds_ids)).all():
+            name_map[ds_id] = ds_name
 
     items: list[CrawlRecordOut] = []
     for r in rows:
@@ -221,13 +262,13 @@ def list_crawl_records(
                 source_type=r.source_type,
                 title=display_title or r.title,
                 url=r.url,
-                content_preview=_build_preview(r.content),
+                content_preview=build_content_preview(r.content_preview),
                 extra=r.extra,
                 fetched_at=r.fetched_at,
             )
         )
 
-    return CrawlRecordListResponse(total=total, limit=limit, offset=offset, items=items)
+    return CrawlRecordListResponse(total=total, limit=limit, offset=offset, next_cursor=next_cursor, items=items)
 
 
 @router.get("/{record_id}", response_model=CrawlRecordDetailOut, summary="抓取记录详情")
@@ -259,7 +300,7 @@ def get_crawl_record(
         source_type=rec.source_type,
         title=display_title or rec.title,
         url=rec.url,
-        content_preview=_build_preview(rec.content),
+        content_preview=build_content_preview(rec.content),
         content=rec.content,
         extra=rec.extra,
         fetched_at=rec.fetched_at,
@@ -344,8 +385,9 @@ def quick_fetch(
     try:
         firecrawl_key = None
         firecrawl_base = None
+        firecrawl_picked = None
         if crawler_engine == "firecrawl":
-            firecrawl_key, firecrawl_base = _resolve_firecrawl_key(db)
+            firecrawl_key, firecrawl_base, firecrawl_picked = _resolve_firecrawl_key(db)
             if not firecrawl_key:
                 raise ValueError("FireCrawl API Key 未配置：请在 API Key 池中添加 provider=firecrawl 的 key，或设置环境变量 FIRECRAWL_API_KEY")
 
@@ -354,6 +396,8 @@ def quick_fetch(
             use_playwright=use_playwright,
             firecrawl_api_key=firecrawl_key,
             firecrawl_api_base=firecrawl_base,
+            firecrawl_key_id=firecrawl_picked.id if firecrawl_picked else None,
+            firecrawl_key_extra=firecrawl_picked.extra if firecrawl_picked else None,
         )
         crawl_res = crawler.fetch(url, timeout=timeout)
         raw_html = crawl_res.html
@@ -414,7 +458,7 @@ def quick_fetch(
         source_type=rec.source_type,
         title=display_title or rec.title,
         url=rec.url,
-        content_preview=_build_preview(rec.content),
+        content_preview=build_content_preview(rec.content),
         extra=rec.extra,
         fetched_at=rec.fetched_at,
     )
@@ -447,8 +491,9 @@ def quick_fetch_preview(
     try:
         firecrawl_key = None
         firecrawl_base = None
+        firecrawl_picked = None
         if crawler_engine == "firecrawl":
-            firecrawl_key, firecrawl_base = _resolve_firecrawl_key(db)
+            firecrawl_key, firecrawl_base, firecrawl_picked = _resolve_firecrawl_key(db)
             if not firecrawl_key:
                 raise ValueError("FireCrawl API Key 未配置：请在 API Key 池中添加 provider=firecrawl 的 key，或设置环境变量 FIRECRAWL_API_KEY")
 
@@ -457,6 +502,8 @@ def quick_fetch_preview(
             use_playwright=use_playwright,
             firecrawl_api_key=firecrawl_key,
             firecrawl_api_base=firecrawl_base,
+            firecrawl_key_id=firecrawl_picked.id if firecrawl_picked else None,
+            firecrawl_key_extra=firecrawl_picked.extra if firecrawl_picked else None,
         )
         crawl_res = crawler.fetch(url, timeout=timeout)
         raw_html = crawl_res.html
@@ -474,7 +521,7 @@ def quick_fetch_preview(
                 content_text = picked
 
         clean_res = clean_text(content_text, None)
-        text_preview = _build_preview(clean_res.clean_text, max_len=1200)
+        text_preview = build_content_preview(clean_res.clean_text, max_len=1200)
     except Exception as exc:
         raise HTTPException(status_code=400, detail=f"预览失败：{exc}") from exc
 
@@ -5,8 +5,9 @@ import json
 import re
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy import desc
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse
+from sqlalchemy import desc, func
 from sqlalchemy.orm import Session
 
 from app import deps
@@ -22,12 +23,48 @@ from app.schemas.daily_hotspot import (
     DailyHotspotSmartFilterResponse,
     DailyHotspotSourceOut,
 )
+from app.services import daily_hotspot_cache
 from app.services.daily_hotspot_builder import build_daily_hotspots
 from app.services.llm_provider import get_provider
 
 router = APIRouter()
 
 
+def _source_counts(db: Session, events: List[EventCluster]) -> dict[int, int]:
+    """返回 {event_id: 来源数}。
+
+    中文说明：优先使用构建时写入的冗余列 source_count；升级前生成的历史事件该列为空，
+    对这部分事件用一次 GROUP BY 聚合补齐，避免逐条 COUNT 的 N+1 查询。
+    """
+
+    counts: dict[int, int] = {}
+    missing: list[int] = []
+    for e in events:
+        if e.source_count is None:
+            missing.append(e.id)
+        else:
+            counts[e.id] = int(e.source_count)
+    if missing:
+        rows = (
+            db.query(EventClusterSource.event_id, func.count(EventClusterSource.id))
+            .filter(EventClusterSource.event_id.in_(missing))
+            .group_by(EventClusterSource.event_id)
+            .all()
+        )
+        counts.update({int(eid): int(n or 0) for eid, n in rows})
+    return counts
+
+
+def _etag_response(request: Request, entry: dict) -> Response:
+    """按缓存条目返回响应：If-None-Match 命中返回 304，否则返回 JSON（均带 ETag）。"""
+
+    headers = {"ETag": entry["etag"], "Cache-Control": "private, no-cache"}
+    inm = request.headers.get("if-none-match") or ""
+    if entry["etag"] in {x.strip() for x in inm.split(",")}:
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(content=entry["body"], headers=headers)
+
+
 def _extract_first_json_obj(text: str) -> Optional[dict]:
     """从模型输出中提取第一个 JSON 对象。
 
@@ -167,13 +204,10 @@ def build_daily_hotspots_endpoint(
         db.rollback()
         raise HTTPException(status_code=400, detail=str(e))
 
+    counts = _source_counts(db, events)
     items: List[DailyHotspotEventOut] = []
     for e in events:
-        source_count = (
-            db.query(EventClusterSource)
-            .filter(EventClusterSource.event_id == e.id)
-            .count()
-        )
+        source_count = counts.get(e.id, 0)
         items.append(
             DailyHotspotEventOut(
                 id=e.id,
@@ -218,13 +252,10 @@ def smart_filter_daily_hotspot_list(
             decisions=[],
         )
 
+    counts = _source_counts(db, rows)
     events = []
     for e in rows:
-        source_count = (
-            db.query(EventClusterSource)
-            .filter(EventClusterSource.event_id == e.id)
-            .count()
-        )
+        source_count = counts.get(e.id, 0)
         events.append(
             {
                 "id": e.id,
@@ -302,10 +333,21 @@ def smart_filter_daily_hotspot_list(
 
 @router.get("/", response_model=DailyHotspotListResponse, summary="获取某日热点榜单（Top20）")
 def list_daily_hotspots(
+    request: Request,
     day: date = Query(..., description="日期 YYYY-MM-DD"),
     limit: int = Query(20, ge=1, le=200, description="榜单条数"),
     db: Session = Depends(deps.get_db),
-) -> DailyHotspotListResponse:
+) -> Response:
+    # 中文说明：榜单按“日期 + 构建代次”缓存，重建该日榜单后代次变化，旧缓存不再命中
+    key = daily_hotspot_cache.list_cache_key(day, limit)
+    entry = daily_hotspot_cache.get_cached(key)
+    if entry is None:
+        resp = _list_daily_hotspots(db, day=day, limit=limit)
+        entry = daily_hotspot_cache.set_cached(key, resp.model_dump(mode="json"))
+    return _etag_response(request, entry)
+
+
+def _list_daily_hotspots(db: Session, *, day: date, limit: int) -> DailyHotspotListResponse:
     rows = (
         db.query(EventCluster)
         .filter(EventCluster.day == day)
@@ -314,13 +356,10 @@ def list_daily_hotspots(
         .all()
     )
 
+    counts = _source_counts(db, rows)
     items: List[DailyHotspotEventOut] = []
     for e in rows:
-        source_count = (
-            db.query(EventClusterSource)
-            .filter(EventClusterSource.event_id == e.id)
-            .count()
-        )
+        source_count = counts.get(e.id, 0)
         items.append(
             DailyHotspotEventOut(
                 id=e.id,
@@ -338,7 +377,21 @@ def list_daily_hotspots(
 
 
 @router.get("/{event_id}", response_model=DailyHotspotDetailResponse, summary="热点事件详情（要点+引用+来源）")
-def get_daily_hotspot_detail(event_id: int, db: Session = Depends(deps.get_db)) -> DailyHotspotDetailResponse:
+def get_daily_hotspot_detail(
+    event_id: int,
+    request: Request,
+    db: Session = Depends(deps.get_db),
+) -> Response:
+    # 中文说明：事件生成后内容不再变化（重建会换新事件 ID），详情按事件 ID 缓存，重建时删除旧事件缓存
+    key = daily_hotspot_cache.detail_cache_key(event_id)
+    entry = daily_hotspot_cache.get_cached(key)
+    if entry is None:
+        resp = _get_daily_hotspot_detail(db, event_id)
+        entry = daily_hotspot_cache.set_cached(key, resp.model_dump(mode="json"))
+    return _etag_response(request, entry)
+
+
+def _get_daily_hotspot_detail(db: Session, event_id: int) -> DailyHotspotDetailResponse:
     event = db.query(EventCluster).filter(EventCluster.id == event_id).first()
     if not event:
         raise HTTPException(status_code=404, detail="热点事件不存在")
@@ -1,14 +1,17 @@
-from datetime import datetime, time
+from datetime import date
 from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, defer
 from sqlalchemy import func
 
 from app import deps
+from app.core.config import get_settings
 from app.models.article import Article
 from app.models.datasource_content import DataSourceContent
 from app.models.datasource import DataSource
 from app.models.user import User
 from app.schemas.dashboard import DashboardRecentResponse, RecentArticle, RecentCrawlRecord, StatsResponse
+from app.services.stat_counters import METRIC_ARTICLES, METRIC_CRAWL_RECORDS, get_counts
+from app.services.ttl_cache import cache_get_json, cache_key, cache_set_json
 from app.services.user_service import is_admin
 
 router = APIRouter()
@@ -18,34 +21,26 @@ def get_stats(
     db: Session = Depends(deps.get_db),
     current_user: User = Depends(deps.require_user),
 ):
-    now = datetime.now()
-    today_start = datetime.combine(now.date(), time.min)
-
-    art_q = db.query(Article)
-    crawl_q = db.query(DataSourceContent)
-    if not is_admin(current_user):
-        art_q = art_q.filter(Article.user_id == current_user.id)
-        crawl_q = crawl_q.filter(DataSourceContent.user_id == current_user.id)
-
-    total_articles = art_q.with_entities(func.count(Article.id)).scalar() or 0
-    today_articles = (
-        art_q.with_entities(func.count(Article.id)).filter(Article.created_at >= today_start).scalar() or 0
-    )
-
-    total_crawl = crawl_q.with_entities(func.count(DataSourceContent.id)).scalar() or 0
-    today_crawl = (
-        crawl_q.with_entities(func.count(DataSourceContent.id)).filter(DataSourceContent.fetched_at >= today_start).scalar() or 0
-    )
+    # 中文说明：计数来自 stat_counters（写入时增量维护 + 定时校准），结果再做短时缓存
+    user_id = None if is_admin(current_user) else current_user.id
+    key = cache_key("dashboard_stats", user_id or "all", date.today().isoformat())
+    cached = cache_get_json(key)
+    if isinstance(cached, dict):
+        return StatsResponse(**cached)
 
+    total_articles, today_articles = get_counts(db, METRIC_ARTICLES, user_id)
+    total_crawl, today_crawl = get_counts(db, METRIC_CRAWL_RECORDS, user_id)
     total_datasources = db.query(func.count(DataSource.id)).scalar() or 0
 
-    return StatsResponse(
+    resp = StatsResponse(
         total_articles=total_articles,
         today_articles=today_articles,
         total_crawl=total_crawl,
         today_crawl=today_crawl,
         total_datasources=total_datasources,
     )
+    cache_set_json(key, resp.model_dump(), get_settings().DASHBOARD_STATS_CACHE_SECONDS)
+    return resp
 
 
 @router.get("/recent", response_model=DashboardRecentResponse, summary="首页最近活动（文章/抓取）")
@@ -73,7 +68,8 @@ def get_recent(
     ]
 
     # 最近抓取记录 + datasource_name
-    rec_q = db.query(DataSourceContent)
+    # 中文说明：首页只展示标题/链接，不加载 LONGTEXT 正文
+    rec_q = db.query(DataSourceContent).options(defer(DataSourceContent.content))
     if not is_admin(current_user):
         rec_q = rec_q.filter(DataSourceContent.user_id == current_user.id)
     rec_rows = rec_q.order_by(DataSourceContent.fetched_at.desc(), DataSourceContent.id.desc()).limit(limit).all()
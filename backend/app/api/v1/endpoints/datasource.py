@@ -14,11 +14,13 @@ from app.models.user import User
 from app.schemas.datasource import (
     DataSourceCreate,
     DataSourceOut,
+    DataSourceRunOut,
     DataSourceUpdate,
 )
 from app.services.user_service import is_admin
-from app.services.datasource_service import DataSourceService
-from app.repositories.datasource_repo import DataSourceRepository
+from app.services.datasource_service import DataSourceService, get_datasource_running
+from app.services.run_lock import RunInProgress
+from app.repositories.datasource_repo import DataSourceRepository, DataSourceRunRepository
 
 router = APIRouter()
 
@@ -48,6 +50,8 @@ def run_datasource(
     service = DataSourceService(db)
     try:
         return service.run_datasource(ds, force=force, current_user=current_user)
+    except RunInProgress as e:
+        raise HTTPException(status_code=409, detail=str(e)) from e
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e)) from e
 
@@ -86,6 +90,10 @@ def create_datasource(
         schedule_cron=payload.schedule_cron,
         enable_schedule=payload.enable_schedule,
     )
+    # 中文说明：next_run_at 由接口维护，定时扫描只按 next_run_at <= now 查询到期数据源
+    cron_str = (str(ds.schedule_cron).strip() if ds.schedule_cron is not None else "")
+    if ds.enable_schedule and cron_str:
+        ds.next_run_at = _compute_next_run(cron_str, datetime.now())
     return repo.create(ds)
 
 
@@ -173,3 +181,38 @@ def trigger_datasource(
         raise HTTPException(status_code=404, detail="数据源不存在")
 
     return run_datasource(db, ds, force=force, current_user=current_user)
+
+
+@router.get("/{ds_id}/running", summary="查询数据源正在进行的运行")
+def get_datasource_running_status(
+    ds_id: int,
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.require_user),
+) -> dict:
+    """
+    返回数据源当前是否在抓取中（手动触发收到 409 时可轮询此接口，等待正在进行的运行结束）。
+    """
+    repo = DataSourceRepository(db)
+    user_id = None if is_admin(current_user) else current_user.id
+    if not repo.get_by_id(ds_id, user_id=user_id):
+        raise HTTPException(status_code=404, detail="数据源不存在")
+
+    run = get_datasource_running(ds_id)
+    return {"running": run is not None, "run": run}
+
+
+@router.get("/{ds_id}/runs", response_model=List[DataSourceRunOut], summary="数据源运行历史")
+def list_datasource_runs(
+    ds_id: int,
+    limit: int = 20,
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.require_user),
+) -> list:
+    """按开始时间倒序返回数据源的运行历史（统计/耗时/跳过明细）。"""
+    repo = DataSourceRepository(db)
+    user_id = None if is_admin(current_user) else current_user.id
+    if not repo.get_by_id(ds_id, user_id=user_id):
+        raise HTTPException(status_code=404, detail="数据源不存在")
+
+    limit = max(1, min(int(limit or 20), 200))
+    return DataSourceRunRepository(db).list_by_datasource(ds_id, limit=limit)
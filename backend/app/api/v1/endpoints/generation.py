@@ -1,7 +1,9 @@
-from typing import List, Optional
+from datetime import datetime, timedelta
+from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 import markdown2
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 
 from app import deps
@@ -11,6 +13,8 @@ from app.models.user import User
 from app.schemas.article import (
     ArticleAiEditRequest,
     ArticleAiEditResponse,
+    ArticleListItem,
+    ArticleListResponse,
     ArticleOut,
     ArticleUpdate,
     DeleteResponse,
@@ -55,16 +59,94 @@ def generate_article_endpoint(
         raise HTTPException(status_code=400, detail=str(exc)) from exc
 
 
-@router.get("/articles", response_model=List[ArticleOut], summary="历史生成列表")
+@router.get("/articles", response_model=ArticleListResponse, summary="历史生成列表")
 def list_articles(
+    keyword: Optional[str] = Query(None, description="按标题关键词筛选"),
+    provider: Optional[str] = Query(None, description="按模型供应商筛选"),
+    material_pack_id: Optional[int] = Query(None, description="按素材包筛选"),
+    start_date: Optional[str] = Query(None, description="开始日期，YYYY-MM-DD"),
+    end_date: Optional[str] = Query(None, description="结束日期，YYYY-MM-DD"),
+    limit: int = Query(20, ge=1, le=200, description="分页大小"),
+    offset: int = Query(0, ge=0, description="偏移量（兼容跳页；顺序翻页请使用 cursor）"),
+    cursor: Optional[str] = Query(None, description="游标：上一页返回的 next_cursor；传入后忽略 offset"),
     db: Session = Depends(deps.get_db),
     current_user: User = Depends(deps.require_user),
-) -> list[Article]:
-    """查看已生成的文章，按时间倒序"""
-    q = db.query(Article)
+) -> ArticleListResponse:
+    """查看已生成的文章，按时间倒序。
+
+    中文说明：列表只投影轻量列（正文/HTML/Prompt/请求参数只在单篇接口加载），按 ID 游标分页。
+    """
+    filters = []
     if not is_admin(current_user):
-        q = q.filter(Article.user_id == current_user.id)
-    return q.order_by(Article.id.desc()).all()
+        filters.append(Article.user_id == current_user.id)
+    kw = (keyword or "").strip()
+    if kw:
+        filters.append(Article.title.like(f"%{kw}%"))
+    if provider:
+        filters.append(Article.llm_provider == provider.strip())
+    if material_pack_id is not None:
+        filters.append(Article.material_pack_id == material_pack_id)
+    if start_date:
+        try:
+            filters.append(Article.created_at >= datetime.strptime(start_date, "%Y-%m-%d"))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="start_date 格式需为 YYYY-MM-DD")
+    if end_date:
+        try:
+            filters.append(Article.created_at < datetime.strptime(end_date, "%Y-%m-%d") + timedelta(days=1))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="end_date 格式需为 YYYY-MM-DD")
+
+    total = db.query(func.count(Article.id)).filter(*filters).scalar() or 0
+
+    q = db.query(
+        Article.id,
+        Article.title,
+        Article.summary,
+        Article.llm_provider,
+        Article.llm_model,
+        Article.material_pack_id,
+        Article.material_refs,
+        Article.source_refs,
+        Article.created_at,
+    ).filter(*filters)
+    if cursor:
+        try:
+            cur_id = int(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="cursor 无效")
+        q = q.filter(Article.id < cur_id)
+    elif offset:
+        q = q.offset(offset)
+    rows = q.order_by(Article.id.desc()).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    items: list[ArticleListItem] = []
+    for r in rows:
+        refs = r.material_refs if isinstance(r.material_refs, dict) else {}
+        item_ids = refs.get("item_ids")
+        items.append(
+            ArticleListItem(
+                id=r.id,
+                title=r.title,
+                summary=r.summary,
+                llm_provider=r.llm_provider,
+                llm_model=r.llm_model,
+                material_pack_id=r.material_pack_id,
+                material_item_count=len(item_ids) if isinstance(item_ids, list) else 0,
+                source_ref_count=len(r.source_refs) if isinstance(r.source_refs, list) else 0,
+                created_at=r.created_at,
+            )
+        )
+
+    return ArticleListResponse(
+        total=total,
+        limit=limit,
+        offset=offset,
+        next_cursor=str(rows[-1].id) if has_more and rows else None,
+        items=items,
+    )
 
 
 @router.get("/articles/{article_id}", response_model=ArticleOut, summary="查看单篇文章")
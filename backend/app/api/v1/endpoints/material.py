@@ -6,7 +6,8 @@ import os
 from typing import Any, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy import desc
+from sqlalchemy import desc, func
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
 import requests
@@ -25,6 +26,7 @@ from app.schemas.material import (
     FirecrawlSearchIngestResponse,
     MaterialItemBatchCreateRequest,
     MaterialItemOut,
+    MaterialItemSearchHit,
     MaterialItemSearchResponse,
     MaterialItemUpdate,
     MaterialPackCreate,
@@ -32,19 +34,35 @@ from app.schemas.material import (
     MaterialPackListResponse,
     MaterialPackOut,
 )
-from app.services.api_key_pool import pick_api_key
+from app.services.api_key_pool import pick_api_key, report_key_error, report_key_success
+from app.services.material_items import bulk_create_items, hash_item, norm_text
+from app.services.material_search import delete_item_terms, filter_packs, highlight, search_material_items
+from app.services.rate_limiter import limit_key_id, rate_limited
 from app.services.user_service import is_admin
 
 router = APIRouter()
 
 
-def _norm_text(s: str) -> str:
-    return " ".join((s or "").strip().split())
+def _url_hash(url: str) -> str:
+    return hashlib.md5(str(url).encode("utf-8", "ignore")).hexdigest()
 
 
-def _hash_item(item_type: str, text: str) -> str:
-    raw = f"{(item_type or '').strip().lower()}|{_norm_text(text)}".encode("utf-8")
-    return hashlib.md5(raw).hexdigest()
+def _latest_extra_by_url_hash(db: Session, datasource_id: int, url_hashes: list[str]) -> dict[str, dict]:
+    """按 url_hash 集合一次查出各 URL 最近一条抓取记录的 extra（用于内容未变化时跳过入库）。"""
+    hs = list({h for h in url_hashes if h})
+    if not hs:
+        return {}
+    latest_ids = (
+        db.query(func.max(DataSourceContent.id))
+        .filter(DataSourceContent.datasource_id == datasource_id, DataSourceContent.url_hash.in_(hs))
+        .group_by(DataSourceContent.url_hash)
+    )
+    rows = (
+        db.query(DataSourceContent.url_hash, DataSourceContent.extra)
+        .filter(DataSourceContent.id.in_(latest_ids.scalar_subquery()))
+        .all()
+    )
+    return {h: (extra if isinstance(extra, dict) else {}) for h, extra in rows}
 
 
 def _preview_text(text: str, max_len: int = 220) -> str:
@@ -71,6 +89,8 @@ def _resolve_aliyun_iqs_credentials(db: Session) -> dict[str, Any]:
     优先级：
     1) AK/SK（SDK 调用）：环境变量 ALIYUN_ACCESS_KEY_ID / ALIYUN_ACCESS_KEY_SECRET
     2) AK/SK（SDK 调用）：API Key 池 provider=aliyun_iqs 的 extra.access_key_id/access_key_secret
+
+    来自 API Key 池时返回 key_id / key_extra，用于上报 key 健康度与按 key 限流。
     """
 
     ak = (os.getenv("ALIYUN_ACCESS_KEY_ID") or os.getenv("ACCESS_KEY_ID") or "").strip()
@@ -85,11 +105,22 @@ def _resolve_aliyun_iqs_credentials(db: Session) -> dict[str, Any]:
             ak2 = str(extra.get("access_key_id") or extra.get("accessKeyId") or "").strip()
             sk2 = str(extra.get("access_key_secret") or extra.get("accessKeySecret") or "").strip()
             if ak2 and sk2:
-                return {"mode": "aksk", "access_key_id": ak2, "access_key_secret": sk2}
+                return {
+                    "mode": "aksk",
+                    "access_key_id": ak2,
+                    "access_key_secret": sk2,
+                    "key_id": picked.id,
+                    "key_extra": extra,
+                }
         
         # 如果没有配置 AK/SK，但配置了 key，则使用 API Key 模式
         if picked.key and str(picked.key).strip():
-            return {"mode": "apikey", "api_key": str(picked.key).strip()}
+            return {
+                "mode": "apikey",
+                "api_key": str(picked.key).strip(),
+                "key_id": picked.id,
+                "key_extra": picked.extra,
+            }
 
     raise HTTPException(
         status_code=400,
@@ -101,7 +132,7 @@ def _resolve_aliyun_iqs_credentials(db: Session) -> dict[str, Any]:
 
 
 
-def _aliyun_iqs_call_via_apikey(*, query: str, engine_type: str, time_range: str, category: str | None, location: str | None, include_main_text: bool, advanced_params: dict[str, str] | None, api_key: str) -> dict[str, Any]:
+def _aliyun_iqs_call_via_apikey(*, query: str, engine_type: str, time_range: str, category: str | None, location: str | None, include_main_text: bool, advanced_params: dict[str, str] | None, api_key: str, key_id: Optional[int] = None, key_extra: Optional[dict] = None) -> dict[str, Any]:
     """通过 HTTP API (Bearer Token) 调用阿里云统一搜索"""
     # 接口地址通常为：https://{endpoint}/linked-retrieval/linked-retrieval-entry/v1/iqs/search/unified
     # 这里的 endpoint 使用与 SDK 一致的 cn-zhangjiakou
@@ -131,10 +162,12 @@ def _aliyun_iqs_call_via_apikey(*, query: str, engine_type: str, time_range: str
         body["advancedParams"] = advanced_params
 
     try:
-        resp = requests.post(endpoint, json=body, headers=headers, timeout=30)
+        with rate_limited("aliyun_iqs", key_id=limit_key_id(key_id, api_key), extra=key_extra):
+            resp = requests.post(endpoint, json=body, headers=headers, timeout=30)
         resp.raise_for_status()
         data = resp.json()
     except Exception as exc:
+        # 中文说明：保留原异常（含 HTTP 状态码）作为 __cause__，供调用方按类型上报 key 健康度
         raise RuntimeError(f"API Key 调用失败: {exc}") from exc
     
     # 兼容返回结构
@@ -144,7 +177,7 @@ def _aliyun_iqs_call_via_apikey(*, query: str, engine_type: str, time_range: str
     return data
 
 
-def _aliyun_iqs_call_via_sdk(*, query: str, engine_type: str, time_range: str, category: str | None, location: str | None, include_main_text: bool, advanced_params: dict[str, str] | None, access_key_id: str, access_key_secret: str) -> dict[str, Any]:
+def _aliyun_iqs_call_via_sdk(*, query: str, engine_type: str, time_range: str, category: str | None, location: str | None, include_main_text: bool, advanced_params: dict[str, str] | None, access_key_id: str, access_key_secret: str, key_id: Optional[int] = None, key_extra: Optional[dict] = None) -> dict[str, Any]:
     try:
         from alibabacloud_iqs20241111 import models
         from alibabacloud_iqs20241111.client import Client
@@ -180,7 +213,8 @@ def _aliyun_iqs_call_via_sdk(*, query: str, engine_type: str, time_range: str, c
     req = models.UnifiedSearchRequest(body=body)
 
     try:
-        resp = client.unified_search(req)
+        with rate_limited("aliyun_iqs", key_id=limit_key_id(key_id, access_key_id), extra=key_extra):
+            resp = client.unified_search(req)
     except TeaException as exc:  # type: ignore
         raise RuntimeError(str(exc)) from exc
 
@@ -235,10 +269,14 @@ def firecrawl_search_ingest(
         raise HTTPException(status_code=400, detail="query 不能为空")
 
     api_key = (payload.api_key or "").strip()
+    key_id = None
+    key_extra = None
     if not api_key:
         picked = pick_api_key(db, "firecrawl", mark_used=True)
         if picked:
             api_key = (picked.key or "").strip()
+            key_id = picked.id
+            key_extra = picked.extra
     if not api_key:
         import os
 
@@ -304,11 +342,14 @@ def firecrawl_search_ingest(
     }
 
     try:
-        resp = requests.post(endpoint, json=body, headers=req_headers, timeout=120)
+        with rate_limited("firecrawl", key_id=limit_key_id(key_id, api_key), extra=key_extra):
+            resp = requests.post(endpoint, json=body, headers=req_headers, timeout=120)
         resp.raise_for_status()
         jd = resp.json()
     except Exception as exc:
+        report_key_error(key_id, exc)
         raise HTTPException(status_code=400, detail=f"Firecrawl 搜索失败：{exc}") from exc
+    report_key_success(key_id)
 
     if not isinstance(jd, dict) or not jd.get("success"):
         raise HTTPException(status_code=400, detail=f"Firecrawl 搜索返回异常：{jd}")
@@ -331,10 +372,17 @@ def firecrawl_search_ingest(
 
     ingested = 0
     skipped = 0
-    basket_items = []
 
     now_naive = datetime.now()
 
+    # 中文说明：一次查出本批 URL 的最近抓取记录（替代逐条查询）；入库记录最后统一 flush 取 ID
+    latest_extra = _latest_extra_by_url_hash(
+        db,
+        ds.id,
+        [_url_hash(it["url"].strip()) for it in web_items if isinstance(it.get("url"), str) and it["url"].strip()],
+    )
+    pending: list[tuple[DataSourceContent, dict]] = []
+
     for it in web_items:
         url = it.get("url")
         if not isinstance(url, str) or not url.strip():
@@ -354,20 +402,11 @@ def firecrawl_search_ingest(
             skipped += 1
             continue
 
-        url_hash = hashlib.md5(str(url).encode("utf-8", "ignore")).hexdigest()
-        last_rec = (
-            db.query(DataSourceContent)
-            .filter(
-                DataSourceContent.datasource_id == ds.id,
-                DataSourceContent.url_hash == url_hash,
-            )
-            .order_by(desc(DataSourceContent.fetched_at))
-            .first()
-        )
-        if last_rec and isinstance(last_rec.extra, dict):
-            if last_rec.extra.get("content_hash_clean") == clean_res.content_hash_clean:
-                skipped += 1
-                continue
+        url_hash = _url_hash(url)
+        last_extra = latest_extra.get(url_hash)
+        if last_extra is not None and last_extra.get("content_hash_clean") == clean_res.content_hash_clean:
+            skipped += 1
+            continue
 
         title = it.get("title") if isinstance(it.get("title"), str) else None
         description = it.get("description") or it.get("snippet")
@@ -404,22 +443,26 @@ def firecrawl_search_ingest(
             fetched_at=now_naive,
         )
         db.add(rec)
-        db.flush()
+        latest_extra[url_hash] = rec.extra
 
         ingested += 1
-        basket_items.append(
-            {
-                "item_type": "source",
-                "text": (title or url) + "\n" + content_text,
-                "source_url": url,
-                "source_content_id": rec.id,
-                "meta": {
-                    "firecrawl_query": query,
-                    "firecrawl_rank": it.get("_firecrawl_rank"),
+        pending.append(
+            (
+                rec,
+                {
+                    "item_type": "source",
+                    "text": (title or url) + "\n" + content_text,
+                    "source_url": url,
+                    "meta": {
+                        "firecrawl_query": query,
+                        "firecrawl_rank": it.get("_firecrawl_rank"),
+                    },
                 },
-            }
+            )
         )
 
+    db.flush()
+    basket_items = [{**item, "source_content_id": rec.id} for rec, item in pending]
     db.commit()
 
     return FirecrawlSearchIngestResponse(
@@ -495,6 +538,8 @@ def aliyun_unified_search_ingest(
                 advanced_params=advanced_params,
                 access_key_id=str(creds.get("access_key_id") or ""),
                 access_key_secret=str(creds.get("access_key_secret") or ""),
+                key_id=creds.get("key_id"),
+                key_extra=creds.get("key_extra"),
             )
         else:
             # API Key mode
@@ -507,9 +552,13 @@ def aliyun_unified_search_ingest(
                 include_main_text=include_main_text,
                 advanced_params=advanced_params,
                 api_key=str(creds.get("api_key") or ""),
+                key_id=creds.get("key_id"),
+                key_extra=creds.get("key_extra"),
             )
     except Exception as exc:
+        report_key_error(creds.get("key_id"), exc.__cause__ or exc)
         raise HTTPException(status_code=400, detail=f"阿里统一搜索失败（{creds.get('mode')}）：{exc}") from exc
+    report_key_success(creds.get("key_id"))
 
     if not isinstance(jd, dict) or not isinstance(jd.get("pageItems"), list):
         raise HTTPException(status_code=400, detail=f"阿里统一搜索返回异常：{jd}")
@@ -517,11 +566,22 @@ def aliyun_unified_search_ingest(
     page_items = jd.get("pageItems") or []
     ingested = 0
     skipped = 0
-    basket_items: list[dict] = []
     now_naive = datetime.now()
 
     from app.services.text_cleaner import clean_text
 
+    # 中文说明：一次查出本批 URL 的最近抓取记录（替代逐条查询）；入库记录最后统一 flush 取 ID
+    latest_extra = _latest_extra_by_url_hash(
+        db,
+        ds.id,
+        [
+            _url_hash(it["link"].strip())
+            for it in page_items
+            if isinstance(it, dict) and isinstance(it.get("link"), str) and it["link"].strip()
+        ],
+    )
+    pending: list[tuple[DataSourceContent, dict]] = []
+
     for idx, it in enumerate(page_items):
         if not isinstance(it, dict):
             skipped += 1
@@ -550,21 +610,12 @@ def aliyun_unified_search_ingest(
             skipped += 1
             continue
 
-        url_hash = hashlib.md5(str(url).encode("utf-8", "ignore")).hexdigest()
+        url_hash = _url_hash(url)
         content_hash = hashlib.md5(str(content_text).encode("utf-8", "ignore")).hexdigest()
-        last_rec = (
-            db.query(DataSourceContent)
-            .filter(
-                DataSourceContent.datasource_id == ds.id,
-                DataSourceContent.url_hash == url_hash,
-            )
-            .order_by(desc(DataSourceContent.fetched_at))
-            .first()
-        )
-        if last_rec and isinstance(last_rec.extra, dict):
-            if last_rec.extra.get("content_hash") == content_hash:
-                skipped += 1
-                continue
+        last_extra = latest_extra.get(url_hash)
+        if last_extra is not None and last_extra.get("content_hash") == content_hash:
+            skipped += 1
+            continue
 
         rec = DataSourceContent(
             user_id=current_user.id,
@@ -593,24 +644,28 @@ def aliyun_unified_search_ingest(
             fetched_at=now_naive,
         )
         db.add(rec)
-        db.flush()
+        latest_extra[url_hash] = rec.extra
 
         ingested += 1
-        basket_items.append(
-            {
-                "item_type": "source",
-                "text": (title or url) + "\n" + content_text,
-                "source_url": url,
-                "source_content_id": rec.id,
-                "meta": {
-                    "iqs_query": query,
-                    "iqs_rank": idx + 1,
-                    "iqs_engine_type": engine_type,
-                    "iqs_time_range": time_range,
+        pending.append(
+            (
+                rec,
+                {
+                    "item_type": "source",
+                    "text": (title or url) + "\n" + content_text,
+                    "source_url": url,
+                    "meta": {
+                        "iqs_query": query,
+                        "iqs_rank": idx + 1,
+                        "iqs_engine_type": engine_type,
+                        "iqs_time_range": time_range,
+                    },
                 },
-            }
+            )
         )
 
+    db.flush()
+    basket_items = [{**item, "source_content_id": rec.id} for rec, item in pending]
     db.commit()
 
     return AliyunUnifiedSearchIngestResponse(
@@ -632,8 +687,7 @@ def list_packs(
     if not is_admin(current_user):
         q = q.filter(MaterialPack.user_id == current_user.id)
     if keyword:
-        kw = f"%{keyword.strip()}%"
-        q = q.filter((MaterialPack.name.like(kw)) | (MaterialPack.description.like(kw)))
+        q = filter_packs(db, q, keyword)
 
     total = q.count()
     rows = q.order_by(desc(MaterialPack.created_at), desc(MaterialPack.id)).offset(offset).limit(limit).all()
@@ -678,6 +732,7 @@ def delete_pack(
 
     try:
         # 中文说明：MaterialItem 通过 pack_id 外键关联；此处先删除子表，避免数据库外键约束问题。
+        delete_item_terms(db, pack_id=pack_id)
         db.query(MaterialItem).filter(MaterialItem.pack_id == pack_id).delete(synchronize_session=False)
         db.delete(pack)
         db.commit()
@@ -706,28 +761,10 @@ def batch_create_items(
     if not pack:
         raise HTTPException(status_code=404, detail="素材包不存在")
 
-    created: list[MaterialItem] = []
-    for it in payload.items or []:
-        if not (it.text or "").strip():
-            continue
-        item = MaterialItem(
-            user_id=pack.user_id,
-            pack_id=pack_id,
-            item_type=(it.item_type or "").strip().lower(),
-            text=_norm_text(it.text),
-            text_hash=_hash_item(it.item_type, it.text),
-            source_url=it.source_url,
-            source_content_id=it.source_content_id,
-            source_event_id=it.source_event_id,
-            meta=it.meta,
-        )
-        db.add(item)
-        created.append(item)
-
+    # 中文说明：整批规范化 + 一次去重查询 + 一条多行 INSERT；与包内已有条目（同类型同文本）重复的直接跳过
+    created = bulk_create_items(db, payload.items or [], pack_id=pack_id, user_id=pack.user_id)
     db.commit()
-    for item in created:
-        db.refresh(item)
-    return created
+    return [MaterialItemOut(**r) for r in created]
 
 
 @router.patch("/items/{item_id}", response_model=MaterialItemOut, summary="更新素材条目")
@@ -747,15 +784,22 @@ def update_item(
     if payload.item_type is not None:
         item.item_type = payload.item_type.strip().lower()
     if payload.text is not None:
-        item.text = _norm_text(payload.text)
-        item.text_hash = _hash_item(item.item_type, item.text)
+        item.text = norm_text(payload.text)
+    if payload.item_type is not None or payload.text is not None:
+        # 中文说明：text_hash 同时包含类型与文本，任一变化都需重算（唯一索引据此去重）
+        item.text_hash = hash_item(item.item_type, item.text)
     if payload.source_url is not None:
         item.source_url = payload.source_url
     if payload.meta is not None:
         item.meta = payload.meta
 
     db.add(item)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError as exc:
+        # 中文说明：(pack_id, text_hash) 唯一索引冲突——改写后的内容与包内已有条目重复
+        db.rollback()
+        raise HTTPException(status_code=409, detail="素材包内已存在相同类型与内容的条目") from exc
     db.refresh(item)
     return item
 
@@ -779,11 +823,12 @@ def delete_item(
 
 @router.get("/items/search", response_model=MaterialItemSearchResponse, summary="素材条目搜索")
 def search_items(
-    keyword: Optional[str] = Query(None, description="关键字（text）"),
+    keyword: Optional[str] = Query(None, description="关键字（text，全文检索，多个关键字以空格分隔）"),
     pack_id: Optional[int] = Query(None, description="限制某个素材包"),
     item_type: Optional[str] = Query(None, description="过滤条目类型"),
     limit: int = Query(20, ge=1, le=200),
     offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="游标：上一页返回的 next_cursor；传入后忽略 offset"),
     db: Session = Depends(deps.get_db),
     current_user: User = Depends(deps.require_user),
 ) -> MaterialItemSearchResponse:
@@ -794,13 +839,17 @@ def search_items(
         q = q.filter(MaterialItem.pack_id == pack_id)
     if item_type:
         q = q.filter(MaterialItem.item_type == item_type.strip().lower())
-    if keyword:
-        kw = f"%{keyword.strip()}%"
-        q = q.filter(MaterialItem.text.like(kw))
 
-    total = q.count()
-    rows = q.order_by(desc(MaterialItem.created_at), desc(MaterialItem.id)).offset(offset).limit(limit).all()
-    return MaterialItemSearchResponse(total=total, limit=limit, offset=offset, items=rows)
+    page = search_material_items(db, q, keyword, limit=limit, offset=offset, cursor=cursor)
+    items = [
+        MaterialItemSearchHit.model_validate(it).model_copy(
+            update={"score": score, "highlight": highlight(it.text, keyword)}
+        )
+        for it, score in page.rows
+    ]
+    return MaterialItemSearchResponse(
+        total=page.total, limit=limit, offset=offset, next_cursor=page.next_cursor, items=items
+    )
 
 
 @router.post("/packs/{pack_id}/dedupe", response_model=DedupeResponse, summary="素材包去重")
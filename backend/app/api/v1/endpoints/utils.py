@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import hashlib
 import mimetypes
 import os
 import uuid
@@ -16,12 +17,48 @@ from pydantic import BaseModel
 from sqlalchemy.orm import Session
 
 from app import deps
-from app.services.api_key_pool import pick_api_key
+from app.core.config import get_settings
+from app.services.api_key_pool import pick_api_key, report_key_error, report_key_success
 from app.services.crawler import RequestsCrawler, PlaywrightCrawler, discover_links
+from app.services.ttl_cache import cache_get_json, cache_key, cache_set_json
+from app.services.url_canon import canonicalize_url
 
 router = APIRouter()
 
 
+# 中文说明：单个页面缓存的 HTML 上限（字符），超大页面不缓存，避免占满 Redis/进程内存
+_PAGE_CACHE_MAX_CHARS = 2_000_000
+
+
+def _page_cache_key(kind: str, url: str, engine: str) -> str:
+    digest = hashlib.sha1(url.encode("utf-8", "ignore")).hexdigest()
+    return cache_key(kind, engine, digest)
+
+
+def _fetch_page(url: str, use_playwright: bool, refresh: bool) -> tuple[str, str]:
+    """抓取页面并按 (url, engine) 短时缓存原始 HTML，返回 (html, final_url)。
+
+    中文说明：元素选择器预览与子页面发现会针对同一页面反复调用（调 selector 时尤其频繁），
+    缓存命中时不再重新下载/渲染；refresh=true 强制重新抓取并覆盖缓存。
+    """
+
+    engine = "playwright" if use_playwright else "requests"
+    key = _page_cache_key("page_fetch", url, engine)
+    if not refresh:
+        cached = cache_get_json(key)
+        if isinstance(cached, dict) and isinstance(cached.get("html"), str):
+            return cached["html"], cached.get("final_url") or url
+
+    crawler = PlaywrightCrawler() if use_playwright else RequestsCrawler()
+    res = crawler.fetch(url)
+    html = res.html or ""
+    final_url = (res.extra or {}).get("final_url") or url
+    ttl = int(get_settings().PAGE_PREVIEW_CACHE_SECONDS or 0)
+    if ttl > 0 and html and len(html) <= _PAGE_CACHE_MAX_CHARS:
+        cache_set_json(key, {"html": html, "final_url": final_url}, ttl)
+    return html, final_url
+
+
 class DiscoverLinksResponse(BaseModel):
     """发现子页面链接响应"""
     links: List[str]
@@ -33,6 +70,7 @@ def discover_sub_links(
     limit: int = Query(10, ge=1, le=100, description="最多返回链接数"),
     use_playwright: bool = Query(False, description="是否使用 Playwright 渲染"),
     css_selector: str = Query("", description="主页面过滤 CSS 选择器，仅在该区域内发现链接"),
+    refresh: bool = Query(False, description="忽略缓存，重新抓取页面"),
 ) -> DiscoverLinksResponse:
     """
     抓取目标页面并发现同域子页面链接，用于元素选择器预览子页面。
@@ -42,11 +80,8 @@ def discover_sub_links(
     if not (u.startswith("http://") or u.startswith("https://")):
         raise HTTPException(status_code=400, detail="url 必须以 http:// 或 https:// 开头")
 
-    crawler = PlaywrightCrawler() if use_playwright else RequestsCrawler()
     try:
-        res = crawler.fetch(u)
-        html = res.html or ""
-        final_url = (res.extra or {}).get("final_url") or u
+        html, final_url = _fetch_page(u, use_playwright, refresh)
     except Exception as exc:
         raise HTTPException(status_code=400, detail=f"抓取页面失败：{exc}") from exc
 
@@ -55,7 +90,14 @@ def discover_sub_links(
     if css_selector and css_selector.strip():
         parser_cfg = {"css_selector": css_selector.strip()}
 
-    links = discover_links(html, final_url, budget=limit, seen_set={u, final_url}, parser_cfg=parser_cfg)
+    links = discover_links(
+        html,
+        final_url,
+        budget=limit,
+        seen_set={canonicalize_url(u), canonicalize_url(final_url)},
+        parser_cfg=parser_cfg,
+        canonicalize=canonicalize_url,
+    )
     return DiscoverLinksResponse(links=links)
 
 
@@ -63,6 +105,7 @@ def discover_sub_links(
 def page_preview(
     url: str = Query(..., description="目标页面 URL"),
     use_playwright: bool = Query(False, description="是否使用 Playwright 渲染"),
+    refresh: bool = Query(False, description="忽略缓存，重新抓取页面"),
 ) -> HTMLResponse:
     """返回可被前端 iframe(srcdoc) 渲染的 HTML，并注入元素选择器脚本。"""
 
@@ -73,11 +116,16 @@ def page_preview(
     # 说明：此预览 HTML 仅用于“选择元素生成 CSS Selector”，不是生产抓取结果。
     # - 为避免执行外站脚本，这里会移除 <script>
     # - 注入 base 标签保证相对资源可加载
-    crawler = PlaywrightCrawler() if use_playwright else RequestsCrawler()
+    # - 处理后的预览 HTML 按 (url, engine) 短时缓存，反复打开选择器时不再重新抓取与解析
+    engine = "playwright" if use_playwright else "requests"
+    preview_key = _page_cache_key("page_preview", u, engine)
+    if not refresh:
+        cached = cache_get_json(preview_key)
+        if isinstance(cached, str) and cached:
+            return HTMLResponse(content=cached, status_code=200)
+
     try:
-        res = crawler.fetch(u)
-        html = res.html
-        final_url = (res.extra or {}).get("final_url") or u
+        html, final_url = _fetch_page(u, use_playwright, refresh)
     except Exception as exc:
         raise HTTPException(status_code=400, detail=f"抓取预览页面失败：{exc}") from exc
 
@@ -250,7 +298,11 @@ def page_preview(
     """
     soup.body.append(script_tag) if soup.body else soup.append(script_tag)
 
-    return HTMLResponse(content=str(soup), status_code=200)
+    content = str(soup)
+    ttl = int(get_settings().PAGE_PREVIEW_CACHE_SECONDS or 0)
+    if ttl > 0 and len(content) <= _PAGE_CACHE_MAX_CHARS:
+        cache_set_json(preview_key, content, ttl)
+    return HTMLResponse(content=content, status_code=200)
 
 
 class UploadImageResponse(BaseModel):
@@ -298,6 +350,7 @@ async def upload_image(
     oss_prefix = (os.getenv("OSS_PREFIX") or "").strip()
     oss_public_base = (os.getenv("OSS_PUBLIC_BASE_URL") or "").strip().rstrip("/")
 
+    oss_key_id = None
     if not (oss_endpoint and oss_bucket and oss_access_key_id and oss_access_key_secret):
         try:
             k = pick_api_key(db, "oss", mark_used=True)
@@ -306,6 +359,8 @@ async def upload_image(
 
         if k and isinstance(getattr(k, "extra", None), dict):
             extra = k.extra or {}
+            # 中文说明：使用池中 key 上传时回报结果（半开探测 key 据此恢复或重新熔断）
+            oss_key_id = k.id
 
             # 中文说明：兼容不同字段命名（snake/camel）
             oss_endpoint = oss_endpoint or str(extra.get("endpoint") or extra.get("oss_endpoint") or "").strip()
@@ -352,7 +407,9 @@ async def upload_image(
         try:
             bucket.put_object(obj_key, raw)
         except Exception as exc:
+            report_key_error(oss_key_id, exc)
             raise HTTPException(status_code=400, detail=f"上传 OSS 失败：{exc}") from exc
+        report_key_success(oss_key_id)
 
         if oss_public_base:
             url = f"{oss_public_base}/{obj_key.lstrip('/')}"
@@ -16,12 +16,27 @@ celery_app = Celery(
         "app.tasks.publish",
         "app.tasks.morning_brief",
         "app.tasks.datasource",  # 数据源定时扫描与触发
+        "app.tasks.stats",  # 首页统计计数校准
     ],
 )
 
 celery_app.conf.update(
     timezone=settings.CELERY_TIMEZONE,
     enable_utc=False,
+    # 中文说明：未显式指定队列的任务统一进入 default（与 beat 的 options.queue 保持一致）
+    task_default_queue="default",
+    # 数据源抓取任务单独成队列，可按 worker 数量水平扩展：celery ... worker -Q default,datasource
+    task_routes={
+        "app.tasks.datasource.trigger_datasource_task": {"queue": settings.DATASOURCE_TASK_QUEUE},
+    },
+    # Redis broker 的优先级支持：0~9 共 10 档（数值越小越优先）
+    broker_transport_options={
+        "priority_steps": list(range(10)),
+        "sep": ":",
+        "queue_order_strategy": "priority",
+    },
+    # 抓取任务耗时较长：每个 worker 进程只预取 1 个，避免慢任务把其它到期任务压在本地队列里
+    worker_prefetch_multiplier=1,
 )
 
 if settings.CELERY_ALWAYS_EAGER:
@@ -78,3 +93,10 @@ celery_app.conf.beat_schedule["scan-datasource-schedule"] = {
     "schedule": crontab(minute="*/1"),
     "options": {"queue": "default"},
 }
+
+# 首页统计计数校准：按真实表重算，修正批量删除等绕过增量维护的偏差
+celery_app.conf.beat_schedule["reconcile-stat-counters"] = {
+    "task": "app.tasks.stats.reconcile_stat_counters_task",
+    "schedule": crontab(minute=f"*/{max(1, int(settings.STAT_COUNTERS_RECONCILE_MINUTES or 10))}"),
+    "options": {"queue": "default"},
+}
@@ -31,6 +31,39 @@ class Settings:
             "on",
         }
 
+        # 数据源抓取任务的 Celery 队列与默认优先级（0~9，Redis broker 下数值越小越优先；数据源 config.queue/config.priority 可覆盖）
+        self.DATASOURCE_TASK_QUEUE: str = os.getenv("DATASOURCE_TASK_QUEUE", "datasource")
+        self.DATASOURCE_TASK_PRIORITY: int = int(os.getenv("DATASOURCE_TASK_PRIORITY", "5"))
+
+        # 数据源运行互斥租约时长（秒）：执行期间心跳每 ttl/3 续约；进程崩溃后最多 ttl 秒自动释放
+        self.RUN_LOCK_TTL_SECONDS: int = int(os.getenv("RUN_LOCK_TTL_SECONDS", "120"))
+
+        # URL 数据源抓取队列检查点：每抓取 N 个页面提交一次已抓内容并写检查点；检查点保留时长（秒）
+        self.CRAWL_CHECKPOINT_EVERY: int = int(os.getenv("CRAWL_CHECKPOINT_EVERY", "10"))
+        self.CRAWL_FRONTIER_TTL_SECONDS: int = int(os.getenv("CRAWL_FRONTIER_TTL_SECONDS", "86400"))
+
+        # URL 数据源跨运行“已抓取子页面”布隆过滤器：容量与误判率（数据源 config.seen_filter 可覆盖）
+        self.CRAWL_SEEN_FILTER_CAPACITY: int = int(os.getenv("CRAWL_SEEN_FILTER_CAPACITY", "200000"))
+        self.CRAWL_SEEN_FILTER_ERROR_RATE: float = float(os.getenv("CRAWL_SEEN_FILTER_ERROR_RATE", "0.001"))
+
+        # 抓取记录列表总数缓存（秒）：翻页时不再重复 COUNT(*)
+        self.CRAWL_RECORD_COUNT_CACHE_SECONDS: int = int(os.getenv("CRAWL_RECORD_COUNT_CACHE_SECONDS", "30"))
+
+        # 首页统计：计数器校准间隔（分钟）与统计结果缓存时长（秒）
+        self.STAT_COUNTERS_RECONCILE_MINUTES: int = int(os.getenv("STAT_COUNTERS_RECONCILE_MINUTES", "10"))
+        self.DASHBOARD_STATS_CACHE_SECONDS: int = int(os.getenv("DASHBOARD_STATS_CACHE_SECONDS", "15"))
+
+        # 升级建立素材条目唯一索引前，是否在启动时自动删除历史重复条目（默认关闭；被删 ID 会记录到日志）
+        self.MATERIAL_DEDUPE_ON_STARTUP: bool = os.getenv("MATERIAL_DEDUPE_ON_STARTUP", "false").lower() in {
+            "1",
+            "true",
+            "yes",
+            "on",
+        }
+
+        # 元素选择器页面预览/子页面发现：抓取结果与预览 HTML 缓存时长（秒），0 表示关闭
+        self.PAGE_PREVIEW_CACHE_SECONDS: int = int(os.getenv("PAGE_PREVIEW_CACHE_SECONDS", "300"))
+
         self.DAILY_HOTSPOT_BEAT_ENABLED: bool = os.getenv(
             "DAILY_HOTSPOT_BEAT_ENABLED", "false"
         ).lower() in {
@@ -42,6 +75,8 @@ class Settings:
         self.DAILY_HOTSPOT_CRON: str = os.getenv("DAILY_HOTSPOT_CRON", "5 2 * * *")
         self.DAILY_HOTSPOT_LIMIT: int = int(os.getenv("DAILY_HOTSPOT_LIMIT", "20"))
         self.DAILY_HOTSPOT_DAY_OFFSET: int = int(os.getenv("DAILY_HOTSPOT_DAY_OFFSET", "-1"))
+        # 热点榜单/详情响应缓存时长（秒）：重建榜单时按代次失效；0 表示关闭
+        self.DAILY_HOTSPOT_CACHE_SECONDS: int = int(os.getenv("DAILY_HOTSPOT_CACHE_SECONDS", "600"))
 
         # Morning Brief (Scenario C)
         self.MORNING_BRIEF_ENABLED: bool = os.getenv(
@@ -101,6 +136,28 @@ class Settings:
         self.MODEL_MOONSHOT_MODEL: str | None = os.getenv("MODEL_MOONSHOT_MODEL")
         self.MODEL_MOONSHOT_API_BASE: str | None = os.getenv("MODEL_MOONSHOT_API_BASE")
 
+        # API Key 池：key ring 本地缓存最长有效期（秒；变更时会主动失效），使用统计批量回写间隔（秒）
+        self.API_KEY_RING_TTL_SECONDS: int = int(os.getenv("API_KEY_RING_TTL_SECONDS", "60"))
+        self.API_KEY_USAGE_FLUSH_SECONDS: int = int(os.getenv("API_KEY_USAGE_FLUSH_SECONDS", "5"))
+
+        # API Key 熔断：连续失败阈值、基础冷却（秒，按熔断次数指数退避）、最长冷却（秒，401/403 直接使用）
+        self.API_KEY_FAILURE_THRESHOLD: int = int(os.getenv("API_KEY_FAILURE_THRESHOLD", "3"))
+        self.API_KEY_COOLDOWN_SECONDS: int = int(os.getenv("API_KEY_COOLDOWN_SECONDS", "30"))
+        self.API_KEY_MAX_COOLDOWN_SECONDS: int = int(os.getenv("API_KEY_MAX_COOLDOWN_SECONDS", "600"))
+
+        # 外部接口限流（模型/Firecrawl/阿里统一搜索）：0 表示不限制
+        # 供应商级 JSON，如 {"deepseek": {"max_inflight": 8, "rpm": 300, "tpm": 200000}, "firecrawl": {"max_inflight": 4}}
+        self.RATE_LIMIT_PROVIDER_LIMITS: str = os.getenv("RATE_LIMIT_PROVIDER_LIMITS", "")
+        # key 级默认值（API Key 池 extra.max_inflight/rpm/tpm 可单独覆盖）
+        self.RATE_LIMIT_KEY_MAX_INFLIGHT: int = int(os.getenv("RATE_LIMIT_KEY_MAX_INFLIGHT", "0"))
+        self.RATE_LIMIT_KEY_RPM: int = int(os.getenv("RATE_LIMIT_KEY_RPM", "0"))
+        self.RATE_LIMIT_KEY_TPM: int = int(os.getenv("RATE_LIMIT_KEY_TPM", "0"))
+        # 名额不足时的最长排队等待（秒），超时才报错
+        self.RATE_LIMIT_WAIT_SECONDS: int = int(os.getenv("RATE_LIMIT_WAIT_SECONDS", "30"))
+
+        # 多供应商路由（provider=router/auto）：API Key 池 router.extra.providers 未配置时的兜底列表（逗号分隔）
+        self.MODEL_ROUTER_PROVIDERS: str = os.getenv("MODEL_ROUTER_PROVIDERS", "")
+
         self.GENERATION_TONE: str = os.getenv("GENERATION_TONE", "专业且亲和")
         self.GENERATION_LENGTH: int = int(os.getenv("GENERATION_LENGTH", "800"))
 
@@ -129,6 +186,11 @@ class Settings:
             os.getenv("MATERIAL_COMPRESS_BULLET_COUNT", "6")
         )
 
+        # Prompt token 预算：按供应商本地估算 token，超出预算时按优先级裁剪素材与参考来源（<=0 表示不限制）
+        self.PROMPT_TOKEN_BUDGET: int = int(os.getenv("PROMPT_TOKEN_BUDGET", "12000"))
+        # 单条素材被截断保留的最小 token 数（剩余预算低于该值时直接丢弃该条）
+        self.PROMPT_BUDGET_MIN_ENTRY_TOKENS: int = int(os.getenv("PROMPT_BUDGET_MIN_ENTRY_TOKENS", "40"))
+
         # 鉴权/用户体系
         self.SECRET_KEY: str = os.getenv("SECRET_KEY", "dev-secret-change-me")
         self.JWT_ALGORITHM: str = os.getenv("JWT_ALGORITHM", "HS256")
@@ -142,6 +204,8 @@ class Settings:
             "yes",
             "on",
         }
+        # 鉴权用户/角色菜单进程内缓存时长（秒）：修改用户/角色后随提交失效（Redis 广播到其它进程）；0 表示关闭
+        self.AUTH_CACHE_SECONDS: int = int(os.getenv("AUTH_CACHE_SECONDS", "30"))
 
 
 @lru_cache
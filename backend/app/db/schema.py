@@ -0,0 +1,83 @@
+"""启动时的轻量表结构补齐。
+
+中文说明：
+- 项目没有引入迁移工具，启动时依赖 Base.metadata.create_all 建表；但 create_all 只会创建“缺失的表”，
+  已存在的表上新增的列/索引不会自动补上；
+- 这里按模型定义补齐已存在表上缺失的列（仅限可空列或带默认值的列）与索引；
+- 只做“新增”，不做修改/删除，失败时打印告警但不阻塞启动（与 on_startup 中默认账号的处理一致）。
+"""
+
+from __future__ import annotations
+
+import logging
+from typing import Optional
+
+from sqlalchemy import inspect
+from sqlalchemy.engine import Engine
+from sqlalchemy.schema import Column, CreateIndex, Table
+
+from app.db.base import Base
+
+
+logger = logging.getLogger("uvicorn.error")
+
+
+def _column_ddl(engine: Engine, col: Column) -> Optional[str]:
+    if not col.nullable and col.server_default is None:
+        # 中文说明：已有数据的表无法直接新增 NOT NULL 且无默认值的列，交给人工迁移
+        return None
+    col_type = col.type.compile(dialect=engine.dialect)
+    ddl = f"{engine.dialect.identifier_preparer.quote(col.name)} {col_type}"
+    arg = getattr(col.server_default, "arg", None)
+    if arg is not None:
+        if isinstance(arg, str):
+            default = "'" + arg.replace("'", "''") + "'"
+        else:
+            default = str(arg.compile(dialect=engine.dialect))
+        ddl += f" DEFAULT {default}"
+    if not col.nullable:
+        ddl += " NOT NULL"
+    return ddl
+
+
+def _ensure_table(engine: Engine, table: Table) -> None:
+    insp = inspect(engine)
+    existing_cols = {c["name"] for c in insp.get_columns(table.name)}
+    table_sql = engine.dialect.identifier_preparer.format_table(table)
+
+    for col in table.columns:
+        if col.name in existing_cols:
+            continue
+        ddl = _column_ddl(engine, col)
+        if ddl is None:
+            logger.warning("[schema] %s.%s 为 NOT NULL 且无默认值，跳过自动补齐", table.name, col.name)
+            continue
+        with engine.begin() as conn:
+            conn.exec_driver_sql(f"ALTER TABLE {table_sql} ADD COLUMN {ddl}")
+        logger.info("[schema] 已补齐列 %s.%s", table.name, col.name)
+
+    existing_idx = {i.get("name") for i in insp.get_indexes(table.name)}
+    existing_idx |= {u.get("name") for u in insp.get_unique_constraints(table.name)}
+    for idx in table.indexes:
+        if not idx.name or idx.name in existing_idx:
+            continue
+        ddl_if = getattr(idx, "_ddl_if", None)
+        if ddl_if is not None and ddl_if.dialect and ddl_if.dialect != engine.dialect.name:
+            # 中文说明：仅特定数据库创建的索引（如 MySQL FULLTEXT）
+            continue
+        with engine.begin() as conn:
+            conn.execute(CreateIndex(idx))
+        logger.info("[schema] 已补齐索引 %s.%s", table.name, idx.name)
+
+
+def ensure_schema(engine: Engine) -> None:
+    """补齐已存在表上缺失的列与索引。"""
+    insp = inspect(engine)
+    existing_tables = set(insp.get_table_names())
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        try:
+            _ensure_table(engine, table)
+        except Exception as exc:
+            logger.warning("[schema] 补齐表结构失败 %s: %s", table.name, exc)
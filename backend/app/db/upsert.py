@@ -0,0 +1,40 @@
+"""按数据库方言构建 INSERT ... ON DUPLICATE KEY / ON CONFLICT 语句。
+
+中文说明：
+- 生产使用 MySQL（ON DUPLICATE KEY UPDATE / INSERT IGNORE），单测与本地体验使用 SQLite（ON CONFLICT）；
+- 调用方只描述“冲突时如何更新”，不关心方言差异；
+- set_fn 接收“本次待插入的新值”命名空间（MySQL 的 inserted / SQLite 的 excluded），返回需要更新的列；
+  为 None 时冲突行直接忽略（不更新）。
+"""
+
+from __future__ import annotations
+
+from typing import Any, Callable, Optional, Sequence
+
+from sqlalchemy import Table
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.engine import Dialect
+
+
+def build_upsert(
+    dialect: Dialect,
+    table: Table,
+    rows: Sequence[dict[str, Any]],
+    *,
+    index_elements: Sequence[str],
+    set_fn: Optional[Callable[[Any], dict[str, Any]]] = None,
+):
+    """构建多行 upsert 语句；index_elements 为唯一键列（SQLite/PostgreSQL 需要，MySQL 按表上的唯一键判断）。"""
+    name = dialect.name
+    if name == "mysql":
+        stmt = mysql.insert(table).values(list(rows))
+        if set_fn is None:
+            return stmt.prefix_with("IGNORE")
+        return stmt.on_duplicate_key_update(**set_fn(stmt.inserted))
+    if name in {"sqlite", "postgresql"}:
+        mod = sqlite if name == "sqlite" else postgresql
+        stmt = mod.insert(table).values(list(rows))
+        if set_fn is None:
+            return stmt.on_conflict_do_nothing(index_elements=list(index_elements))
+        return stmt.on_conflict_do_update(index_elements=list(index_elements), set_=set_fn(stmt.excluded))
+    raise NotImplementedError(f"不支持的数据库方言：{name}")
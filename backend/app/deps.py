@@ -11,6 +11,7 @@ from app.core.config import get_settings
 from app.core.security import decode_token
 from app.db.session import SessionLocal
 from app.models.user import User
+from app.services import auth_cache
 from app.services.user_service import ensure_default_admin, is_admin
 from app.services.role_service import get_role_menus
 
@@ -48,7 +49,15 @@ def get_current_user(
     except JWTError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token 无效或已过期")
 
-    user = db.query(User).filter(User.username == payload.username).first()
+    # 中文说明：按 token 中的用户 ID 命中进程内缓存则不再查库；用户被修改/停用后缓存随提交失效
+    user = None
+    if payload.sub.isdigit():
+        user = auth_cache.get_user(db, int(payload.sub), payload.username)
+    if user is None:
+        gen = auth_cache.generation()
+        user = db.query(User).filter(User.username == payload.username).first()
+        if user:
+            auth_cache.put_user(user, gen)
     if not user or not user.is_active:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="用户不存在或已停用")
 
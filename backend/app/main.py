@@ -8,7 +8,10 @@ from sqlalchemy import inspect, text
 from app.api.v1.router import api_router
 from app.core.config import get_settings
 from app.db.base import Base
+from app.db.schema import ensure_schema
 from app.db.session import engine, SessionLocal
+from app.services.material_items import ensure_unique_hash_ready
+from app.services.material_search import ensure_term_index
 from app.services.user_service import ensure_default_admin
 from app.services.role_service import ensure_default_roles
 import app.models
@@ -35,6 +38,18 @@ app.add_middleware(
 def on_startup() -> None:
     """启动时创建表，方便本地快速体验"""
     Base.metadata.create_all(bind=engine)
+    # 中文说明：素材条目 (pack_id, text_hash) 唯一索引补建前修正 hash；遗留重复条目仅在显式开启 MATERIAL_DEDUPE_ON_STARTUP 时清理
+    db = SessionLocal()
+    try:
+        ensure_unique_hash_ready(db)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"[WARNING] 清理重复素材条目失败: {e}")
+    finally:
+        db.close()
+    # 中文说明：create_all 不会给已存在的表补列/索引，这里按模型定义补齐
+    ensure_schema(engine)
     
     # 中文说明：确保默认管理员账号存在（若 users 表为空则自动创建）
     db = SessionLocal()
@@ -48,6 +63,17 @@ def on_startup() -> None:
     finally:
         db.close()
 
+    # 中文说明：非 MySQL 环境的素材检索倒排表，为升级前的历史条目补建词项
+    db = SessionLocal()
+    try:
+        ensure_term_index(db)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"[WARNING] 补建素材检索索引失败: {e}")
+    finally:
+        db.close()
+
 
 @app.get("/health", summary="健康检查")
 def health() -> dict:
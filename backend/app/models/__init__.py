@@ -1,13 +1,16 @@
 # 便于导入模型
 from app.models.datasource import DataSource  # noqa: F401
 from app.models.datasource_content import DataSourceContent  # noqa: F401
+from app.models.datasource_run import DataSourceRun  # noqa: F401
 from app.models.article import Article  # noqa: F401
 from app.models.prompt_template import PromptTemplate  # noqa: F401
 from app.models.event_cluster import EventCluster, EventClusterSource, EventClusterItem  # noqa: F401
 from app.models.material_pack import MaterialPack  # noqa: F401
 from app.models.material_item import MaterialItem  # noqa: F401
+from app.models.material_item_term import MaterialItemTerm  # noqa: F401
 from app.models.api_key import ApiKey  # noqa: F401
 from app.models.publish_account import PublishAccount  # noqa: F401
 from app.models.publish_task import PublishTask  # noqa: F401
 from app.models.user import User  # noqa: F401
 from app.models.role import Role  # noqa: F401
+from app.models.stat_counter import StatCounter  # noqa: F401
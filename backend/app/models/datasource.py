@@ -1,6 +1,6 @@
 from datetime import datetime
 
-from sqlalchemy import Boolean, JSON, Column, DateTime, ForeignKey, Integer, String
+from sqlalchemy import Boolean, JSON, Column, DateTime, ForeignKey, Index, Integer, String
 
 from app.db.base import Base
 
@@ -9,6 +9,10 @@ class DataSource(Base):
     """数据源信息表，记录采集入口与配置"""
 
     __tablename__ = "data_sources"
+    __table_args__ = (
+        # 中文说明：定时扫描按 enable_schedule + next_run_at <= now 走索引范围查询
+        Index("ix_data_sources_schedule_due", "enable_schedule", "next_run_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True, comment="主键")
 
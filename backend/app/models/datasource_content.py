@@ -1,11 +1,26 @@
 from datetime import datetime
+from typing import Optional
 
 from sqlalchemy import Column, DateTime, ForeignKey, Integer, JSON, String, Text, Index
 from sqlalchemy.dialects.mysql import LONGTEXT
+from sqlalchemy.orm import validates
 
 from app.db.base import Base
 
 
+CONTENT_PREVIEW_MAX_LEN = 200
+
+
+def build_content_preview(content: Optional[str], max_len: int = CONTENT_PREVIEW_MAX_LEN) -> str:
+    """构建内容预览：去掉多余空白并截断，避免列表接口返回超长文本。"""
+    if content is None:
+        return ""
+    text = content.strip().replace("\r\n", "\n").replace("\r", "\n")
+    if len(text) <= max_len:
+        return text
+    return text[:max_len] + "..."
+
+
 class DataSourceContent(Base):
     """数据源采集到的原始内容存储表"""
 
@@ -22,6 +37,8 @@ class DataSourceContent(Base):
     url_hash = Column(String(32), nullable=True, index=True, comment="URL 的 md5（用于高效索引查询）")
     title = Column(String(255), nullable=True, comment="内容标题/来源标识，如 URL 或文件名")
     content = Column(Text().with_variant(LONGTEXT, "mysql"), nullable=False, comment="抓取/读取到的原始文本内容")
+    # 中文说明：列表页只需要预览，写入 content 时同步生成，列表查询不再读取 LONGTEXT 正文
+    content_preview = Column(String(255), nullable=True, comment="内容预览（前 200 字）")
     extra = Column(JSON, nullable=True, comment="额外元信息，如状态码、请求参数、headers")
     fetched_at = Column(DateTime, default=datetime.now, nullable=False, comment="抓取时间")
 
@@ -32,4 +49,13 @@ class DataSourceContent(Base):
             "url_hash",
             "fetched_at",
         ),
+        # 中文说明：列表按 (fetched_at, id) 倒序游标分页，分别覆盖“全部/按用户/按数据源”三种筛选
+        Index("ix_dsc_fetched_id", "fetched_at", "id"),
+        Index("ix_dsc_user_fetched_id", "user_id", "fetched_at", "id"),
+        Index("ix_dsc_ds_fetched_id", "datasource_id", "fetched_at", "id"),
     )
+
+    @validates("content")
+    def _sync_content_preview(self, key: str, value: str) -> str:
+        self.content_preview = build_content_preview(value)
+        return value
@@ -0,0 +1,39 @@
+from datetime import datetime
+
+from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Index, Integer, JSON, String, Text
+
+from app.db.base import Base
+
+
+class DataSourceRun(Base):
+    """数据源运行历史表：每次抓取写入一行（统计/耗时/跳过明细），便于排障与吞吐趋势分析"""
+
+    __tablename__ = "datasource_runs"
+
+    id = Column(Integer, primary_key=True, index=True, comment="主键")
+    datasource_id = Column(Integer, ForeignKey("data_sources.id"), nullable=False, comment="关联数据源 ID")
+
+    # 中文说明：与数据源归属一致，便于按用户做数据隔离
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True, index=True, comment="数据源归属用户 ID")
+    triggered_by = Column(Integer, nullable=True, comment="手动触发的用户 ID（定时任务为空）")
+
+    run_id = Column(String(32), nullable=True, comment="运行标识（与运行互斥锁中的 run_id 一致）")
+    source = Column(String(20), nullable=False, default="manual", comment="触发来源：manual/schedule/task")
+    force = Column(Boolean, nullable=False, default=False, comment="是否强制重抓")
+    status = Column(String(20), nullable=False, default="success", comment="运行结果：success/failed")
+
+    started_at = Column(DateTime, nullable=False, default=datetime.now, comment="开始时间")
+    finished_at = Column(DateTime, nullable=True, comment="结束时间")
+    elapsed_ms = Column(Integer, nullable=True, comment="总耗时（毫秒）")
+    timings = Column(JSON, nullable=True, comment="分阶段耗时（毫秒），如 fetch/persist")
+
+    ingested = Column(Integer, nullable=False, default=0, comment="本次入库条数")
+    dedup_skipped = Column(Integer, nullable=False, default=0, comment="去重跳过条数")
+    empty_skipped = Column(Integer, nullable=False, default=0, comment="空内容跳过条数")
+    fetch_failed = Column(Integer, nullable=False, default=0, comment="抓取失败条数")
+    skipped_details = Column(JSON, nullable=True, comment="跳过明细（最多保存 50 条）")
+    error = Column(Text, nullable=True, comment="失败原因")
+
+    __table_args__ = (
+        Index("ix_datasource_runs_ds_started", "datasource_id", "started_at"),
+    )
@@ -19,6 +19,8 @@ class EventCluster(Base):
     title = Column(String(255), nullable=False, comment="事件标题")
     summary = Column(Text, nullable=True, comment="一句话摘要")
     hot_score = Column(Float, nullable=False, default=0.0, comment="热度评分")
+    # 中文说明：冗余来源数，构建榜单时写入；为空表示升级前的历史事件，读取方按来源表聚合兜底
+    source_count = Column(Integer, nullable=True, comment="来源数量（冗余）")
 
     keywords = Column(JSON, nullable=True, comment="关键词列表")
     extra = Column(JSON, nullable=True, comment="扩展字段")
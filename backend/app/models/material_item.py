@@ -45,4 +45,13 @@ class MaterialItem(Base):
 
     __table_args__ = (
         Index("ix_material_items_pack_type", "pack_id", "item_type"),
+        # 中文说明：同一素材包内同类型同文本只保留一条（text_hash 含类型），由数据库在写入时保证去重
+        Index("ux_material_items_pack_hash", "pack_id", "text_hash", unique=True),
+        # 中文说明：素材检索用的全文索引（MySQL ngram 分词，支持中文）；其它数据库见 material_item_terms
+        Index(
+            "ft_material_items_text",
+            "text",
+            mysql_prefix="FULLTEXT",
+            mysql_with_parser="ngram",
+        ).ddl_if(dialect="mysql"),
     )
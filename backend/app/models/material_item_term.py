@@ -0,0 +1,26 @@
+from __future__ import annotations
+
+from sqlalchemy import Column, Index, Integer, String
+
+from app.db.base import Base
+
+
+class MaterialItemTerm(Base):
+    """素材条目倒排索引（非 MySQL 环境的全文检索兜底）。
+
+    中文说明：
+    - MySQL 使用 material_items.text 上的 FULLTEXT(ngram) 索引，本表保持为空；
+    - SQLite 等不支持 ngram 全文索引的数据库，由 material_search 在条目增删改时同步维护词项；
+    - 不加外键：条目删除时由 material_search 先删词项，避免删除顺序受外键约束影响。
+    """
+
+    __tablename__ = "material_item_terms"
+
+    id = Column(Integer, primary_key=True, index=True, comment="主键")
+    item_id = Column(Integer, nullable=False, index=True, comment="素材条目 ID")
+    term = Column(String(32), nullable=False, comment="词项：中文二元组 / 英文数字词")
+    tf = Column(Integer, nullable=False, default=1, comment="词频")
+
+    __table_args__ = (
+        Index("ix_material_item_terms_term_item", "term", "item_id"),
+    )
@@ -1,6 +1,6 @@
 from datetime import datetime
 
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, Text
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String, Text
 
 from app.db.base import Base
 
@@ -19,3 +19,14 @@ class MaterialPack(Base):
     description = Column(Text, nullable=True, comment="素材包描述")
 
     created_at = Column(DateTime, default=datetime.now, nullable=False, comment="创建时间")
+
+    __table_args__ = (
+        # 中文说明：素材包名称/描述的全文索引（MySQL ngram 分词）
+        Index(
+            "ft_material_packs_name_desc",
+            "name",
+            "description",
+            mysql_prefix="FULLTEXT",
+            mysql_with_parser="ngram",
+        ).ddl_if(dialect="mysql"),
+    )
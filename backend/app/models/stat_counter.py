@@ -0,0 +1,23 @@
+from datetime import datetime
+
+from sqlalchemy import BigInteger, Column, DateTime, Integer, String, UniqueConstraint
+
+from app.db.base import Base
+
+
+class StatCounter(Base):
+    """统计计数表：按指标/用户/时间桶累计，首页统计直接读取，不再对大表做 COUNT(*)"""
+
+    __tablename__ = "stat_counters"
+
+    id = Column(Integer, primary_key=True, index=True, comment="主键")
+    metric = Column(String(32), nullable=False, comment="指标：articles/crawl_records")
+    # 中文说明：0 表示全局合计（不用 NULL，保证唯一键生效）
+    scope_user_id = Column(Integer, nullable=False, default=0, comment="所属用户 ID，0 表示全局")
+    bucket = Column(String(10), nullable=False, comment="时间桶：total 或 YYYY-MM-DD")
+    value = Column(BigInteger, nullable=False, default=0, comment="计数值")
+    updated_at = Column(DateTime, nullable=False, default=datetime.now, onupdate=datetime.now, comment="更新时间")
+
+    __table_args__ = (
+        UniqueConstraint("metric", "scope_user_id", "bucket", name="uq_stat_counters_metric_scope_bucket"),
+    )
@@ -13,6 +13,7 @@ from sqlalchemy.orm.attributes import flag_modified
 
 from app.models.datasource import DataSource
 from app.models.datasource_content import DataSourceContent
+from app.models.datasource_run import DataSourceRun
 
 
 class DataSourceRepository:
@@ -53,7 +54,8 @@ class DataSourceRepository:
         return ds
 
     def delete(self, ds: DataSource) -> None:
-        """删除数据源"""
+        """删除数据源（运行历史随之删除）"""
+        self.db.query(DataSourceRun).filter(DataSourceRun.datasource_id == ds.id).delete(synchronize_session=False)
         self.db.delete(ds)
         self.db.commit()
 
@@ -67,34 +69,77 @@ class DataSourceRepository:
         ds.last_run_at = last_run_at
         ds.next_run_at = next_run_at
 
-    def update_config_with_trigger_report(
-        self,
-        ds: DataSource,
-        trigger_report: dict,
-        contents_count: int,
-        force: bool,
-    ) -> None:
+    def drop_legacy_trigger_report(self, ds: DataSource) -> None:
         """
-        更新数据源配置，写入触发报告
+        移除历史版本写在 config 中的 _last_trigger 报告（运行报告已改存 datasource_runs）
         注意：SQLAlchemy 的 JSON 字段默认不追踪 dict 原地修改，必须拷贝并标记修改
         """
-        cfg = dict(ds.config) if isinstance(ds.config, dict) else {}
-        now_naive = datetime.now()
-        report_stats = trigger_report.get("stats") if isinstance(trigger_report, dict) else None
-        report_skipped = trigger_report.get("skipped_details") if isinstance(trigger_report, dict) else None
-
-        cfg["_last_trigger"] = {
-            "triggered_at": now_naive.isoformat(),
-            "force": bool(force),
-            "ingested": contents_count,
-            "stats": report_stats,
-            # 控制体积，最多保存 50 条跳过明细
-            "skipped_details": (report_skipped[:50] if isinstance(report_skipped, list) else []),
-        }
+        if not isinstance(ds.config, dict) or "_last_trigger" not in ds.config:
+            return
+        cfg = dict(ds.config)
+        cfg.pop("_last_trigger", None)
         ds.config = cfg
         flag_modified(ds, "config")
 
 
+class DataSourceRunRepository:
+    """DataSourceRun 数据仓库"""
+
+    # 控制体积，最多保存 50 条跳过明细
+    MAX_SKIPPED_DETAILS = 50
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def add_run(
+        self,
+        ds: DataSource,
+        *,
+        run_info: dict,
+        started_at: datetime,
+        status: str,
+        ingested: int = 0,
+        stats: Optional[dict] = None,
+        skipped_details: Optional[list] = None,
+        timings: Optional[dict] = None,
+        error: Optional[str] = None,
+    ) -> DataSourceRun:
+        """记录一次运行（单条 insert，随调用方事务提交）"""
+        finished_at = datetime.now()
+        stats = stats if isinstance(stats, dict) else {}
+        run = DataSourceRun(
+            datasource_id=ds.id,
+            user_id=ds.user_id,
+            triggered_by=run_info.get("user_id"),
+            run_id=run_info.get("run_id"),
+            source=str(run_info.get("source") or "manual"),
+            force=bool(run_info.get("force")),
+            status=status,
+            started_at=started_at,
+            finished_at=finished_at,
+            elapsed_ms=int((finished_at - started_at).total_seconds() * 1000),
+            timings=timings or None,
+            ingested=int(ingested or 0),
+            dedup_skipped=int(stats.get("dedup_skipped") or 0),
+            empty_skipped=int(stats.get("empty_skipped") or 0),
+            fetch_failed=int(stats.get("fetch_failed") or 0),
+            skipped_details=(skipped_details[: self.MAX_SKIPPED_DETAILS] if isinstance(skipped_details, list) else None),
+            error=(error[:2000] if error else None),
+        )
+        self.db.add(run)
+        return run
+
+    def list_by_datasource(self, datasource_id: int, limit: int = 20) -> List[DataSourceRun]:
+        """按开始时间倒序列出运行历史"""
+        return (
+            self.db.query(DataSourceRun)
+            .filter(DataSourceRun.datasource_id == datasource_id)
+            .order_by(desc(DataSourceRun.started_at), desc(DataSourceRun.id))
+            .limit(limit)
+            .all()
+        )
+
+
 class DataSourceContentRepository:
     """DataSourceContent 数据仓库"""
 
@@ -34,6 +34,9 @@ class ApiKeyOut(BaseModel):
     updated_at: datetime
     key_masked: str = ""
     extra: Optional[Dict[str, Any]] = None
+    health: Optional[Dict[str, Any]] = Field(
+        None, description="健康状态：failures/last_error/cooldown_until（为空表示健康）"
+    )
 
 
 class ApiKeyListResponse(BaseModel):
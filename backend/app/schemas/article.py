@@ -36,6 +36,28 @@ class ArticleOut(ArticleBase):
     model_config = ConfigDict(from_attributes=True)
 
 
+class ArticleListItem(BaseModel):
+    """文章列表项（轻量投影，不含正文/Prompt 等大字段，详情请调用单篇接口）。"""
+
+    id: int
+    title: str
+    summary: Optional[str] = None
+    llm_provider: Optional[str] = None
+    llm_model: Optional[str] = None
+    material_pack_id: Optional[int] = None
+    material_item_count: int = Field(0, description="引用素材条目数")
+    source_ref_count: int = Field(0, description="引用数据源个数")
+    created_at: datetime
+
+
+class ArticleListResponse(BaseModel):
+    total: int
+    limit: int
+    offset: int
+    next_cursor: Optional[str] = Field(None, description="下一页游标；为空表示没有更多数据")
+    items: List[ArticleListItem]
+
+
 class ArticleUpdate(BaseModel):
     """文章更新（软文管理：手工编辑保存）。"""
 
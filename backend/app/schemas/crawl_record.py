@@ -71,6 +71,7 @@ class CrawlRecordListResponse(BaseModel):
     total: int = Field(..., description="总数")
     limit: int = Field(..., description="分页大小")
     offset: int = Field(..., description="偏移量")
+    next_cursor: Optional[str] = Field(None, description="下一页游标；为空表示没有更多数据")
     items: List[CrawlRecordOut] = Field(..., description="列表数据")
 
 
@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
 
 from pydantic import BaseModel, ConfigDict, Field
 
@@ -32,10 +32,32 @@ class DataSourceUpdate(BaseModel):
     enable_schedule: Optional[bool] = Field(None, description="是否开启定时抓取")
 
 
+class DataSourceRunOut(BaseModel):
+    id: int
+    datasource_id: int
+    run_id: Optional[str] = None
+    source: str
+    force: bool
+    status: str
+    started_at: datetime
+    finished_at: Optional[datetime] = None
+    elapsed_ms: Optional[int] = None
+    timings: Dict[str, Any] | None = Field(None, description="分阶段耗时（毫秒）")
+    ingested: int = 0
+    dedup_skipped: int = 0
+    empty_skipped: int = 0
+    fetch_failed: int = 0
+    skipped_details: List[Dict[str, Any]] | None = Field(None, description="跳过明细（最多 50 条）")
+    error: Optional[str] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+
 class DataSourceOut(DataSourceBase):
     id: int
     last_run_at: Optional[datetime] = None
     next_run_at: Optional[datetime] = None
     created_at: datetime
+    last_run: Optional[DataSourceRunOut] = Field(None, description="本次运行报告（仅手动触发接口返回）")
 
     model_config = ConfigDict(from_attributes=True)
@@ -67,11 +67,17 @@ class MaterialItemBatchCreateRequest(BaseModel):
     items: List[MaterialItemCreate]
 
 
+class MaterialItemSearchHit(MaterialItemOut):
+    score: float = Field(0.0, description="相关度（无关键字时为 0）")
+    highlight: Optional[str] = Field(None, description="命中片段（已 HTML 转义，命中词以 <mark> 包裹）")
+
+
 class MaterialItemSearchResponse(BaseModel):
     total: int
     limit: int
     offset: int
-    items: List[MaterialItemOut]
+    next_cursor: Optional[str] = Field(None, description="下一页游标；为空表示没有更多数据")
+    items: List[MaterialItemSearchHit]
 
 
 class DedupeResponse(BaseModel):
@@ -0,0 +1,199 @@
+"""鉴权依赖的用户/角色菜单缓存。
+
+中文说明：
+- 每个鉴权请求都会按用户名查 users、require_menu 再查 roles，这里把两者缓存在进程内（短 TTL）：
+  用户按 ID 缓存列快照，命中时以 merge(load=False) 挂到当前 Session（不发 SQL，仍可正常修改/提交）；
+  角色菜单按角色 key 缓存；
+- 失效：Session 提交了 User/Role 的增删改后，本进程立即清除对应条目，并通过 Redis 发布失效消息，
+  其它进程（多 worker / Celery）的订阅线程收到后同步清除；Redis 不可用时仅靠 TTL 兜底；
+- 读取与失效之间用“代次”防并发：读库期间若发生失效，本次结果不回填缓存，避免把旧数据写回。
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from typing import Any, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from app.core.config import get_settings
+from app.models.role import Role
+from app.models.user import User
+from app.services.redis_client import get_redis, redis_key
+
+
+logger = logging.getLogger("uvicorn.error")
+
+_CHANNEL = redis_key("auth_cache", "invalidate")
+# 中文说明：Session.info 中待失效的条目（"user:<id>" / "role:<key>"），提交后统一处理
+_PENDING_KEY = "auth_cache_pending"
+
+_LOCK = threading.Lock()
+_USERS: dict[int, tuple[dict[str, Any], float]] = {}
+_ROLE_MENUS: dict[str, tuple[list[str], float]] = {}
+_GEN = 0
+
+_SUBSCRIBER_PID: Optional[int] = None
+
+
+def _ttl() -> int:
+    return int(get_settings().AUTH_CACHE_SECONDS or 0)
+
+
+def generation() -> int:
+    """读库前取当前代次，回填时传回；期间发生过失效则放弃回填。"""
+    _ensure_subscriber()
+    return _GEN
+
+
+def _get(store: dict, key: Any) -> Any:
+    with _LOCK:
+        item = store.get(key)
+        if not item:
+            return None
+        if item[1] <= time.time():
+            store.pop(key, None)
+            return None
+        return item[0]
+
+
+def _put(store: dict, key: Any, value: Any, gen: int) -> None:
+    ttl = _ttl()
+    if ttl <= 0:
+        return
+    with _LOCK:
+        if gen != _GEN:
+            return
+        store[key] = (value, time.time() + ttl)
+
+
+def get_user(db: Session, user_id: int, username: str) -> Optional[User]:
+    """命中时返回挂到 db 上的 User（不查库）；未命中/用户名不一致返回 None。"""
+    if _ttl() <= 0:
+        return None
+    snap = _get(_USERS, int(user_id))
+    if not snap or snap.get("username") != username:
+        return None
+    user = User(**snap)
+    make_transient_to_detached(user)
+    return db.merge(user, load=False)
+
+
+def put_user(user: User, gen: int) -> None:
+    snap = {c.key: getattr(user, c.key) for c in User.__table__.columns}
+    _put(_USERS, int(user.id), snap, gen)
+
+
+def get_role_menus(role_key: str) -> Optional[list[str]]:
+    if _ttl() <= 0:
+        return None
+    menus = _get(_ROLE_MENUS, role_key)
+    return list(menus) if menus is not None else None
+
+
+def put_role_menus(role_key: str, menus: list[str], gen: int) -> None:
+    _put(_ROLE_MENUS, role_key, list(menus), gen)
+
+
+def _evict_local(tokens: list[str]) -> None:
+    global _GEN
+    with _LOCK:
+        _GEN += 1
+        for t in tokens:
+            kind, _, val = t.partition(":")
+            if kind == "user":
+                try:
+                    _USERS.pop(int(val), None)
+                except ValueError:
+                    pass
+            elif kind == "role":
+                _ROLE_MENUS.pop(val, None)
+            elif kind == "roles":
+                _ROLE_MENUS.clear()
+            else:
+                _USERS.clear()
+                _ROLE_MENUS.clear()
+
+
+def invalidate(*tokens: str) -> None:
+    """清除本进程条目并广播给其它进程；token 形如 user:<id> / role:<key> / roles / all。"""
+    if not tokens:
+        return
+    _evict_local(list(tokens))
+    client = get_redis()
+    if client is None:
+        return
+    try:
+        client.publish(_CHANNEL, " ".join(tokens))
+    except Exception:
+        pass
+
+
+def _subscriber_loop(pid: int) -> None:
+    global _SUBSCRIBER_PID
+    while _SUBSCRIBER_PID == pid:
+        client = get_redis()
+        if client is None:
+            return
+        pubsub = None
+        try:
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(_CHANNEL)
+            # 中文说明：（重新）订阅期间可能漏掉失效消息，保守起见清空本地缓存
+            _evict_local(["all"])
+            while _SUBSCRIBER_PID == pid:
+                msg = pubsub.get_message(timeout=1.0)
+                if msg and msg.get("type") == "message":
+                    _evict_local(str(msg.get("data") or "").split())
+        except Exception as exc:
+            logger.warning("[auth_cache] 失效订阅中断，稍后重连：%s", exc)
+            _evict_local(["all"])
+            time.sleep(3)
+        finally:
+            if pubsub is not None:
+                try:
+                    pubsub.close()
+                except Exception:
+                    pass
+
+
+def _ensure_subscriber() -> None:
+    """按进程懒启动订阅线程（fork 出的子进程会各自启动一份）。"""
+    global _SUBSCRIBER_PID
+    pid = os.getpid()
+    if _SUBSCRIBER_PID == pid or _ttl() <= 0 or get_redis() is None:
+        return
+    with _LOCK:
+        if _SUBSCRIBER_PID == pid:
+            return
+        _SUBSCRIBER_PID = pid
+    threading.Thread(target=_subscriber_loop, args=(pid,), name="auth-cache-invalidation", daemon=True).start()
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_on_flush(session: Session, flush_context) -> None:
+    tokens: set[str] = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, User) and obj.id is not None:
+            tokens.add(f"user:{obj.id}")
+        elif isinstance(obj, Role):
+            # 中文说明：角色 key 被修改时新旧 key 都要失效，这里直接整体清空角色菜单
+            tokens.add(f"role:{obj.key}" if obj.key and obj in session.new else "roles")
+    if tokens:
+        session.info.setdefault(_PENDING_KEY, set()).update(tokens)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_on_commit(session: Session) -> None:
+    tokens = session.info.pop(_PENDING_KEY, None)
+    if tokens:
+        invalidate(*sorted(tokens))
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_on_rollback(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,100 @@
+"""URL 数据源的抓取队列（frontier）检查点。
+
+中文说明：
+- 长分页/大量子页面的数据源一次运行可能持续很久，worker 崩溃或发版重启会丢失内存中的抓取队列；
+- 这里把队列（待抓 URL、已见集合、游标、已完成的子页面）按数据源持久化到 Redis，
+  抓取过程中定期写检查点，下一次运行（含任务重投）从检查点继续，而不是从第 1 页重新开始；
+- 检查点带“配置签名”：urls/分页/子页面发现等配置被修改后，旧检查点自动作废；
+- 正常跑完后删除检查点；检查点带过期时间（CRAWL_FRONTIER_TTL_SECONDS），避免陈旧队列被长期复用；
+- Redis 不可用或 pytest 下降级为进程内实现（仅同进程内可恢复）。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from typing import Any, Optional
+
+from app.core.config import get_settings
+from app.services.redis_client import get_redis, redis_key
+
+
+logger = logging.getLogger("uvicorn.error")
+
+
+_LOCAL: dict[str, tuple[str, float]] = {}
+_LOCAL_LOCK = threading.Lock()
+
+
+def frontier_signature(cfg: dict) -> str:
+    """抓取队列相关配置的签名（配置变化后检查点作废）。"""
+    c = cfg if isinstance(cfg, dict) else {}
+    keys = ("urls", "pagination", "auto_discover_sub", "max_sub_links", "parser", "sub_parser", "canonical", "discovery")
+    payload = json.dumps({k: c.get(k) for k in keys}, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+
+class CrawlFrontier:
+    """单个数据源的抓取队列检查点（读取/保存/清除）。"""
+
+    def __init__(self, datasource_id: int, signature: str, *, ttl_seconds: Optional[int] = None) -> None:
+        self.datasource_id = int(datasource_id)
+        self.signature = signature
+        self.ttl_seconds = int(
+            ttl_seconds or getattr(get_settings(), "CRAWL_FRONTIER_TTL_SECONDS", 86400) or 86400
+        )
+        self._key = redis_key("frontier", "datasource", self.datasource_id)
+
+    def load(self) -> Optional[dict]:
+        """读取检查点；不存在、已过期或配置签名不一致时返回 None。"""
+        raw: Optional[str] = None
+        client = get_redis()
+        if client is not None:
+            try:
+                raw = client.get(self._key)
+            except Exception:
+                client = None
+        if client is None:
+            with _LOCAL_LOCK:
+                item = _LOCAL.get(self._key)
+                if item and item[1] > time.time():
+                    raw = item[0]
+        if not raw:
+            return None
+        try:
+            state = json.loads(raw)
+        except Exception:
+            return None
+        if not isinstance(state, dict) or state.get("signature") != self.signature:
+            logger.info("[frontier] ds=%s 配置已变化，丢弃旧检查点", self.datasource_id)
+            self.clear()
+            return None
+        return state
+
+    def save(self, state: dict[str, Any]) -> None:
+        payload = json.dumps(
+            {**state, "signature": self.signature, "saved_at": time.strftime("%Y-%m-%dT%H:%M:%S")},
+            ensure_ascii=False,
+        )
+        client = get_redis()
+        if client is not None:
+            try:
+                client.set(self._key, payload, ex=self.ttl_seconds)
+                return
+            except Exception:
+                pass
+        with _LOCAL_LOCK:
+            _LOCAL[self._key] = (payload, time.time() + self.ttl_seconds)
+
+    def clear(self) -> None:
+        client = get_redis()
+        if client is not None:
+            try:
+                client.delete(self._key)
+            except Exception:
+                pass
+        with _LOCAL_LOCK:
+            _LOCAL.pop(self._key, None)
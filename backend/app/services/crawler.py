@@ -4,18 +4,30 @@ from __future__ import annotations
 采集层抓取器抽象与实现，支持 Requests / Playwright（可扩展）。
 """
 
+import asyncio
+import atexit
+import concurrent.futures
+import inspect
+import json
+import logging
 import os
+import threading
 import time
-import inspect
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, Iterator, List, Optional
 from urllib.parse import urljoin, urlparse
 
 import requests
 from requests import RequestException
 from bs4 import BeautifulSoup
 
+from app.services.api_key_pool import report_key_error, report_key_success
+from app.services.rate_limiter import limit_key_id, rate_limited
+from app.services.url_canon import canonicalize_url
+
+
+logger = logging.getLogger(__name__)
 
 @dataclass
 class CrawlResult:
@@ -25,6 +37,32 @@ class CrawlResult:
     extra: Optional[Dict] = None
 
 
+def _result_match_key(url: Any) -> str:
+    """批量结果回填用的 URL 比较键：规范化（参数排序、去追踪参数/锚点/末尾斜杠）并忽略 http/https 差异。"""
+    canon = canonicalize_url(str(url or ""))
+    return canon.split("://", 1)[-1]
+
+
+def _pending_by_key(urls: List[str]) -> Dict[str, str]:
+    """{比较键: 提交的 URL}；规范形式相同的重复提交退回用原始 URL 作键，避免互相覆盖。"""
+    pending: Dict[str, str] = {}
+    for u in urls:
+        key = _result_match_key(u)
+        pending[u if key in pending else key] = u
+    return pending
+
+
+def _pop_pending(pending: Dict[str, str], candidates: List[Any]) -> Optional[str]:
+    """按候选 URL 依次（原样、规范形式）匹配待回填的提交 URL；都匹配不上返回 None（不按位置猜测）。"""
+    for cand in candidates:
+        if not cand:
+            continue
+        for key in (str(cand), _result_match_key(cand)):
+            if key in pending:
+                return pending.pop(key)
+    return None
+
+
 class BaseCrawler(ABC):
     """抓取器基类，可扩展不同实现。"""
 
@@ -32,6 +70,19 @@ class BaseCrawler(ABC):
     def fetch(self, url: str, headers: Optional[Dict] = None, timeout: int = 15) -> CrawlResult:
         """抓取页面并返回 HTML。"""
 
+    def fetch_many(
+        self, urls: List[str], headers: Optional[Dict] = None
+    ) -> Iterator[tuple[str, CrawlResult | Exception]]:
+        """批量抓取，按完成顺序逐条产出 (url, 结果或异常)。
+
+        默认实现逐个调用 fetch；支持批量任务的抓取器（如 Firecrawl batch）可覆盖为一次提交、边完成边产出。
+        """
+        for url in urls:
+            try:
+                yield url, self.fetch(url, headers=headers)
+            except Exception as exc:
+                yield url, exc
+
 
 class RequestsCrawler(BaseCrawler):
     """基于 requests 的简单抓取器，适合静态页面。"""
@@ -85,8 +136,127 @@ class PlaywrightCrawler(BaseCrawler):
                     pass
 
 
+class _Crawl4aiLocalRuntime:
+    """进程内常驻的 crawl4ai 本地浏览器。
+
+    中文说明：
+    - 旧实现每个 URL 都 asyncio.run 一次并新建 AsyncWebCrawler（即启动一个浏览器），开销远大于页面本身；
+    - 这里每个进程只维护一个后台事件循环线程和一个长驻 AsyncWebCrawler，各线程通过
+      run_coroutine_threadsafe 提交抓取，共用同一个浏览器；
+    - 并发标签页数由 CRAWL4AI_LOCAL_CONCURRENCY 控制（默认 4）；连续失败多次时重建浏览器；
+    - 记录创建时的 pid，Celery prefork 子进程里会重新创建，不复用父进程的循环/浏览器。
+    """
+
+    _RECYCLE_AFTER_FAILURES = 3
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._pid: Optional[int] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._crawler: Any = None
+        self._start_lock: Optional[asyncio.Lock] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._failures = 0
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if (
+                self._loop is not None
+                and self._pid == os.getpid()
+                and self._thread is not None
+                and self._thread.is_alive()
+            ):
+                return self._loop
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name="crawl4ai-loop", daemon=True)
+            thread.start()
+            self._pid, self._loop, self._thread = os.getpid(), loop, thread
+            self._crawler, self._start_lock, self._semaphore, self._failures = None, None, None, 0
+            return loop
+
+    async def _get_crawler(self) -> Any:
+        # 以下状态只在事件循环线程内读写，无需线程锁
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+            concurrency = max(1, int(os.getenv("CRAWL4AI_LOCAL_CONCURRENCY", "4") or 4))
+            self._semaphore = asyncio.Semaphore(concurrency)
+        async with self._start_lock:
+            if self._crawler is None:
+                from crawl4ai import AsyncWebCrawler, BrowserConfig  # type: ignore
+
+                crawler = AsyncWebCrawler(config=BrowserConfig(headless=True))  # type: ignore
+                if hasattr(crawler, "start"):
+                    await crawler.start()
+                else:
+                    await crawler.__aenter__()
+                self._crawler = crawler
+                logger.info("[crawl4ai] 本地浏览器已启动 pid=%s", os.getpid())
+            return self._crawler
+
+    async def _close_crawler(self) -> None:
+        crawler, self._crawler = self._crawler, None
+        if crawler is None:
+            return
+        try:
+            if hasattr(crawler, "close"):
+                await crawler.close()
+            else:
+                await crawler.__aexit__(None, None, None)
+        except Exception:
+            pass
+
+    async def _arun(self, url: str, run_config: Any) -> Any:
+        crawler = await self._get_crawler()
+        async with self._semaphore:  # type: ignore[union-attr]
+            try:
+                result = await crawler.arun(url=url, config=run_config)  # type: ignore
+            except Exception:
+                self._failures += 1
+                if self._failures >= self._RECYCLE_AFTER_FAILURES and self._crawler is crawler:
+                    logger.warning("[crawl4ai] 本地浏览器连续失败 %s 次，重建", self._failures)
+                    self._failures = 0
+                    await self._close_crawler()
+                raise
+        self._failures = 0
+        return result
+
+    def submit(self, url: str, run_config: Any) -> concurrent.futures.Future:
+        return asyncio.run_coroutine_threadsafe(self._arun(url, run_config), self._ensure_loop())
+
+    def close(self) -> None:
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            if loop is None or self._pid != os.getpid():
+                return
+            self._loop, self._thread = None, None
+        try:
+            asyncio.run_coroutine_threadsafe(self._close_crawler(), loop).result(timeout=10)
+        except Exception:
+            pass
+        loop.call_soon_threadsafe(loop.stop)
+        if thread is not None:
+            thread.join(timeout=5)
+
+
+_CRAWL4AI_LOCAL = _Crawl4aiLocalRuntime()
+atexit.register(_CRAWL4AI_LOCAL.close)
+
+
+def _looks_like_html(text: Any) -> bool:
+    if not isinstance(text, str):
+        return False
+    t = text.lstrip().lower()
+    return t.startswith("<!doctype") or t.startswith("<html") or "<body" in t or "<a" in t
+
+
 class Crawl4aiCrawler(BaseCrawler):
-    """基于 crawl4ai 的抓取器，支持本地库或 HTTP(Docker) 两种模式。"""
+    """基于 crawl4ai 的抓取器，支持本地库或 HTTP(Docker) 两种模式。
+
+    - HTTP 模式：一次提交一批 URL；同步返回结果的服务端直接使用，返回 task_id 的按指数退避轮询，
+      或在 options.stream=true 时走 /crawl/stream 流式接口边完成边产出；提交与轮询共用同一个超时预算；
+    - 本地模式：复用进程内常驻的 AsyncWebCrawler（见 _Crawl4aiLocalRuntime）。
+    """
 
     def __init__(
         self,
@@ -95,16 +265,17 @@ class Crawl4aiCrawler(BaseCrawler):
         api_key: Optional[str] = None,
         options: Optional[Dict[str, Any]] = None,
     ):
+        api_base = api_base or os.getenv("CRAWL4AI_API_BASE")
         self.api_base = api_base.rstrip("/") if api_base else None
-        self.api_key = api_key
+        self.api_key = api_key or os.getenv("CRAWL4AI_API_KEY")
         self.options = options or {}
         self._session = requests.Session()
-        self._local_import_ok = None  # 避免重复导入失败
+        self._run_config: Any = None
+
+    # ---------- HTTP(Docker) 模式 ----------
 
-    def _fetch_via_http(self, url: str, headers: Optional[Dict], timeout: int) -> CrawlResult:
-        """调用 crawl4ai Docker API /crawl。"""
-        endpoint = f"{self.api_base}/crawl"
-        payload: Dict[str, Any] = {"urls": [url], "priority": 10}
+    def _http_payload(self, urls: List[str]) -> Dict[str, Any]:
+        payload: Dict[str, Any] = {"urls": urls, "priority": 10}
         if self.api_key:
             payload["api_token"] = self.api_key
         # 透传可能的运行配置（仅在服务端支持时生效）
@@ -119,114 +290,203 @@ class Crawl4aiCrawler(BaseCrawler):
             run_cfg["stealth"] = self.options["stealth"]
         if run_cfg:
             payload["run_config"] = run_cfg
+        return payload
+
+    @staticmethod
+    def _item_to_result(url: str, item: Dict[str, Any], task_id: Optional[str]) -> CrawlResult | Exception:
+        if item.get("success") is False:
+            return RequestException(f"crawl4ai 抓取失败: {item.get('error_message') or item.get('error') or url}")
+        raw_html = item.get("html")
+        markdown = item.get("markdown")
+        if isinstance(markdown, dict):
+            markdown = markdown.get("raw_markdown") or markdown.get("markdown_with_citations")
+        content = item.get("content")
+        html = raw_html or (content if _looks_like_html(content) else None) or markdown or content
+        if not html:
+            return RequestException(f"crawl4ai 抓取结果为空: {url}")
+        return CrawlResult(
+            url=url,
+            html=str(html),
+            status_code=item.get("status_code") or 200,
+            extra={
+                "final_url": item.get("redirected_url") or item.get("url") or url,
+                "task_id": task_id,
+                "crawl4ai_markdown": markdown,
+            },
+        )
 
+    def _match_results(
+        self,
+        pending: Dict[str, str],
+        items: List[Dict[str, Any]],
+        task_id: Optional[str],
+    ) -> Iterator[tuple[str, CrawlResult | Exception]]:
+        """把服务端结果回填到提交的 URL：依次按 url / redirected_url 的规范形式匹配。
+
+        中文说明：重定向、参数重排、http→https 等都按规范形式比较；仍匹配不上的结果丢弃并记录，
+        对应 URL 留在 pending 中，最终按“未返回”产出，避免把页面内容挂到错误的 URL 上。
+        """
+        for item in items:
+            if not isinstance(item, dict) or not pending:
+                continue
+            requested = _pop_pending(pending, [item.get("url"), item.get("redirected_url")])
+            if requested is None:
+                logger.warning(
+                    f"[crawl4ai] 结果无法对应到提交的 URL，已忽略: url={item.get('url')} "
+                    f"redirected_url={item.get('redirected_url')}"
+                )
+                continue
+            yield requested, self._item_to_result(requested, item, task_id)
+
+    def _http_batch(
+        self, urls: List[str], headers: Optional[Dict], budget: float
+    ) -> Iterator[tuple[str, CrawlResult | Exception]]:
+        deadline = time.monotonic() + budget
+        pending = _pending_by_key(urls)
+        payload = self._http_payload(urls)
         req_headers = headers.copy() if headers else {}
+
+        if self.options.get("stream"):
+            try:
+                yield from self._http_stream(pending, payload, req_headers, deadline)
+            except Exception as exc:
+                for u in list(pending.values()):
+                    yield u, RequestException(f"crawl4ai 流式抓取失败: {exc}")
+                return
+            for u in pending.values():
+                yield u, RequestException("crawl4ai 流式抓取未返回该 URL")
+            return
+
         try:
-            resp = self._session.post(endpoint, json=payload, headers=req_headers, timeout=timeout)
+            resp = self._session.post(
+                f"{self.api_base}/crawl",
+                json=payload,
+                headers=req_headers,
+                timeout=max(1.0, deadline - time.monotonic()),
+            )
             resp.raise_for_status()
             data = resp.json()
         except Exception as exc:
-            raise RequestException(f"crawl4ai API 调用失败: {exc}") from exc
-
-        def _looks_like_html(text: Any) -> bool:
-            if not isinstance(text, str):
-                return False
-            t = text.lstrip().lower()
-            return t.startswith("<!doctype") or t.startswith("<html") or "<body" in t or "<a" in t
+            for u in urls:
+                yield u, RequestException(f"crawl4ai API 调用失败: {exc}")
+            return
 
         # 即时返回模式：results 直接存在
         if isinstance(data, dict) and data.get("results"):
-            results = data.get("results") or []
-            first = results[0] if results else {}
-            raw_html = first.get("html")
-            markdown = first.get("markdown")
-            content = first.get("content")
-            html = raw_html or (content if _looks_like_html(content) else None) or markdown or content
-            if not html:
-                raise RequestException("crawl4ai API 返回为空")
-            return CrawlResult(
-                url=url,
-                html=str(html),
-                status_code=200,
-                extra={
-                    "final_url": first.get("url") or url,
-                    "task_id": data.get("task_id"),
-                    "crawl4ai_markdown": markdown,
-                },
-            )
+            yield from self._match_results(pending, data.get("results") or [], data.get("task_id"))
+            for u in pending.values():
+                yield u, RequestException("crawl4ai API 未返回该 URL 的结果")
+            return
 
-        # 异步任务模式：轮询 task/{id}
-        task_id = data.get("task_id")
+        task_id = data.get("task_id") if isinstance(data, dict) else None
         if not task_id:
-            raise RequestException(f"crawl4ai API 返回格式异常: {data}")
+            for u in urls:
+                yield u, RequestException(f"crawl4ai API 返回格式异常: {data}")
+            return
+        yield from self._http_poll(task_id, pending, deadline)
+
+    def _http_poll(
+        self, task_id: str, pending: Dict[str, str], deadline: float
+    ) -> Iterator[tuple[str, CrawlResult | Exception]]:
+        """异步任务模式：按指数退避轮询 task/{id}，直到完成、失败或超时预算耗尽。"""
+        poll_interval = max(0.2, float(self.options.get("poll_interval") or 0.5))
+        max_poll_interval = max(poll_interval, float(self.options.get("max_poll_interval") or 5))
+        interval = poll_interval
         task_endpoint = f"{self.api_base}/task/{task_id}"
-        deadline = time.time() + timeout
-        while time.time() < deadline:
+        last_error: Optional[str] = None
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            time.sleep(min(interval, remaining))
+            interval = min(max_poll_interval, interval * 2)
             try:
-                res = self._session.get(task_endpoint, timeout=5)
+                res = self._session.get(task_endpoint, timeout=max(1.0, min(10.0, deadline - time.monotonic())))
                 res.raise_for_status()
                 jd = res.json()
-                if jd.get("status") in ("finished", "success", "done"):
-                    results = jd.get("results") or []
-                    first = results[0] if results else {}
-                    raw_html = first.get("html")
-                    markdown = first.get("markdown")
-                    content = first.get("content")
-                    html = raw_html or (content if _looks_like_html(content) else None) or markdown or content
-                    if not html:
-                        raise RequestException("crawl4ai 任务结果为空")
-                    return CrawlResult(
-                        url=url,
-                        html=str(html),
-                        status_code=200,
-                        extra={
-                            "final_url": first.get("url") or url,
-                            "task_id": task_id,
-                            "crawl4ai_markdown": markdown,
-                        },
-                    )
-            except Exception:
-                pass
-            time.sleep(1)
-        raise RequestException(f"crawl4ai 任务超时: {task_id}")
+            except Exception as exc:
+                # 中文说明：网络抖动/服务端暂时不可用只影响本次轮询，继续退避重试，超时后带上最后一次错误
+                last_error = str(exc)
+                logger.debug(f"[crawl4ai] 任务轮询失败 {task_id}: {exc}")
+                continue
 
-    def _fetch_via_local(self, url: str, headers: Optional[Dict], timeout: int) -> CrawlResult:
-        """本地库模式，使用 AsyncWebCrawler/Async 运行，返回 markdown/html。"""
+            status = str(jd.get("status") or "").lower()
+            if status in ("failed", "error"):
+                err = jd.get("error") or jd.get("error_message") or status
+                for u in pending.values():
+                    yield u, RequestException(f"crawl4ai 任务失败: {err}")
+                return
+            if status in ("finished", "success", "done", "completed"):
+                items = jd.get("results")
+                if not isinstance(items, list):
+                    items = [jd.get("result")] if isinstance(jd.get("result"), dict) else []
+                yield from self._match_results(pending, items, task_id)
+                for u in pending.values():
+                    yield u, RequestException(f"crawl4ai 任务结果为空: {task_id}")
+                return
+
+        suffix = f"，最后一次轮询错误: {last_error}" if last_error else ""
+        for u in pending.values():
+            yield u, RequestException(f"crawl4ai 任务超时: {task_id}{suffix}")
+
+    def _http_stream(
+        self, pending: Dict[str, str], payload: Dict[str, Any], req_headers: Dict, deadline: float
+    ) -> Iterator[tuple[str, CrawlResult | Exception]]:
+        """流式模式：/crawl/stream 按行返回 JSON（NDJSON），每完成一个 URL 即产出。"""
+        stream_payload = {**payload, "crawler_config": {**(payload.get("crawler_config") or {}), "stream": True}}
+        with self._session.post(
+            f"{self.api_base}/crawl/stream",
+            json=stream_payload,
+            headers=req_headers,
+            timeout=max(1.0, deadline - time.monotonic()),
+            stream=True,
+        ) as resp:
+            resp.raise_for_status()
+            for line in resp.iter_lines():
+                if not line:
+                    continue
+                item = json.loads(line)
+                if isinstance(item, dict) and item.get("status") == "completed" and "url" not in item:
+                    break
+                yield from self._match_results(pending, [item], None)
+                if not pending:
+                    break
+                if time.monotonic() > deadline:
+                    raise RequestException("超过超时预算")
+
+    # ---------- 本地库模式 ----------
+
+    def _local_run_config(self) -> Any:
+        if self._run_config is not None:
+            return self._run_config
         try:
-            from crawl4ai import AsyncWebCrawler, BrowserConfig, CrawlerRunConfig  # type: ignore
+            from crawl4ai import CrawlerRunConfig  # type: ignore
         except Exception as exc:  # pragma: no cover - 依赖缺失时抛出
             raise ImportError("缺少 crawl4ai 依赖，请安装 crawl4ai") from exc
 
-        import asyncio
-
-        async def _run() -> Any:
-            # crawl4ai 的配置项在不同版本会变化，为避免因未知字段导致崩溃，这里只使用最稳定的参数。
-            # 如需更丰富的 stealth/proxy/browser 等能力，建议走 Docker API 模式（crawl4ai_api_base）。
-            browser_config = BrowserConfig(headless=True)  # type: ignore
-
-            run_cfg_kwargs: Dict[str, Any] = {}
-            # crawl4ai 不同版本的 CrawlerRunConfig 参数可能变化，这里通过签名探测来安全注入。
-            # - js_code: 可选执行 JS
-            # - prompt: 可选提示语，用于指导 crawl4ai 做抽取/整理（若版本不支持将忽略）
-            try:
-                sig = inspect.signature(CrawlerRunConfig)
-                accepted = set(sig.parameters.keys())
-            except Exception:
-                accepted = set()
-
-            if "js_code" in accepted and self.options.get("js_code"):
-                run_cfg_kwargs["js_code"] = self.options["js_code"]
-            prompt = self.options.get("prompt")
-            if "prompt" in accepted and isinstance(prompt, str) and prompt.strip():
-                run_cfg_kwargs["prompt"] = prompt.strip()
-
-            run_config = CrawlerRunConfig(**run_cfg_kwargs)  # type: ignore
+        # crawl4ai 的配置项在不同版本会变化，为避免因未知字段导致崩溃，这里只使用最稳定的参数。
+        # 如需更丰富的 stealth/proxy/browser 等能力，建议走 Docker API 模式（crawl4ai_api_base）。
+        run_cfg_kwargs: Dict[str, Any] = {}
+        # crawl4ai 不同版本的 CrawlerRunConfig 参数可能变化，这里通过签名探测来安全注入。
+        # - js_code: 可选执行 JS
+        # - prompt: 可选提示语，用于指导 crawl4ai 做抽取/整理（若版本不支持将忽略）
+        try:
+            sig = inspect.signature(CrawlerRunConfig)
+            accepted = set(sig.parameters.keys())
+        except Exception:
+            accepted = set()
 
-            async with AsyncWebCrawler(config=browser_config) as crawler:  # type: ignore
-                return await crawler.arun(url=url, config=run_config)  # type: ignore
+        if "js_code" in accepted and self.options.get("js_code"):
+            run_cfg_kwargs["js_code"] = self.options["js_code"]
+        prompt = self.options.get("prompt")
+        if "prompt" in accepted and isinstance(prompt, str) and prompt.strip():
+            run_cfg_kwargs["prompt"] = prompt.strip()
 
-        result = asyncio.run(_run())
+        self._run_config = CrawlerRunConfig(**run_cfg_kwargs)  # type: ignore
+        return self._run_config
 
+    @staticmethod
+    def _local_to_result(url: str, result: Any) -> CrawlResult:
         # 过滤/子页面发现依赖 HTML（css_selector、<a href>），这里优先返回原始 HTML。
         raw_html = getattr(result, "html", None) or getattr(result, "raw_html", None)
         markdown_obj = getattr(result, "markdown", None)
@@ -239,26 +499,80 @@ class Crawl4aiCrawler(BaseCrawler):
         return CrawlResult(
             url=url,
             html=str(html),
-            status_code=200,
-            extra={"final_url": url, "crawl4ai_markdown": markdown},
+            status_code=getattr(result, "status_code", None) or 200,
+            extra={"final_url": getattr(result, "redirected_url", None) or url, "crawl4ai_markdown": markdown},
         )
 
-    def fetch(self, url: str, headers: Optional[Dict] = None, timeout: int = 30) -> CrawlResult:
+    def _local_batch(self, urls: List[str], budget: float) -> Iterator[tuple[str, CrawlResult | Exception]]:
+        run_config = self._local_run_config()
+        futs = {_CRAWL4AI_LOCAL.submit(u, run_config): u for u in urls}
+        try:
+            for fut in concurrent.futures.as_completed(futs, timeout=budget):
+                url = futs.pop(fut)
+                try:
+                    yield url, self._local_to_result(url, fut.result())
+                except Exception as exc:
+                    yield url, exc
+        except concurrent.futures.TimeoutError:
+            for fut, url in futs.items():
+                fut.cancel()
+                yield url, RequestException(f"crawl4ai 抓取超时: {url}")
+
+    # ---------- 对外接口 ----------
+
+    def _budget(self, timeout: float) -> float:
+        return max(1.0, float(self.options.get("timeout") or timeout))
+
+    def fetch(self, url: str, headers: Optional[Dict] = None, timeout: int = 60) -> CrawlResult:
+        budget = self._budget(timeout)
         if self.api_base:
-            return self._fetch_via_http(url, headers, timeout)
-        return self._fetch_via_local(url, headers, timeout)
+            results = self._http_batch([url], headers, budget)
+        else:
+            results = self._local_batch([url], budget)
+        for _, res in results:
+            if isinstance(res, Exception):
+                raise res
+            return res
+        raise RequestException(f"crawl4ai 抓取结果为空: {url}")
+
+    def fetch_many(
+        self, urls: List[str], headers: Optional[Dict] = None
+    ) -> Iterator[tuple[str, CrawlResult | Exception]]:
+        """批量抓取：HTTP 模式按 options.chunk_size（默认 10）分批提交；本地模式全部提交到常驻浏览器并发执行。
+
+        超时预算按批计算：单个 URL 的预算（options.timeout，默认 60 秒）× 批内需要排队的轮数。
+        """
+        if not urls:
+            return
+        per_url = self._budget(60)
+        if self.api_base:
+            chunk_size = max(1, int(self.options.get("chunk_size") or 10))
+            for i in range(0, len(urls), chunk_size):
+                chunk = urls[i : i + chunk_size]
+                yield from self._http_batch(chunk, headers, per_url * len(chunk))
+            return
+        concurrency = max(1, int(os.getenv("CRAWL4AI_LOCAL_CONCURRENCY", "4") or 4))
+        yield from self._local_batch(urls, per_url * -(-len(urls) // concurrency))
 
 
 class FirecrawlCrawler(BaseCrawler):
-    """调用 FireCrawl 云端 API 的抓取器，适合反爬/重度渲染页面。"""
+    """调用 FireCrawl 云端 API 的抓取器，适合反爬/重度渲染页面。
+
+    key_id：API Key 池中该 key 的 id（环境变量/数据源自带 key 为 None），用于上报 key 健康度与按 key 限流；
+    key_extra：该 key 的 extra（其中 max_inflight/rpm/tpm 为按 key 限额）。
+    """
 
     def __init__(
         self,
         api_key: Optional[str] = None,
         base_url: Optional[str] = None,
         options: Optional[Dict[str, Any]] = None,
+        key_id: Optional[int] = None,
+        key_extra: Optional[Dict[str, Any]] = None,
     ):
         self.api_key = api_key or os.getenv("FIRECRAWL_API_KEY")
+        self.key_id = key_id
+        self.key_extra = key_extra if isinstance(key_extra, dict) else None
         base = (base_url or os.getenv("FIRECRAWL_API_BASE") or "https://api.firecrawl.dev/v2").rstrip("/")
         # 兼容用户可能传入 v1 base：自动提升到 v2
         if base.endswith("/v1"):
@@ -273,16 +587,18 @@ class FirecrawlCrawler(BaseCrawler):
             raise ValueError("FireCrawl API Key 未配置，请设置环境变量 FIRECRAWL_API_KEY")
         self._session = requests.Session()
 
-    def fetch(self, url: str, headers: Optional[Dict] = None, timeout: int = 120) -> CrawlResult:
-        endpoint = f"{self.base_url}/scrape"
+    def _rate_limited(self):
+        # 中文说明：池中 key 按池 id + extra 中的 max_inflight/rpm/tpm 限流
+        return rate_limited("firecrawl", key_id=limit_key_id(self.key_id, self.api_key), extra=self.key_extra)
 
+    def _scrape_options(self, headers: Optional[Dict]) -> Dict[str, Any]:
+        """/scrape 与 /batch/scrape 共用的抓取参数。"""
         # 兼容配置字段：snake_case / camelCase
         formats = self.options.get("formats") or self.options.get("scrape_formats") or ["html"]
         if not isinstance(formats, list) or not formats:
             formats = ["html"]
 
         payload: Dict[str, Any] = {
-            "url": url,
             "formats": formats,
         }
 
@@ -319,43 +635,167 @@ class FirecrawlCrawler(BaseCrawler):
             payload["headers"] = fc_headers
         elif headers:
             payload["headers"] = headers
+        return payload
 
-        req_headers = {
+    def _api_headers(self) -> Dict[str, str]:
+        # 注意：这里是请求 Firecrawl API 的 headers；目标站点 headers 通过 payload["headers"] 传递
+        return {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json",
         }
-        if headers:
-            # 注意：这里的 headers 是请求 Firecrawl API 的 headers（例如 trace），不是目标站点 headers
-            # 目标站点 headers 应通过 payload["headers"] 传递。
-            pass
 
-        resp = self._session.post(endpoint, headers=req_headers, json=payload, timeout=timeout)
-        resp.raise_for_status()
-        html = resp.text
-        meta: Dict[str, Any] | None = None
-        try:
-            data = resp.json()
-            html = (
-                (data.get("data", {}) if isinstance(data, dict) else {}).get("html")
-                or (data.get("data", {}) if isinstance(data, dict) else {}).get("rawHtml")
-                or (data.get("data", {}) if isinstance(data, dict) else {}).get("markdown")
-                or (data.get("data", {}) if isinstance(data, dict) else {}).get("content")
-                or html
-            )
-            meta = (data.get("data", {}) if isinstance(data, dict) else {}).get("metadata")
-            meta = meta if isinstance(meta, dict) else None
-        except Exception:
-            pass
+    @staticmethod
+    def _document_to_result(url: str, doc: Dict[str, Any], status_code: Optional[int]) -> CrawlResult:
+        meta = doc.get("metadata") if isinstance(doc.get("metadata"), dict) else None
+        html = doc.get("html") or doc.get("rawHtml") or doc.get("markdown") or doc.get("content") or ""
+        if isinstance(meta, dict) and status_code is None:
+            try:
+                status_code = int(meta.get("statusCode")) if meta.get("statusCode") is not None else None
+            except (TypeError, ValueError):
+                status_code = None
         return CrawlResult(
             url=url,
             html=str(html),
-            status_code=resp.status_code,
+            status_code=status_code,
             extra={
                 "final_url": (meta.get("sourceURL") if isinstance(meta, dict) else None) or url,
                 "firecrawl_metadata": meta,
             },
         )
 
+    def fetch(self, url: str, headers: Optional[Dict] = None, timeout: int = 120) -> CrawlResult:
+        endpoint = f"{self.base_url}/scrape"
+        payload: Dict[str, Any] = {"url": url, **self._scrape_options(headers)}
+
+        try:
+            with self._rate_limited():
+                resp = self._session.post(endpoint, headers=self._api_headers(), json=payload, timeout=timeout)
+            resp.raise_for_status()
+        except RequestException as exc:
+            report_key_error(self.key_id, exc)
+            raise
+        report_key_success(self.key_id)
+        try:
+            data = resp.json()
+        except Exception:
+            return CrawlResult(url=url, html=resp.text, status_code=resp.status_code, extra={"final_url": url})
+        doc = data.get("data") if isinstance(data, dict) else None
+        if not isinstance(doc, dict):
+            return CrawlResult(url=url, html=resp.text, status_code=resp.status_code, extra={"final_url": url})
+        return self._document_to_result(url, doc, resp.status_code)
+
+    def fetch_many(
+        self, urls: List[str], headers: Optional[Dict] = None
+    ) -> Iterator[tuple[str, CrawlResult | Exception]]:
+        """Firecrawl 批量抓取：按批提交 /batch/scrape 异步任务，轮询（退避）并边完成边产出。
+
+        批量参数来自 options.batch（即数据源 config.firecrawl_batch）：
+        - chunk_size：单个任务提交的 URL 数，默认 100
+        - poll_interval / max_poll_interval：轮询初始间隔与上限（秒），默认 1 / 10，按 1.5 倍退避
+        - timeout：单个任务的总等待时长（秒），默认 600；超时未完成的 URL 按失败产出
+        """
+        batch_cfg = self.options.get("batch") if isinstance(self.options.get("batch"), dict) else {}
+        chunk_size = max(1, int(batch_cfg.get("chunk_size") or 100))
+        for i in range(0, len(urls), chunk_size):
+            yield from self._run_batch_job(urls[i : i + chunk_size], headers, batch_cfg)
+
+    def _run_batch_job(
+        self, urls: List[str], headers: Optional[Dict], batch_cfg: Dict[str, Any]
+    ) -> Iterator[tuple[str, CrawlResult | Exception]]:
+        poll_interval = max(0.2, float(batch_cfg.get("poll_interval") or 1))
+        max_poll_interval = max(poll_interval, float(batch_cfg.get("max_poll_interval") or 10))
+        job_timeout = max(10.0, float(batch_cfg.get("timeout") or 600))
+
+        payload: Dict[str, Any] = {"urls": urls, **self._scrape_options(headers)}
+        try:
+            with self._rate_limited():
+                resp = self._session.post(
+                    f"{self.base_url}/batch/scrape", headers=self._api_headers(), json=payload, timeout=60
+                )
+            resp.raise_for_status()
+            job = resp.json()
+        except Exception as exc:
+            report_key_error(self.key_id, exc)
+            for u in urls:
+                yield u, RequestException(f"Firecrawl 批量任务提交失败: {exc}")
+            return
+        job_id = job.get("id") if isinstance(job, dict) else None
+        if not job_id:
+            for u in urls:
+                yield u, RequestException(f"Firecrawl 批量任务返回格式异常: {job}")
+            return
+        report_key_success(self.key_id)
+
+        # 中文说明：结果按 sourceURL（其次 url）的规范形式回填到提交的 URL，与返回顺序无关；
+        # 已回填的 URL 不在 pending 中，重复返回的文档自然被忽略
+        pending = _pending_by_key(urls)
+        done_docs = 0
+        status = ""
+        deadline = time.monotonic() + job_timeout
+        interval = poll_interval
+        while pending and time.monotonic() < deadline:
+            time.sleep(interval)
+            try:
+                docs, status = self._poll_batch_job(job_id, skip=done_docs)
+            except Exception as exc:
+                report_key_error(self.key_id, exc)
+                logger.warning(f"[firecrawl] 批量任务轮询失败 {job_id}: {exc}")
+                interval = min(max_poll_interval, interval * 1.5)
+                continue
+
+            done_docs += len(docs)
+            yield from self._match_batch_docs(pending, docs)
+
+            if status in ("completed", "failed", "cancelled"):
+                if pending and done_docs:
+                    # 中文说明：按偏移增量拉取依赖服务端顺序稳定；任务结束仍有未回填的 URL 时从头补扫一次
+                    try:
+                        docs, _ = self._poll_batch_job(job_id, skip=0)
+                        yield from self._match_batch_docs(pending, docs)
+                    except Exception as exc:
+                        logger.warning(f"[firecrawl] 批量任务补扫失败 {job_id}: {exc}")
+                break
+            # 有新结果时保持当前间隔，否则退避
+            interval = poll_interval if docs else min(max_poll_interval, interval * 1.5)
+
+        reason = "任务超时" if status not in ("completed", "failed", "cancelled") else f"任务已结束（{status}）但未返回该 URL"
+        for u in pending.values():
+            yield u, RequestException(f"Firecrawl 批量抓取未返回结果（{reason}）: {job_id}")
+
+    def _match_batch_docs(
+        self, pending: Dict[str, str], docs: List[Dict[str, Any]]
+    ) -> Iterator[tuple[str, CrawlResult | Exception]]:
+        for doc in docs:
+            meta = doc.get("metadata") if isinstance(doc.get("metadata"), dict) else {}
+            requested = _pop_pending(pending, [meta.get("sourceURL"), meta.get("url")])
+            if requested is None:
+                continue
+            if meta.get("error"):
+                yield requested, RequestException(f"Firecrawl 抓取失败: {meta.get('error')}")
+            else:
+                yield requested, self._document_to_result(requested, doc, None)
+
+    def _poll_batch_job(self, job_id: str, *, skip: int) -> tuple[List[Dict[str, Any]], str]:
+        """查询批量任务，返回 (从第 skip 条起的结果, 状态)。
+
+        中文说明：偏移通过 ?skip= 交给服务端，只下载新完成的文档；结果分页时沿 next 继续拉取。
+        """
+        url: Optional[str] = f"{self.base_url}/batch/scrape/{job_id}"
+        if skip > 0:
+            url = f"{url}?skip={int(skip)}"
+        docs: List[Dict[str, Any]] = []
+        status = ""
+        while url:
+            with self._rate_limited():
+                resp = self._session.get(url, headers=self._api_headers(), timeout=60)
+            resp.raise_for_status()
+            data = resp.json() if resp.content else {}
+            status = status or str(data.get("status") or "")
+            page = data.get("data") if isinstance(data.get("data"), list) else []
+            docs.extend(d for d in page if isinstance(d, dict))
+            url = data.get("next") or None
+        return docs, status
+
 
 def get_crawler(use_playwright: bool = False) -> BaseCrawler:
     """兼容旧签名：默认返回 requests/playwright 抓取器。"""
@@ -370,6 +810,8 @@ def get_crawler_by_engine(
     firecrawl_api_key: Optional[str] = None,
     firecrawl_api_base: Optional[str] = None,
     firecrawl_options: Optional[Dict[str, Any]] = None,
+    firecrawl_key_id: Optional[int] = None,
+    firecrawl_key_extra: Optional[Dict[str, Any]] = None,
     crawl4ai_api_base: Optional[str] = None,
     crawl4ai_api_key: Optional[str] = None,
     crawl4ai_options: Optional[Dict[str, Any]] = None,
@@ -402,6 +844,8 @@ def get_crawler_by_engine(
             api_key=firecrawl_api_key,
             base_url=firecrawl_api_base,
             options=firecrawl_options,
+            key_id=firecrawl_key_id,
+            key_extra=firecrawl_key_extra,
         )
     # 未知配置时回退到默认抓取器
     return get_crawler(use_playwright=use_playwright)
@@ -453,10 +897,15 @@ def discover_links(
     budget: int,
     seen_set: set[str],
     parser_cfg: Optional[Dict] = None,
+    canonicalize: Optional[Callable[[str], str]] = None,
+    exclude: Optional[Callable[[str], bool]] = None,
 ) -> List[str]:
     """
     从 HTML 中抽取同域链接，受 budget 限制。
     仅在 parser_cfg.css_selector 指定的区域内查找链接，过滤干扰项。
+
+    - canonicalize：链接规范化函数（见 url_canon）；传入时返回规范化后的链接，并按规范形式判重
+    - exclude：返回 True 的链接直接跳过且不占用 budget（如跨运行已抓取过的子页面）
     """
     import logging
     logger = logging.getLogger(__name__)
@@ -483,7 +932,8 @@ def discover_links(
             return []
 
     links: List[str] = []
-    base_host = urlparse(base_url).netloc
+    page_seen: set[str] = set()
+    base_host = urlparse(base_url).netloc.lower()
     for root in search_roots:
         for a in root.find_all("a", href=True):
             if len(links) >= budget:
@@ -494,9 +944,14 @@ def discover_links(
             full = urljoin(base_url, href)
             if not full.startswith("http"):
                 continue
-            if urlparse(full).netloc != base_host:
+            if urlparse(full).netloc.lower() != base_host:
+                continue
+            if canonicalize is not None:
+                full = canonicalize(full)
+            if full in seen_set or full in page_seen:
                 continue
-            if full in seen_set:
+            page_seen.add(full)
+            if exclude is not None and exclude(full):
                 continue
             links.append(full)
         if len(links) >= budget:
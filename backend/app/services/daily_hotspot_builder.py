@@ -9,6 +9,7 @@ from sqlalchemy.orm import Session
 
 from app.models.datasource_content import DataSourceContent
 from app.models.event_cluster import EventCluster, EventClusterItem, EventClusterSource
+from app.services.daily_hotspot_cache import mark_day_rebuilt
 
 
 @dataclass
@@ -164,6 +165,8 @@ def build_daily_hotspots(
         db.query(EventClusterSource).filter(EventClusterSource.event_id.in_(old_ids)).delete(synchronize_session=False)
         db.query(EventCluster).filter(EventCluster.id.in_(old_ids)).delete(synchronize_session=False)
         db.flush()
+    # 中文说明：该日榜单（含此前缓存的空榜单）与旧事件详情的响应缓存，在本次事务提交后失效
+    mark_day_rebuilt(db, day, [e.id for e in old_events])
 
     # 3) 简单聚类：按标题 n-gram jaccard
     clusters: List[List[_Doc]] = []
@@ -197,6 +200,7 @@ def build_daily_hotspots(
             title=leader.title[:255],
             summary=summary,
             hot_score=hot_score,
+            source_count=len(c_sorted),
             keywords=None,
             extra={"cluster_size": len(c)},
         )
@@ -0,0 +1,107 @@
+"""热点榜单/详情的响应缓存（按日期 + 构建代次版本化，支持 ETag）。
+
+中文说明：
+- 某日榜单构建完成后，榜单与事件详情对所有编辑都是同一份数据，逐请求回源 MySQL 没有必要；
+- 榜单缓存键包含“构建代次”（generation）：build_daily_hotspots 重建某日时登记失效，
+  提交成功后（session after_commit）换新代次并删除旧事件的详情缓存，旧键自然不再命中；
+- 缓存值为 {"etag", "body"}，ETag 取响应体摘要，端点据此返回 304；
+- 存储复用 ttl_cache（Redis 优先，进程内兜底）；无 Redis 的多进程部署中，其它进程最多滞后一个 TTL。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import time
+from datetime import date
+from typing import Any, Iterable, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.services.ttl_cache import cache_delete, cache_get_json, cache_key, cache_set_json
+
+
+# 中文说明：Session.info 中待失效的 {day: [旧事件 ID]}，提交后统一处理，回滚则丢弃
+_PENDING_KEY = "daily_hotspot_cache_pending"
+
+
+def _ttl() -> int:
+    return int(get_settings().DAILY_HOTSPOT_CACHE_SECONDS or 0)
+
+
+def _gen_key(day: date) -> str:
+    return cache_key("daily_hotspot_gen", day.isoformat())
+
+
+def _new_generation(day: date) -> str:
+    gen = f"{time.time_ns():x}"
+    cache_set_json(_gen_key(day), gen, max(1, _ttl()))
+    return gen
+
+
+def day_generation(day: date) -> str:
+    """当前构建代次；缓存中不存在时生成一个新代次（等价于整日缓存失效）。"""
+    gen = cache_get_json(_gen_key(day))
+    if isinstance(gen, str) and gen:
+        return gen
+    return _new_generation(day)
+
+
+def list_cache_key(day: date, limit: int) -> str:
+    return cache_key("daily_hotspot_list", day.isoformat(), day_generation(day), int(limit))
+
+
+def detail_cache_key(event_id: int) -> str:
+    return cache_key("daily_hotspot_detail", int(event_id))
+
+
+def make_etag(body: Any) -> str:
+    raw = json.dumps(body, ensure_ascii=False, sort_keys=True, default=str)
+    return 'W/"' + hashlib.sha1(raw.encode("utf-8")).hexdigest()[:20] + '"'
+
+
+def get_cached(key: str) -> Optional[dict]:
+    """返回 {"etag", "body"}；未启用缓存或未命中返回 None。"""
+    if _ttl() <= 0:
+        return None
+    entry = cache_get_json(key)
+    if isinstance(entry, dict) and isinstance(entry.get("etag"), str) and "body" in entry:
+        return entry
+    return None
+
+
+def set_cached(key: str, body: Any) -> dict:
+    entry = {"etag": make_etag(body), "body": body}
+    if _ttl() > 0:
+        cache_set_json(key, entry, _ttl())
+    return entry
+
+
+def invalidate_day(day: date, event_ids: Iterable[int] = ()) -> None:
+    """立即换新代次并删除指定事件的详情缓存。"""
+    _new_generation(day)
+    keys = [detail_cache_key(eid) for eid in event_ids]
+    if keys:
+        cache_delete(*keys)
+
+
+def mark_day_rebuilt(db: Session, day: date, event_ids: Iterable[int]) -> None:
+    """登记某日已被重建（旧事件 ID 列表）；在该 Session 提交后才真正失效缓存。"""
+    pending: dict = db.info.setdefault(_PENDING_KEY, {})
+    pending.setdefault(day, set()).update(int(x) for x in event_ids)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_on_commit(session: Session) -> None:
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    for day, ids in pending.items():
+        invalidate_day(day, ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_on_rollback(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
@@ -5,6 +5,7 @@
 from datetime import datetime, timedelta
 from typing import Any, Optional
 import hashlib
+import time
 import concurrent.futures
 import logging
 
@@ -16,15 +17,27 @@ from app.models.datasource import DataSource
 from app.models.datasource_content import DataSourceContent
 from app.models.user import User
 from app.services.crawler import (
+    Crawl4aiCrawler,
     get_crawler_by_engine,
     apply_parser,
     discover_links,
 )
-from app.services.api_key_pool import pick_api_key
+from app.core.config import get_settings
+from app.services.api_key_pool import pick_api_key, report_key_error, report_key_success
+from app.services.crawl_frontier import CrawlFrontier, frontier_signature
+from app.services.feed_discovery import DISCOVERY_MODES, discover_feed_urls
+from app.services.seen_filter import SeenUrlFilter
+from app.services.url_canon import canonicalizer_from_config
+from app.services.rate_limiter import limit_key_id, rate_limited
+from app.services.run_lock import ensure_lease, get_run_info, run_lease
 from app.services.text_cleaner import clean_text
 from app.services.readability_extractor import extract_main_text
 from app.factories.content_factory import ContentFactory, compute_url_hash, compute_content_hash
-from app.repositories.datasource_repo import DataSourceRepository, DataSourceContentRepository
+from app.repositories.datasource_repo import (
+    DataSourceContentRepository,
+    DataSourceRepository,
+    DataSourceRunRepository,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -56,6 +69,16 @@ def _compute_next_run(cron_expr: str | None, start_dt: datetime) -> datetime | N
         return None
 
 
+def datasource_run_lock_name(ds_id: int) -> str:
+    """数据源运行互斥锁的名称（手动触发/定时任务/任务重试共用）。"""
+    return f"datasource:{int(ds_id)}"
+
+
+def get_datasource_running(ds_id: int) -> Optional[dict]:
+    """返回数据源正在进行的运行信息；未在运行时返回 None。"""
+    return get_run_info(datasource_run_lock_name(ds_id))
+
+
 class FetchStats:
     """抓取统计信息"""
 
@@ -89,17 +112,61 @@ class DataSourceService:
         self.db = db
         self.ds_repo = DataSourceRepository(db)
         self.content_repo = DataSourceContentRepository(db)
+        self.run_repo = DataSourceRunRepository(db)
+        # 中文说明：本次运行内容提交成功后才执行的回调（如写回已抓取 URL 过滤器）
+        self._post_commit_hooks: list = []
+        # 中文说明：当前运行的租约信息；提交前据此确认租约仍在（见 run_lock.ensure_lease）
+        self._run_info: Optional[dict] = None
 
     def run_datasource(
         self,
         ds: DataSource,
         force: bool = False,
         current_user: Optional[User] = None,
+        source: Optional[str] = None,
     ) -> DataSource:
         """
-        执行单个数据源的抓取逻辑，更新 last_run_at / next_run_at / _last_trigger 报告
+        执行单个数据源的抓取逻辑，更新 last_run_at / next_run_at，并写入一条运行历史（datasource_runs）
+
+        中文说明：同一数据源同一时刻只允许一次运行；已有运行时抛出 RunInProgress（携带正在进行的运行信息）。
+        - source：触发来源（manual/schedule/task），仅用于运行信息展示
         """
-        now_local = datetime.now()
+        info = {
+            "datasource_id": ds.id,
+            "source": source or ("manual" if current_user is not None else "schedule"),
+            "user_id": getattr(current_user, "id", None),
+            "force": bool(force),
+        }
+        with run_lease(datasource_run_lock_name(ds.id), info=info) as run_info:
+            # 中文说明：拿到锁后刷新一次，避免使用排队期间其它运行已更新过的旧状态
+            self.db.refresh(ds)
+            started_at = datetime.now()
+            self._run_info = run_info
+            try:
+                return self._run_datasource_locked(ds, force, current_user, run_info, started_at)
+            except Exception as exc:
+                # 中文说明：失败的运行也记一条历史（抓取内容不入库），便于排障与统计失败率
+                self.db.rollback()
+                try:
+                    self.run_repo.add_run(ds, run_info=run_info, started_at=started_at, status="failed", error=str(exc))
+                    self.db.commit()
+                except Exception:
+                    self.db.rollback()
+                    logger.exception("[DataSource] 记录失败运行历史失败 ds=%s", ds.id)
+                raise
+            finally:
+                self._post_commit_hooks.clear()
+                self._run_info = None
+
+    def _run_datasource_locked(
+        self,
+        ds: DataSource,
+        force: bool,
+        current_user: Optional[User],
+        run_info: dict,
+        started_at: datetime,
+    ) -> DataSource:
+        now_local = started_at
         now_naive = now_local
         cfg = ds.config if isinstance(ds.config, dict) else {}
 
@@ -114,6 +181,7 @@ class DataSourceService:
         stats = FetchStats()
 
         # 按类型获取内容
+        t_fetch = time.perf_counter()
         contents: list[DataSourceContent] = []
         if ds.source_type == "url":
             contents = self._fetch_urls(ds, cfg, now_naive, force, stats, record_user_id)
@@ -126,22 +194,45 @@ class DataSourceService:
         else:
             raise ValueError("不支持的数据源类型")
 
+        fetch_ms = int((time.perf_counter() - t_fetch) * 1000)
+
         # 更新运行时间
+        t_persist = time.perf_counter()
         self.ds_repo.update_run_times(
             ds,
             last_run_at=now_naive,
             next_run_at=_compute_next_run(ds.schedule_cron, now_local) if ds.schedule_cron and ds.enable_schedule else None,
         )
-
-        # 更新配置中的触发报告
-        trigger_report = {"stats": stats.to_dict(), "skipped_details": stats.skipped_details}
-        self.ds_repo.update_config_with_trigger_report(ds, trigger_report, len(contents), force)
+        # 中文说明：运行报告改存 datasource_runs，config 只保存用户配置；历史数据中的 _last_trigger 顺手清掉
+        self.ds_repo.drop_legacy_trigger_report(ds)
 
         # 保存内容
         self.content_repo.add_batch(contents)
+        self.db.flush()
+
+        # 运行历史：与内容同一事务提交
+        run = self.run_repo.add_run(
+            ds,
+            run_info=run_info,
+            started_at=started_at,
+            status="success",
+            ingested=len(contents),
+            stats=stats.to_dict(),
+            skipped_details=stats.skipped_details,
+            timings={"fetch": fetch_ms, "persist": int((time.perf_counter() - t_persist) * 1000)},
+        )
+        ensure_lease(self._run_info)
         self.content_repo.commit()
         self.db.refresh(ds)
+        for hook in self._post_commit_hooks:
+            try:
+                hook()
+            except Exception:
+                logger.exception("[DataSource] 运行提交后回调失败 ds=%s", ds.id)
+        self._post_commit_hooks.clear()
 
+        # 中文说明：挂到实例上，供手动触发接口直接返回本次运行报告
+        ds.last_run = run
         return ds
 
     def _fetch_urls(
@@ -168,11 +259,18 @@ class DataSourceService:
         firecrawl_scrape = cfg.get("firecrawl_scrape") if isinstance(cfg, dict) else None
         firecrawl_batch = cfg.get("firecrawl_batch") if isinstance(cfg, dict) else None
         crawl4ai_options = cfg.get("crawl4ai_options") if isinstance(cfg, dict) else None
+        crawl4ai_api_base = cfg.get("crawl4ai_api_base") if isinstance(cfg, dict) else None
+        crawl4ai_api_key = cfg.get("crawl4ai_api_key") if isinstance(cfg, dict) else None
         extractor_cfg = cfg.get("extractor") if isinstance(cfg, dict) else None
         cleaner_cfg = cfg.get("cleaner") if isinstance(cfg, dict) else None
         sub_concurrency = int(cfg.get("sub_concurrency", 12) or 12) if isinstance(cfg, dict) else 12
+        discovery_mode = str(cfg.get("discovery") or "").strip().lower() if isinstance(cfg, dict) else ""
+        discovery_limit = int(cfg.get("discovery_limit", 200) or 200) if isinstance(cfg, dict) else 200
         engine_lower = crawler_engine.lower()
 
+        if discovery_mode and discovery_mode not in DISCOVERY_MODES:
+            raise ValueError(f"不支持的 discovery 模式：{discovery_mode}（可选 sitemap/rss）")
+
         if not urls or not isinstance(urls, list):
             raise ValueError("url 类型需提供 urls 列表")
 
@@ -223,23 +321,95 @@ class DataSourceService:
         idx = 0
         discovered_subpages: list[str] = []
         discovered_seen: set[str] = set()
+        subpages_done: set[str] = set()
+        # 中文说明：Firecrawl 批量模式下已处理完的父页面（批量任务内无法用 idx 表示进度）
+        parents_done: set[str] = set()
+
+        # 中文说明：抓取队列检查点。上一次运行中途中断（worker 崩溃/发版）时，从检查点继续，
+        # 已抓取的内容在写检查点前已提交入库，恢复后不会从第 1 页重新开始。
+        settings = get_settings()
+        checkpoint_every = max(
+            1, int(cfg.get("checkpoint_every") or getattr(settings, "CRAWL_CHECKPOINT_EVERY", 10) or 10)
+        )
+        frontier = CrawlFrontier(ds.id, frontier_signature(cfg))
+        resumed = frontier.load()
+        if resumed:
+            full_urls = [(str(u), bool(d)) for u, d in resumed.get("full_urls") or []]
+            seen = set(resumed.get("seen") or [])
+            idx = int(resumed.get("idx") or 0)
+            discover_budget = int(resumed.get("discover_budget") or 0)
+            discovered_subpages = list(resumed.get("discovered_subpages") or [])
+            discovered_seen = set(discovered_subpages)
+            subpages_done = set(resumed.get("subpages_done") or [])
+            parents_done = set(resumed.get("parents_done") or [])
+            logger.info(
+                f"[DataSource] ds={ds.id} 从检查点恢复：{idx}/{len(full_urls)} 个页面、"
+                f"{len(subpages_done)}/{len(discovered_subpages)} 个子页面已完成"
+            )
+        persisted_n = 0
+
+        # 中文说明：发现的子页面链接统一规范化（去追踪参数/锚点/末尾斜杠等），并用跨运行的布隆过滤器
+        # 在网络请求之前跳过以往已抓取过的子页面；force=true 时不跳过。
+        canonicalize = canonicalizer_from_config(cfg)
+        seen_filter = SeenUrlFilter(ds.id, cfg)
+        use_seen_filter = seen_filter.enabled and not force
+
+        def _seen_before(link: str) -> bool:
+            if use_seen_filter and link in seen_filter:
+                stats.dedup_skipped += 1
+                stats.add_skipped(link, "seen_filter")
+                return True
+            return False
+
+        def _checkpoint(next_idx: int) -> None:
+            nonlocal persisted_n
+            # 中文说明：先提交已抓取内容，再写检查点；两步之间崩溃只会重抓少量页面，由判重兜底
+            # 租约已丢失时中止：同一数据源可能已有新的运行在写入
+            ensure_lease(self._run_info)
+            self.content_repo.add_batch(results[persisted_n:])
+            self.content_repo.commit()
+            persisted_n = len(results)
+            seen_filter.save()
+            frontier.save(
+                {
+                    "full_urls": [[u, d] for u, d in full_urls],
+                    "seen": list(seen),
+                    "idx": next_idx,
+                    "discover_budget": discover_budget,
+                    "discovered_subpages": discovered_subpages,
+                    "subpages_done": list(subpages_done),
+                    "parents_done": list(parents_done),
+                }
+            )
 
         # 中文说明：父页面按“当天”控制只抓一次（跨天保留）。
         # 这里用 now_naive 的日期作为“当天”口径。
         day_start = now_naive.replace(hour=0, minute=0, second=0, microsecond=0)
         day_end = day_start + timedelta(days=1)
 
+        firecrawl_key_id = None
+        firecrawl_key_extra = None
         if engine_lower == "firecrawl" and not (firecrawl_api_key or "").strip():
             picked = pick_api_key(self.db, "firecrawl", mark_used=True)
             if picked:
                 firecrawl_api_key = (picked.key or "").strip()
+                firecrawl_key_id = picked.id
+                firecrawl_key_extra = picked.extra
 
         crawler = get_crawler_by_engine(
             crawler_engine,
             use_playwright=use_playwright,
             firecrawl_api_key=firecrawl_api_key,
             firecrawl_api_base=firecrawl_api_base,
-            firecrawl_options=firecrawl_scrape if isinstance(firecrawl_scrape, dict) else None,
+            firecrawl_options=(
+                {**(firecrawl_scrape if isinstance(firecrawl_scrape, dict) else {}), "batch": firecrawl_batch}
+                if use_firecrawl_batch
+                else (firecrawl_scrape if isinstance(firecrawl_scrape, dict) else None)
+            ),
+            firecrawl_key_id=firecrawl_key_id,
+            firecrawl_key_extra=firecrawl_key_extra,
+            crawl4ai_api_base=crawl4ai_api_base if isinstance(crawl4ai_api_base, str) else None,
+            crawl4ai_api_key=crawl4ai_api_key if isinstance(crawl4ai_api_key, str) else None,
             crawl4ai_options=crawl4ai_options if isinstance(crawl4ai_options, dict) else None,
         )
 
@@ -279,6 +449,8 @@ class DataSourceService:
                 ds.id, url_hash, content_hash_raw,
                 getattr(clean_res, "content_hash_clean", None), force
             )
+            if is_discovered:
+                seen_filter.add(url_str)
             if should_skip:
                 stats.dedup_skipped += 1
                 reason = "dedup_hash_clean_same" if matched and matched.extra.get("content_hash_clean") else "dedup_hash_raw_same"
@@ -303,9 +475,15 @@ class DataSourceService:
                 fetched_at=now_naive,
             )
 
-        def _fetch_subpage(url: str) -> dict | None:
+        # 中文说明：crawl4ai 支持整批提交（HTTP 模式按 chunk_size 分批、本地模式并发复用常驻浏览器），
+        # 父页面按窗口预取、子页面整批抓取，避免逐个 URL 各发一次请求/各起一次任务
+        batch_fetch = isinstance(crawler, Crawl4aiCrawler)
+        batch_window = max(
+            1, int((crawl4ai_options if isinstance(crawl4ai_options, dict) else {}).get("chunk_size") or 10)
+        )
+
+        def _subpage_payload(url: str, page: Any) -> dict | None:
             try:
-                page = crawler.fetch(url, headers=headers)
                 html = page.html or ""
                 if not isinstance(html, str) or not html.strip():
                     return {"skip": "empty", "url": url}
@@ -327,42 +505,53 @@ class DataSourceService:
             except Exception:
                 return None
 
-        while idx < len(full_urls):
-            url, is_discovered = full_urls[idx]
-            idx += 1
-
-            # 中文说明：子页面统一走并发抓取（sub_parser），避免在主循环抓取一次后又在并发阶段重复抓取。
-            if is_discovered:
-                u = str(url)
-                if u and u not in discovered_seen:
-                    discovered_subpages.append(u)
-                    discovered_seen.add(u)
-                continue
-
-            # 中文说明：父页面同一天只抓一次。force=true 时允许覆盖当天记录。
-            url_str = str(url)
-            url_hash = compute_url_hash(url_str)
-            parent_today = self.content_repo.get_parent_record_for_day(
-                ds.id, url_hash, day_start, day_end
+        def _fetch_subpage(url: str) -> dict | None:
+            try:
+                page = crawler.fetch(url, headers=headers)
+            except Exception:
+                return None
+            return _subpage_payload(url, page)
+
+        # 中文说明：sitemap/rss 发现模式：urls 为 sitemap/订阅源地址，不抓列表页，
+        # 直接从订阅源拿到上次运行之后的新文章 URL，作为子页面抓取
+        if discovery_mode and not resumed:
+            feed_urls = [u for u, _ in full_urls]
+            full_urls = []
+            since = None if force else ds.last_run_at
+            links, feed_errors = discover_feed_urls(
+                discovery_mode,
+                feed_urls,
+                since=since,
+                headers=headers if isinstance(headers, dict) else None,
+                limit=discovery_limit,
+                canonicalize=canonicalize,
+                exclude=_seen_before,
+            )
+            for err in feed_errors:
+                stats.fetch_failed += 1
+                stats.add_skipped(err.get("url") or "", "feed_failed")
+            for link in links:
+                if link not in discovered_seen:
+                    discovered_subpages.append(link)
+                    discovered_seen.add(link)
+            logger.info(
+                f"[DataSource] ds={ds.id} {discovery_mode} 发现 {len(links)} 个新文章 URL（since={since}）"
             )
-            if parent_today and not force:
-                stats.dedup_skipped += 1
-                stats.add_skipped(url_str, "parent_daily_dedup", parent_today)
-                continue
 
+        def _process_parent_page(url: str, page: Any, parent_today: Optional[DataSourceContent]) -> str | None:
+            """父页面抽取/清洗/判重/入库；返回 HTML 供自动发现子页面，跳过或失败时返回 None。"""
             try:
-                page = crawler.fetch(url, headers=headers)
                 html = page.html or ""
                 if not isinstance(html, str) or not html.strip():
                     stats.empty_skipped += 1
                     stats.add_skipped(str(url), "empty")
-                    continue
+                    return None
 
                 content_text, extractor_name, extractor_meta = _extract_text_from_html(html, url)
                 if content_text == "":
                     stats.empty_skipped += 1
                     stats.add_skipped(str(url), "empty")
-                    continue
+                    return None
 
                 clean_res = clean_text(content_text, cleaner_cfg if isinstance(cleaner_cfg, dict) else None)
                 content_hash = compute_content_hash(content_text)
@@ -391,7 +580,7 @@ class DataSourceService:
                     )
                     results.append(parent_today)
                     # 覆盖场景下，不再自动发现子页面（避免一次手动覆盖触发大量子页面抓取）
-                    continue
+                    return None
 
                 rec = _build_record(
                     url_str=str(url),
@@ -402,19 +591,128 @@ class DataSourceService:
                     extractor_name=extractor_name,
                     display_title=None,
                     extractor_meta=extractor_meta,
-                    is_discovered=is_discovered,
+                    is_discovered=False,
                 )
                 if rec:
                     results.append(rec)
             except Exception as exc:
                 logger.error(f"Fetch failed for {url}: {str(exc)}")
                 stats.fetch_failed += 1
+                return None
+            return html
+
+        # 中文说明：Firecrawl 批量模式：父页面一次提交为 Firecrawl 批量任务，边完成边进入抽取/清洗/判重流程。
+        # 检查点记录已处理完的父页面（parents_done），恢复时直接跳过、不再提交；force=true 时同样生效。
+        if use_firecrawl_batch and idx < len(full_urls):
+            batch_parents: dict[str, Optional[DataSourceContent]] = {}
+            for url, is_discovered in full_urls[idx:]:
+                url_str = str(url)
+                if is_discovered or url_str in batch_parents or url_str in parents_done:
+                    continue
+                parent_today = self.content_repo.get_parent_record_for_day(
+                    ds.id, compute_url_hash(url_str), day_start, day_end
+                )
+                if parent_today and not force:
+                    stats.dedup_skipped += 1
+                    stats.add_skipped(url_str, "parent_daily_dedup", parent_today)
+                    continue
+                batch_parents[url_str] = parent_today
+
+            processed = 0
+            for url_str, page in crawler.fetch_many(list(batch_parents.keys()), headers=headers):
+                # 中文说明：检查点写在处理下一个页面之前，此时 parents_done 中的父页面均已处理完并随内容一起提交
+                if processed and processed % checkpoint_every == 0:
+                    _checkpoint(idx)
+                processed += 1
+                parents_done.add(url_str)
+                if isinstance(page, Exception):
+                    logger.error(f"Fetch failed for {url_str}: {str(page)}")
+                    stats.fetch_failed += 1
+                    continue
+                _process_parent_page(url_str, page, batch_parents.get(url_str))
+            idx = len(full_urls)
+
+        # 中文说明：批量抓取时预取结果暂存于此：{url: (当天父页面记录, 抓取结果/异常，当天已抓过则为 None)}
+        prefetched: dict[str, tuple[Optional[DataSourceContent], Any]] = {}
+
+        def _prefetch_parents(start: int) -> None:
+            """从 full_urls[start:] 取下一窗口父页面，按当天判重过滤后整批抓取，结果写入 prefetched。"""
+            window: list[str] = []
+            for u, d in full_urls[start:]:
+                u = str(u)
+                if d or u in prefetched:
+                    continue
+                parent = self.content_repo.get_parent_record_for_day(
+                    ds.id, compute_url_hash(u), day_start, day_end
+                )
+                if parent and not force:
+                    prefetched[u] = (parent, None)
+                    continue
+                prefetched[u] = (parent, RequestException(f"抓取未返回该 URL: {u}"))
+                window.append(u)
+                if len(window) >= batch_window:
+                    break
+            for u, page in crawler.fetch_many(window, headers=headers):
+                prefetched[u] = (prefetched[u][0], page)
+
+        last_checkpoint_idx = idx
+        while idx < len(full_urls):
+            if idx - last_checkpoint_idx >= checkpoint_every:
+                _checkpoint(idx)
+                last_checkpoint_idx = idx
+
+            url, is_discovered = full_urls[idx]
+            idx += 1
+
+            # 中文说明：子页面统一走并发抓取（sub_parser），避免在主循环抓取一次后又在并发阶段重复抓取。
+            if is_discovered:
+                u = str(url)
+                if u and u not in discovered_seen:
+                    discovered_subpages.append(u)
+                    discovered_seen.add(u)
+                continue
+
+            # 中文说明：父页面同一天只抓一次。force=true 时允许覆盖当天记录。
+            url_str = str(url)
+            page = None
+            if batch_fetch:
+                if url_str not in prefetched:
+                    _prefetch_parents(idx - 1)
+                parent_today, page = prefetched.pop(url_str)
+            else:
+                parent_today = self.content_repo.get_parent_record_for_day(
+                    ds.id, compute_url_hash(url_str), day_start, day_end
+                )
+            if parent_today and not force:
+                stats.dedup_skipped += 1
+                stats.add_skipped(url_str, "parent_daily_dedup", parent_today)
+                continue
+
+            try:
+                if page is None:
+                    page = crawler.fetch(url, headers=headers)
+                elif isinstance(page, Exception):
+                    raise page
+            except Exception as exc:
+                logger.error(f"Fetch failed for {url}: {str(exc)}")
+                stats.fetch_failed += 1
+                continue
+            html = _process_parent_page(url_str, page, parent_today)
+            if html is None:
                 continue
 
             # 自动发现子页面
             if auto_discover and discover_budget > 0:
                 try:
-                    discovered_links = discover_links(html, url, discover_budget, seen, parser_cfg)
+                    discovered_links = discover_links(
+                        html,
+                        url,
+                        discover_budget,
+                        seen,
+                        parser_cfg,
+                        canonicalize=canonicalize,
+                        exclude=_seen_before,
+                    )
                 except Exception:
                     discovered_links = []
                 for link in discovered_links:
@@ -423,39 +721,63 @@ class DataSourceService:
                         seen.add(link)
                         discover_budget -= 1
 
-        # 子页面并发抓取
-        subpage_urls = discovered_subpages
-        if isinstance(sub_parser_cfg, dict) and subpage_urls:
-            workers = max(1, min(32, sub_concurrency))
-            with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as ex:
-                futs = [ex.submit(_fetch_subpage, u) for u in subpage_urls]
-                for fut in concurrent.futures.as_completed(futs):
-                    try:
-                        payload = fut.result()
-                    except Exception:
-                        stats.fetch_failed += 1
-                        continue
-                    if not payload:
-                        continue
-                    if isinstance(payload, dict) and payload.get("skip") == "empty":
-                        stats.empty_skipped += 1
-                        if payload.get("url"):
-                            stats.add_skipped(payload.get("url"), "empty")
-                        continue
-                    rec2 = _build_record(
-                        url_str=payload["url"],
-                        clean_res=payload["clean_res"],
-                        content_hash_raw=payload["content_hash"],
-                        status_code=payload.get("status_code"),
-                        final_url=payload.get("final_url"),
-                        extractor_name=payload.get("extractor"),
-                        display_title=payload.get("display_title"),
-                        extractor_meta=payload.get("extractor_meta"),
-                        is_discovered=True,
-                    )
-                    if rec2:
-                        results.append(rec2)
-
+        # 父页面阶段结束：写一次检查点，子页面阶段中断时不必重跑父页面
+        if (isinstance(sub_parser_cfg, dict) or discovery_mode) and discovered_subpages:
+            _checkpoint(idx)
+
+        # 子页面并发抓取（sitemap/rss 模式下文章页即“子页面”，未配置 sub_parser 时用正文抽取）
+        subpage_urls = [u for u in discovered_subpages if u not in subpages_done]
+        done_since_checkpoint = 0
+
+        def _handle_subpage(url: str, payload: dict | None) -> None:
+            nonlocal done_since_checkpoint
+            # 中文说明：检查点只覆盖“已处理完”的子页面，当前这个在本次处理末尾才算处理完
+            if done_since_checkpoint >= checkpoint_every:
+                _checkpoint(idx)
+                done_since_checkpoint = 0
+            subpages_done.add(url)
+            done_since_checkpoint += 1
+            if not payload:
+                return
+            if isinstance(payload, dict) and payload.get("skip") == "empty":
+                stats.empty_skipped += 1
+                if payload.get("url"):
+                    stats.add_skipped(payload.get("url"), "empty")
+                return
+            rec2 = _build_record(
+                url_str=payload["url"],
+                clean_res=payload["clean_res"],
+                content_hash_raw=payload["content_hash"],
+                status_code=payload.get("status_code"),
+                final_url=payload.get("final_url"),
+                extractor_name=payload.get("extractor"),
+                display_title=payload.get("display_title"),
+                extractor_meta=payload.get("extractor_meta"),
+                is_discovered=True,
+            )
+            if rec2:
+                results.append(rec2)
+
+        if (isinstance(sub_parser_cfg, dict) or discovery_mode) and subpage_urls:
+            if batch_fetch:
+                for u, page in crawler.fetch_many(subpage_urls, headers=headers):
+                    _handle_subpage(u, None if isinstance(page, Exception) else _subpage_payload(u, page))
+            else:
+                workers = max(1, min(32, sub_concurrency))
+                with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as ex:
+                    futs = {ex.submit(_fetch_subpage, u): u for u in subpage_urls}
+                    for fut in concurrent.futures.as_completed(futs):
+                        try:
+                            payload = fut.result()
+                        except Exception:
+                            stats.fetch_failed += 1
+                            payload = None
+                        _handle_subpage(futs[fut], payload)
+
+        # 中文说明：剩余内容由 run_datasource 统一提交；提交成功后再清除检查点、写回过滤器，
+        # 最终提交失败（或提交前崩溃）时保留检查点，下次运行仍可从断点继续
+        self._post_commit_hooks.append(frontier.clear)
+        self._post_commit_hooks.append(seen_filter.save)
         return results
 
     def _fetch_api(
@@ -536,10 +858,14 @@ class DataSourceService:
 
         firecrawl_api_key = (cfg.get("firecrawl_api_key") if isinstance(cfg, dict) else None) or ""
         firecrawl_api_base = cfg.get("firecrawl_api_base") if isinstance(cfg, dict) else None
+        firecrawl_key_id = None
+        firecrawl_key_extra = None
         if not str(firecrawl_api_key).strip():
             picked = pick_api_key(self.db, "firecrawl", mark_used=True)
             if picked:
                 firecrawl_api_key = (picked.key or "").strip()
+                firecrawl_key_id = picked.id
+                firecrawl_key_extra = picked.extra
         if not str(firecrawl_api_key).strip():
             raise ValueError("FireCrawl 搜索模式未配置可用 API Key")
 
@@ -573,11 +899,18 @@ class DataSourceService:
             "Content-Type": "application/json",
         }
         try:
-            resp = requests.post(endpoint, json=body, headers=req_headers, timeout=120)
+            with rate_limited(
+                "firecrawl",
+                key_id=limit_key_id(firecrawl_key_id, str(firecrawl_api_key)),
+                extra=firecrawl_key_extra,
+            ):
+                resp = requests.post(endpoint, json=body, headers=req_headers, timeout=120)
             resp.raise_for_status()
             jd = resp.json()
         except Exception as exc:
+            report_key_error(firecrawl_key_id, exc)
             raise ValueError(f"FireCrawl 搜索失败：{exc}") from exc
+        report_key_success(firecrawl_key_id)
 
         if not isinstance(jd, dict) or not jd.get("success"):
             raise ValueError(f"FireCrawl 搜索返回异常：{jd}")
@@ -685,6 +1018,8 @@ class DataSourceService:
 
         ak = (os.getenv("ALIYUN_ACCESS_KEY_ID") or os.getenv("ACCESS_KEY_ID") or "").strip()
         sk = (os.getenv("ALIYUN_ACCESS_KEY_SECRET") or os.getenv("ACCESS_KEY_SECRET") or "").strip()
+        iqs_key_id = None
+        iqs_key_extra = None
         if not (ak and sk):
             picked = pick_api_key(self.db, "aliyun_iqs", mark_used=True)
             if picked and isinstance(getattr(picked, "extra", None), dict):
@@ -693,6 +1028,8 @@ class DataSourceService:
                 sk2 = str(extra.get("access_key_secret") or extra.get("accessKeySecret") or "").strip()
                 if ak2 and sk2:
                     ak, sk = ak2, sk2
+                    iqs_key_id = picked.id
+                    iqs_key_extra = extra
         if not (ak and sk):
             raise ValueError("未配置阿里统一搜索 AK/SK")
 
@@ -741,9 +1078,12 @@ class DataSourceService:
         req = models.UnifiedSearchRequest(body=body)
 
         try:
-            resp = client.unified_search(req)
+            with rate_limited("aliyun_iqs", key_id=limit_key_id(iqs_key_id, ak), extra=iqs_key_extra):
+                resp = client.unified_search(req)
         except Exception as exc:
+            report_key_error(iqs_key_id, exc)
             raise ValueError(f"阿里统一搜索失败：{exc}") from exc
+        report_key_success(iqs_key_id)
 
         page_items = getattr(resp.body, "page_items", None) or []
         parser_cfg = cfg.get("parser") if isinstance(cfg, dict) else None
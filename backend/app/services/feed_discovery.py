@@ -0,0 +1,223 @@
+"""Sitemap / RSS / Atom 增量发现。
+
+中文说明：
+- URL 数据源配置 discovery=sitemap|rss 时，不再抓取列表页 + CSS 选择器发现链接，
+  而是请求 sitemap（含 sitemap 索引）或 RSS/Atom 订阅源，直接拿到文章 URL；
+- 解析使用 iterparse 流式处理（边下载边解析、处理完即释放节点），大 sitemap 也不会整体载入内存；
+- 按 lastmod / pubDate / updated 过滤出“上次运行之后”的条目；没有时间字段的条目保留，交给判重兜底；
+  只有日期的 lastmod（如 2024-05-01）按当天结束计，避免当天上次运行之后发布的文章被漏掉；
+- sitemap 条目只取 url/sitemap 下 sitemap 命名空间的直接子节点 loc/lastmod，
+  忽略 image:loc / video:loc 等扩展字段（去掉命名空间后同名，会覆盖页面地址）；
+- sitemap 索引只展开 lastmod 在 since 之后（或未标注 lastmod）的子 sitemap。
+"""
+
+from __future__ import annotations
+
+import gzip
+import logging
+import xml.etree.ElementTree as ET
+from datetime import datetime, time
+from email.utils import parsedate_to_datetime
+from typing import Callable, Iterator, Optional
+
+import requests
+
+
+logger = logging.getLogger(__name__)
+
+DISCOVERY_MODES = {"sitemap", "rss"}
+
+_DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (compatible; auto-media-bot/1.0)",
+    "Accept": "application/xml,text/xml,application/rss+xml,application/atom+xml;q=0.9,*/*;q=0.8",
+}
+
+
+def _local(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1].lower() if isinstance(tag, str) else ""
+
+
+def _ns(tag: str) -> str:
+    return tag[1:].split("}", 1)[0] if isinstance(tag, str) and tag.startswith("{") else ""
+
+
+def _to_naive_local(dt: Optional[datetime]) -> Optional[datetime]:
+    if dt is None:
+        return None
+    if dt.tzinfo is not None:
+        return dt.astimezone().replace(tzinfo=None)
+    return dt
+
+
+def parse_feed_datetime(value: Optional[str]) -> Optional[datetime]:
+    """解析 sitemap/Atom 的 W3C 时间与 RSS 的 RFC822 时间；失败返回 None。
+
+    中文说明：只有日期（YYYY-MM-DD）时返回当天 23:59:59.999999，按“当天任意时刻都可能更新”保守处理。
+    """
+    v = (value or "").strip()
+    if not v:
+        return None
+    try:
+        dt = datetime.fromisoformat(v.replace("Z", "+00:00"))
+        if len(v) == 10:
+            dt = datetime.combine(dt.date(), time.max)
+        return _to_naive_local(dt)
+    except ValueError:
+        pass
+    try:
+        return _to_naive_local(parsedate_to_datetime(v))
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+def _open_stream(url: str, headers: Optional[dict], timeout: int):
+    resp = requests.get(url, headers={**_DEFAULT_HEADERS, **(headers or {})}, timeout=timeout, stream=True)
+    resp.raise_for_status()
+    resp.raw.decode_content = True
+    stream = resp.raw
+    if url.lower().endswith(".gz") and "gzip" not in (resp.headers.get("Content-Encoding") or "").lower():
+        stream = gzip.GzipFile(fileobj=resp.raw)
+    return resp, stream
+
+
+def _is_new(dt: Optional[datetime], since: Optional[datetime]) -> bool:
+    return since is None or dt is None or dt > since
+
+
+def iter_sitemap_urls(
+    url: str,
+    *,
+    since: Optional[datetime] = None,
+    headers: Optional[dict] = None,
+    timeout: int = 20,
+    max_depth: int = 2,
+) -> Iterator[tuple[str, Optional[datetime]]]:
+    """流式遍历 sitemap（urlset / sitemapindex），产出 (文章 URL, lastmod)。"""
+    resp, stream = _open_stream(url, headers, timeout)
+    children: list[str] = []
+    try:
+        loc: Optional[str] = None
+        lastmod: Optional[datetime] = None
+        depth = 0
+        # 中文说明：当前 url/sitemap 条目的深度与命名空间；只认该命名空间下的直接子节点
+        entry_depth: Optional[int] = None
+        entry_ns = ""
+        for event, elem in ET.iterparse(stream, events=("start", "end")):
+            tag = _local(elem.tag)
+            if event == "start":
+                depth += 1
+                if entry_depth is None and tag in {"url", "sitemap"}:
+                    entry_depth, entry_ns = depth, _ns(elem.tag)
+                    loc, lastmod = None, None
+                continue
+            if entry_depth is not None and depth == entry_depth + 1 and _ns(elem.tag) == entry_ns:
+                if tag == "loc":
+                    loc = loc or (elem.text or "").strip()
+                elif tag == "lastmod":
+                    lastmod = lastmod or parse_feed_datetime(elem.text)
+            elif depth == entry_depth:
+                if loc and _is_new(lastmod, since):
+                    if tag == "url":
+                        yield loc, lastmod
+                    else:
+                        children.append(loc)
+                loc, lastmod, entry_depth = None, None, None
+                elem.clear()
+            depth -= 1
+    finally:
+        resp.close()
+
+    if max_depth <= 0:
+        return
+    for child in children:
+        try:
+            yield from iter_sitemap_urls(child, since=since, headers=headers, timeout=timeout, max_depth=max_depth - 1)
+        except Exception as exc:
+            logger.warning(f"[feed_discovery] 子 sitemap 解析失败 {child}: {exc}")
+
+
+def iter_feed_urls(
+    url: str,
+    *,
+    since: Optional[datetime] = None,
+    headers: Optional[dict] = None,
+    timeout: int = 20,
+) -> Iterator[tuple[str, Optional[datetime]]]:
+    """流式遍历 RSS 2.0 / Atom 订阅源，产出 (文章 URL, 发布/更新时间)。"""
+    resp, stream = _open_stream(url, headers, timeout)
+    try:
+        link: Optional[str] = None
+        published: Optional[datetime] = None
+        in_item = False
+        for event, elem in ET.iterparse(stream, events=("start", "end")):
+            tag = _local(elem.tag)
+            if event == "start":
+                # 中文说明：只取 item/entry 内的字段，忽略 channel/feed 级别的 link 与时间
+                if tag in {"item", "entry"}:
+                    in_item = True
+                    link, published = None, None
+                continue
+            if not in_item:
+                continue
+            if tag == "link":
+                # RSS：<link>url</link>；Atom：<link rel="alternate" href="url"/>
+                href = elem.get("href")
+                rel = (elem.get("rel") or "alternate").lower()
+                if href and rel == "alternate":
+                    link = link or href.strip()
+                elif not href and (elem.text or "").strip():
+                    link = link or elem.text.strip()
+            elif tag in {"pubdate", "published", "updated", "date"}:
+                published = published or parse_feed_datetime(elem.text)
+            elif tag in {"item", "entry"}:
+                if link and _is_new(published, since):
+                    yield link, published
+                link, published = None, None
+                in_item = False
+                elem.clear()
+    finally:
+        resp.close()
+
+
+def discover_feed_urls(
+    mode: str,
+    feed_urls: list[str],
+    *,
+    since: Optional[datetime] = None,
+    headers: Optional[dict] = None,
+    limit: int = 200,
+    canonicalize: Optional[Callable[[str], str]] = None,
+    exclude: Optional[Callable[[str], bool]] = None,
+) -> tuple[list[str], list[dict]]:
+    """按 discovery 模式从多个 sitemap/订阅源收集新文章 URL。
+
+    - canonicalize / exclude：同 discover_links，被排除的条目不占用 limit
+    - 返回 (urls, errors)；单个源失败不影响其它源，错误明细由调用方计入统计。
+    """
+    m = (mode or "").strip().lower()
+    if m not in DISCOVERY_MODES:
+        raise ValueError(f"不支持的 discovery 模式：{mode}（可选 sitemap/rss）")
+
+    iter_fn = iter_sitemap_urls if m == "sitemap" else iter_feed_urls
+    out: list[str] = []
+    seen: set[str] = set()
+    errors: list[dict] = []
+    for feed in feed_urls:
+        if len(out) >= limit:
+            break
+        try:
+            for link, _ in iter_fn(feed, since=since, headers=headers):
+                if canonicalize is not None:
+                    link = canonicalize(link)
+                if link in seen:
+                    continue
+                seen.add(link)
+                if exclude is not None and exclude(link):
+                    continue
+                out.append(link)
+                if len(out) >= limit:
+                    break
+        except Exception as exc:
+            logger.warning(f"[feed_discovery] {m} 解析失败 {feed}: {exc}")
+            errors.append({"url": feed, "error": str(exc)})
+    return out, errors
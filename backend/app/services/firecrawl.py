@@ -6,7 +6,14 @@ from typing import List, Dict, Any, Optional
 from sqlalchemy.orm import Session
 
 from app.core.config import get_settings
-from app.services.api_key_pool import pick_api_key
+from app.services.api_key_pool import (
+    ERROR_TIMEOUT,
+    classify_http_status,
+    pick_api_key,
+    report_key_failure,
+    report_key_success,
+)
+from app.services.rate_limiter import limit_key_id, rate_limited
 
 
 class FirecrawlService:
@@ -26,18 +33,22 @@ class FirecrawlService:
             if "api.firecrawl.dev" in self.api_base and "/v" not in self.api_base:
                 self.api_base = self.api_base + "/v2"
 
-    def _get_api_key(self, db: Optional[Session] = None) -> str:
-        """获取可用 API Key：优先使用环境变量/初始化参数，其次尝试从 API Key Pool 获取。"""
+    def _pick_api_key(self, db: Optional[Session] = None) -> tuple[str, Optional[int], Optional[dict]]:
+        """获取可用 API Key 及其在 API Key 池中的 id 与 extra（环境变量 key 均为 None），用于健康度上报与按 key 限流。"""
         if self._env_api_key:
-            return self._env_api_key
+            return self._env_api_key, None, None
         
         if db:
             picked = pick_api_key(db, "firecrawl", mark_used=True)
             if picked and picked.key:
-                return picked.key
+                return picked.key, picked.id, picked.extra
         
         raise ValueError("FireCrawl API Key 未配置（环境变量或 API Key 池均未找到可用 Key）")
 
+    def _get_api_key(self, db: Optional[Session] = None) -> str:
+        """获取可用 API Key：优先使用环境变量/初始化参数，其次尝试从 API Key Pool 获取。"""
+        return self._pick_api_key(db)[0]
+
     def _get_headers(self, db: Optional[Session] = None) -> Dict[str, str]:
         api_key = self._get_api_key(db)
         return {
@@ -70,18 +81,31 @@ class FirecrawlService:
             },
         }
 
+        api_key, key_id, key_extra = self._pick_api_key(db)
         try:
-            resp = requests.post(
-                endpoint, json=payload, headers=self._get_headers(db), timeout=60
-            )
+            with rate_limited("firecrawl", key_id=limit_key_id(key_id, api_key), extra=key_extra):
+                resp = requests.post(
+                    endpoint,
+                    json=payload,
+                    headers={"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"},
+                    timeout=60,
+                )
+            if resp.status_code >= 300:
+                report_key_failure(
+                    key_id, classify_http_status(resp.status_code), retry_after=resp.headers.get("Retry-After")
+                )
             resp.raise_for_status()
             data = resp.json()
+        except requests.Timeout as e:
+            report_key_failure(key_id, ERROR_TIMEOUT)
+            raise RuntimeError(f"Firecrawl 搜索失败: {str(e)}") from e
         except Exception as e:
             # 记录日志或静默失败？视业务需求。这里抛出异常以便上层感知。
             raise RuntimeError(f"Firecrawl 搜索失败: {str(e)}") from e
 
         if not data.get("success"):
             raise RuntimeError(f"Firecrawl 搜索返回异常: {data}")
+        report_key_success(key_id)
 
         # 标准化输出
         results = []
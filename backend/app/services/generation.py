@@ -1,6 +1,7 @@
 from typing import List, Optional
 
 import json
+from contextlib import contextmanager
 from datetime import datetime
 import logging
 import re
@@ -16,6 +17,12 @@ from app.models.material_pack import MaterialPack
 from app.schemas.article import ArticleOut, GenerationRequest
 from app.services.llm_provider import get_provider, get_provider_model_name
 from app.core.config import get_settings
+from app.services.prompt_budget import (
+    BudgetEntry,
+    estimate_text_tokens,
+    fit_prompt_budget,
+    get_prompt_token_budget,
+)
 from app.services.prompt_builder import build_generation_prompt_with_template
 from app.services.prompt_templates import ensure_default_template, get_template
 from app.services.firecrawl import firecrawl_service
@@ -36,6 +43,25 @@ def _truncate_for_log(s: str, limit: int) -> str:
     return t[:n] + "\n...[truncated]"
 
 
+class _StageTimer:
+    """按阶段累计耗时（毫秒），用于记录生成链路的耗时分布。"""
+
+    def __init__(self) -> None:
+        self._t_start = time.perf_counter()
+        self.timings: dict[str, int] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0) + int((time.perf_counter() - t0) * 1000)
+
+    def total_ms(self) -> int:
+        return int((time.perf_counter() - self._t_start) * 1000)
+
+
 def _load_source_snippets(
     db: Session, source_ids: Optional[List[int]]
 ) -> tuple[list[str], list[int]]:
@@ -129,10 +155,12 @@ def _compress_material_text_via_llm(
     text: str,
     brief_max_chars: int,
     bullet_count: int,
+    usage_log: Optional[list[dict]] = None,
 ) -> dict:
     """对超长素材做关键内容提取与压缩，返回分层摘要结构。
 
     返回结构：{"brief": str, "bullets": list[str]}
+    usage_log 不为 None 时，会把本次压缩调用的模型用量追加进去。
     """
 
     safe_brief = max(80, int(brief_max_chars or 180))
@@ -150,7 +178,10 @@ def _compress_material_text_via_llm(
         f"{(text or '').strip()}\n"
     )
 
-    raw = (provider.generate(prompt, temperature=0.2, max_tokens=1024, length=600) or "").strip()
+    result = provider.generate_with_usage(prompt, temperature=0.2, max_tokens=1024, length=600)
+    if usage_log is not None:
+        usage_log.append(result.usage or {})
+    raw = (result.text or "").strip()
     if not raw:
         raise ValueError("素材压缩模型返回为空")
 
@@ -222,6 +253,22 @@ def _compress_material_text_via_llm(
     return out
 
 
+def _matching_cached_summary(
+    it: MaterialItem, *, threshold_chars: int, brief_max_chars: int, bullet_count: int
+) -> Optional[dict]:
+    """已缓存且压缩参数与当前配置一致的分层摘要；否则返回 None。"""
+    cached = _material_cached_layered_summary(it)
+    if not cached:
+        return None
+    if (
+        int(cached.get("threshold_chars") or 0) != int(threshold_chars or 0)
+        or int(cached.get("brief_max_chars") or 0) != int(brief_max_chars or 0)
+        or int(cached.get("bullet_count") or 0) != int(bullet_count or 0)
+    ):
+        return None
+    return cached
+
+
 def _get_or_create_layered_summary(
     db: Session,
     req: GenerationRequest,
@@ -231,6 +278,7 @@ def _get_or_create_layered_summary(
     threshold_chars: int,
     brief_max_chars: int,
     bullet_count: int,
+    usage_log: Optional[list[dict]] = None,
 ) -> Optional[dict]:
     text = (it.text or "").strip()
     if not text:
@@ -240,21 +288,20 @@ def _get_or_create_layered_summary(
     if len(text) <= int(threshold_chars or 0):
         return None
 
-    cached = _material_cached_layered_summary(it)
-    if cached and int(cached.get("threshold_chars") or 0) == int(threshold_chars or 0):
-        if int(cached.get("brief_max_chars") or 0) == int(brief_max_chars or 0) and int(
-            cached.get("bullet_count") or 0
-        ) == int(bullet_count or 0):
-            settings = get_settings()
-            if bool(getattr(settings, "GENERATION_DEBUG", False)):
-                logger.info(
-                    "[GENERATION_DEBUG] material_compress cache_hit: item_id=%s source_chars=%s brief=%s bullets=%s",
-                    getattr(it, "id", None),
-                    len(text),
-                    cached.get("brief"),
-                    cached.get("bullets"),
-                )
-            return cached
+    cached = _matching_cached_summary(
+        it, threshold_chars=threshold_chars, brief_max_chars=brief_max_chars, bullet_count=bullet_count
+    )
+    if cached:
+        settings = get_settings()
+        if bool(getattr(settings, "GENERATION_DEBUG", False)):
+            logger.info(
+                "[GENERATION_DEBUG] material_compress cache_hit: item_id=%s source_chars=%s brief=%s bullets=%s",
+                getattr(it, "id", None),
+                len(text),
+                cached.get("brief"),
+                cached.get("bullets"),
+            )
+        return cached
 
     ls = _compress_material_text_via_llm(
         provider=provider,
@@ -262,6 +309,7 @@ def _get_or_create_layered_summary(
         text=text,
         brief_max_chars=brief_max_chars,
         bullet_count=bullet_count,
+        usage_log=usage_log,
     )
 
     meta = it.meta if isinstance(it.meta, dict) else {}
@@ -337,34 +385,46 @@ def _build_materials_block(items: list[MaterialItem]) -> str:
     return "\n\n".join(p for p in parts if p.strip())
 
 
-def _build_materials_block_layered(
+_COMPRESSED_BULLET_EST_CHARS = 60
+
+
+def _build_material_entries(
     db: Session,
     req: GenerationRequest,
     items: list[MaterialItem],
     *,
     provider,
-) -> str:
-    """方案C：将素材构造成“短内容直用 + 长内容分层摘要”的 Prompt 文本块。"""
+    usage_log: Optional[list[dict]] = None,
+    compress: bool = True,
+    only: Optional[set[int]] = None,
+) -> list[BudgetEntry]:
+    """方案C：将素材转换为“短内容直用 + 长内容分层摘要”的条目列表（每条对应 Prompt 中的一行）。
+
+    - order 为条目在 items 中的下标；only 不为 None 时只处理这些下标的条目；
+    - compress=False 时不调用模型：长素材有可用的已缓存摘要则直接使用，否则按压缩结果的上限长度
+      截取原文作为估算（供预算预筛，决定哪些条目值得压缩）。
+    """
 
     if not items:
-        return ""
+        return []
 
     settings = get_settings()
     threshold_chars = int(getattr(settings, "MATERIAL_COMPRESS_CHAR_THRESHOLD", 1800) or 1800)
     brief_max_chars = int(getattr(settings, "MATERIAL_COMPRESS_BRIEF_MAX_CHARS", 180) or 180)
     bullet_count = int(getattr(settings, "MATERIAL_COMPRESS_BULLET_COUNT", 6) or 6)
+    # 中文说明：压缩结果长度估算：摘要上限 + 每条要点约 _COMPRESSED_BULLET_EST_CHARS 字
+    compressed_est_chars = brief_max_chars + bullet_count * _COMPRESSED_BULLET_EST_CHARS
 
-    groups: dict[str, list[MaterialItem]] = {}
-    for it in items:
-        groups.setdefault((it.item_type or "").strip().lower() or "note", []).append(it)
-
-    def _fmt_list(xs: list[MaterialItem], with_url: bool = False) -> str:
-        lines: list[str] = []
-        for x in xs:
-            t = (x.text or "").strip()
-            if not t:
-                continue
+    entries: list[BudgetEntry] = []
+    for order, x in enumerate(items):
+        if only is not None and order not in only:
+            continue
+        t = (x.text or "").strip()
+        if not t:
+            continue
+        group = (x.item_type or "").strip().lower() or "note"
 
+        if compress:
             ls = _get_or_create_layered_summary(
                 db,
                 req,
@@ -373,79 +433,151 @@ def _build_materials_block_layered(
                 threshold_chars=threshold_chars,
                 brief_max_chars=brief_max_chars,
                 bullet_count=bullet_count,
+                usage_log=usage_log,
             )
+        elif len(t) > threshold_chars:
+            ls = _matching_cached_summary(
+                x, threshold_chars=threshold_chars, brief_max_chars=brief_max_chars, bullet_count=bullet_count
+            )
+            if not ls:
+                t = t[:compressed_est_chars]
+        else:
+            ls = None
+
+        if ls:
+            brief = str(ls.get("brief") or "").strip()
+            bullets = ls.get("bullets") if isinstance(ls.get("bullets"), list) else []
+            bullet_text = "；".join(str(b).strip() for b in bullets if isinstance(b, str) and b.strip())
+            content = f"摘要：{brief}"
+            if bullet_text:
+                content += f"；要点：{bullet_text}"
+        else:
+            content = t
+
+        if group == "source" and x.source_url:
+            content = f"{content}（{x.source_url}）"
+        entries.append(BudgetEntry(text=content, group=group, order=order))
+
+    return entries
+
+
+def _assemble_materials_block(entries: list[BudgetEntry]) -> str:
+    """按分组把素材条目拼成 Prompt 文本块（分组顺序与 _build_materials_block 保持一致）。"""
+    if not entries:
+        return ""
 
-            if ls:
-                brief = str(ls.get("brief") or "").strip()
-                bullets = ls.get("bullets") if isinstance(ls.get("bullets"), list) else []
-                bullet_text = "；".join(str(b).strip() for b in bullets if isinstance(b, str) and b.strip())
-                content = f"摘要：{brief}"
-                if bullet_text:
-                    content += f"；要点：{bullet_text}"
-            else:
-                content = t
-
-            if with_url and x.source_url:
-                lines.append(f"- {content}（{x.source_url}）")
-            else:
-                lines.append(f"- {content}")
-
-        return "\n".join(lines)
+    groups: dict[str, list[str]] = {}
+    for e in entries:
+        groups.setdefault(e.group, []).append(f"- {e.text}")
 
     parts: list[str] = []
-    if groups.get("note"):
-        parts.append("【我的补充】\n" + _fmt_list(groups["note"]))
-    if groups.get("bullet"):
-        parts.append("【要点】\n" + _fmt_list(groups["bullet"]))
-    if groups.get("fact"):
-        parts.append("【事实】\n" + _fmt_list(groups["fact"]))
-    if groups.get("quote"):
-        parts.append("【引用】\n" + _fmt_list(groups["quote"], with_url=False))
-    if groups.get("source"):
-        parts.append("【来源】\n" + _fmt_list(groups["source"], with_url=True))
+    for key, header in (
+        ("note", "【我的补充】"),
+        ("bullet", "【要点】"),
+        ("fact", "【事实】"),
+        ("quote", "【引用】"),
+        ("source", "【来源】"),
+    ):
+        if groups.get(key):
+            parts.append(header + "\n" + "\n".join(groups[key]))
 
     return "\n\n".join(p for p in parts if p.strip())
 
 
+def _build_materials_block_layered(
+    db: Session,
+    req: GenerationRequest,
+    items: list[MaterialItem],
+    *,
+    provider,
+) -> str:
+    """方案C：将素材构造成“短内容直用 + 长内容分层摘要”的 Prompt 文本块（不做 token 预算）。"""
+    return _assemble_materials_block(_build_material_entries(db, req, items, provider=provider))
+
+
+def _sum_usage_tokens(usages: list[dict]) -> dict:
+    out = {"calls": len(usages), "prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+    for u in usages:
+        for k in ("prompt_tokens", "completion_tokens", "total_tokens"):
+            v = u.get(k)
+            if isinstance(v, int):
+                out[k] += v
+    return out
+
+
 def generate_article(db: Session, req: GenerationRequest, *, user_id: int | None = None) -> ArticleOut:
-    """软文生成主流程：构建 Prompt -> 调用模型 -> 持久化"""
-    source_snippets, found_ids = _load_source_snippets(db, req.sources)
+    """软文生成主流程：构建 Prompt -> 调用模型 -> 持久化
+
+    usage 中会记录：模型真实 token 用量、首字节耗时、压缩调用用量，以及各阶段耗时（timings_ms）。
+    """
+    timer = _StageTimer()
 
     # 先初始化 provider：用于长素材压缩 + 最终生成（避免重复构建/重复选 key）
     provider = get_provider(req.provider, db=db)
 
-    material_items = _load_material_items(db, req, user_id=user_id)
-    
-    # 支持从热点事件直接加载素材 (Quick Generate)
-    if req.source_event_id:
-        event_items = _load_event_items_to_materials(db, req.source_event_id)
-        # 将事件素材追加到 material_items（或者优先使用）
-        material_items.extend(event_items)
-
-    # 支持实时搜索生成 (Active Inspiration)
-    if req.source_query:
-        # 1. 实时搜索
-        search_results = firecrawl_service.search(query=req.source_query, limit=5, db=db)
-        # 2. 转换为临时的 MaterialItem
-        query_items = []
-        for i, res in enumerate(search_results):
-            m = MaterialItem(
-                pack_id=None,
-                item_type="source", # 视为 source 类型
-                text=res.get("content") or res.get("description") or "",
-                source_url=res.get("url"),
-                meta={
-                    "title": res.get("title"),
-                    "description": res.get("description"),
-                    "source": "firecrawl_search",
-                },
-                created_at=datetime.now(),
+    with timer.stage("material_load"):
+        source_snippets, found_ids = _load_source_snippets(db, req.sources)
+        material_items = _load_material_items(db, req, user_id=user_id)
+
+        # 支持从热点事件直接加载素材 (Quick Generate)
+        if req.source_event_id:
+            event_items = _load_event_items_to_materials(db, req.source_event_id)
+            # 将事件素材追加到 material_items（或者优先使用）
+            material_items.extend(event_items)
+
+        # 支持实时搜索生成 (Active Inspiration)
+        if req.source_query:
+            # 1. 实时搜索
+            search_results = firecrawl_service.search(query=req.source_query, limit=5, db=db)
+            # 2. 转换为临时的 MaterialItem
+            query_items = []
+            for i, res in enumerate(search_results):
+                m = MaterialItem(
+                    pack_id=None,
+                    item_type="source", # 视为 source 类型
+                    text=res.get("content") or res.get("description") or "",
+                    source_url=res.get("url"),
+                    meta={
+                        "title": res.get("title"),
+                        "description": res.get("description"),
+                        "source": "firecrawl_search",
+                    },
+                    created_at=datetime.now(),
+                )
+                query_items.append(m)
+            # 3. 追加到 material_items
+            material_items.extend(query_items)
+
+    with timer.stage("template_render"):
+        # 1) 选择 Prompt 模板（支持按 key/version 选择；为空则使用默认模板）
+        if req.template_key:
+            tpl = get_template(db, key=req.template_key, version=req.template_version)
+            if not tpl:
+                raise ValueError("Prompt 模板不存在，请检查 template_key/template_version")
+        else:
+            tpl = ensure_default_template(db)
+
+        # 先估算模板“骨架”（不含素材/来源）的 token，供素材预筛与最终裁剪使用
+        req.materials = None
+        base_tokens = estimate_text_tokens(build_generation_prompt_with_template(req, tpl.content, []), req.provider)
+
+    compress_usages: list[dict] = []
+    with timer.stage("compress"):
+        # 中文说明：先用未压缩的估算条目跑一遍预算，只压缩预算内保留下来的长素材；
+        # 预算外会被丢弃的素材不再逐条调用模型压缩。未配置预算时全部保留，行为不变。
+        keep: Optional[set[int]] = None
+        pre = None
+        if get_prompt_token_budget() > 0:
+            pre = fit_prompt_budget(
+                _build_material_entries(db, req, material_items, provider=provider, compress=False),
+                source_snippets,
+                provider=req.provider,
+                base_tokens=base_tokens,
             )
-            query_items.append(m)
-        # 3. 追加到 material_items
-        material_items.extend(query_items)
-
-    materials_block = _build_materials_block_layered(db, req, material_items, provider=provider)
+            keep = {e.order for e in pre.materials}
+        material_entries = _build_material_entries(
+            db, req, material_items, provider=provider, usage_log=compress_usages, only=keep
+        )
 
     material_refs: Optional[dict] = None
     if material_items:
@@ -480,50 +612,80 @@ def generate_article(db: Session, req: GenerationRequest, *, user_id: int | None
             "source_content_ids": _uniq(source_content_ids),
         }
 
-    # 将 materials 注入到 req 上，供 prompt_builder 统一渲染模板变量
-    # materials 为内部字段（schema 中 exclude=True），前端无需传。
-    req.materials = materials_block
+    with timer.stage("template_render"):
+        # 2) Token 预算：按优先级裁剪（已压缩的）素材与来源
+        budget = fit_prompt_budget(
+            material_entries,
+            source_snippets,
+            provider=req.provider,
+            base_tokens=base_tokens,
+        )
+        if pre is not None:
+            # 中文说明：预筛阶段丢弃的素材也计入报告
+            budget.report["materials_total"] = pre.report["materials_total"]
+            budget.report["materials_dropped"] += pre.report["materials_dropped"]
 
-    # 1) 选择 Prompt 模板（支持按 key/version 选择；为空则使用默认模板）
-    if req.template_key:
-        tpl = get_template(db, key=req.template_key, version=req.template_version)
-        if not tpl:
-            raise ValueError("Prompt 模板不存在，请检查 template_key/template_version")
-    else:
-        tpl = ensure_default_template(db)
+        # 将 materials 注入到 req 上，供 prompt_builder 统一渲染模板变量
+        # materials 为内部字段（schema 中 exclude=True），前端无需传。
+        req.materials = _assemble_materials_block(budget.materials)
 
-    prompt = build_generation_prompt_with_template(req, tpl.content, source_snippets)
+        prompt = build_generation_prompt_with_template(req, tpl.content, budget.sources)
+        prompt_tokens_est = estimate_text_tokens(prompt, req.provider)
 
     settings = get_settings()
     if bool(getattr(settings, "GENERATION_DEBUG", False)):
         logger.info(
-            "[GENERATION_DEBUG] final_prompt (len=%s):\n%s",
+            "[GENERATION_DEBUG] final_prompt (len=%s, tokens_est=%s, budget=%s):\n%s",
             len(prompt or ""),
+            prompt_tokens_est,
+            budget.report,
             _truncate_for_log(prompt or "", getattr(settings, "GENERATION_DEBUG_PROMPT_MAX_CHARS", 4000)),
         )
 
-    # 2) 调用模型
-    t0 = time.perf_counter()
-    content_md = provider.generate(
-        prompt,
-        temperature=req.temperature,
-        max_tokens=req.max_tokens,
-        length=req.length,
-    )
-    elapsed_ms = int((time.perf_counter() - t0) * 1000)
+    # 3) 调用模型
+    with timer.stage("model_call"):
+        result = provider.generate_with_usage(
+            prompt,
+            temperature=req.temperature,
+            max_tokens=req.max_tokens,
+            length=req.length,
+        )
+    content_md = result.text
+    model_usage = dict(result.usage or {})
 
     # 可选追加行动号召
     if req.call_to_action:
         content_md += f"\n\n**行动号召：{req.call_to_action}**"
 
-    content_html = markdown2.markdown(content_md)
+    with timer.stage("postprocess"):
+        content_html = markdown2.markdown(content_md)
     summary = req.summary_hint or req.topic
 
-    # 3) 生成链路持久化（便于复用/排障）
+    # 4) 生成链路持久化（便于复用/排障）
     request_payload = req.model_dump() if hasattr(req, "model_dump") else req.dict()
     settings = get_settings()
-    llm_provider = (req.provider or settings.DEFAULT_MODEL_PROVIDER).lower()
-    llm_model = get_provider_model_name(req.provider)
+    # 中文说明：provider=router 时记录实际命中的供应商
+    llm_provider = (model_usage.get("provider") or req.provider or settings.DEFAULT_MODEL_PROVIDER).lower()
+    llm_model = model_usage.get("model") or get_provider_model_name(req.provider)
+
+    usage = {
+        "prompt_tokens": model_usage.get("prompt_tokens"),
+        "completion_tokens": model_usage.get("completion_tokens"),
+        "total_tokens": model_usage.get("total_tokens"),
+        "model": llm_model,
+        "provider": llm_provider,
+        "attempts": model_usage.get("attempts"),
+        "retries": model_usage.get("retries", 0),
+        "ttfb_ms": model_usage.get("ttfb_ms"),
+        "model_latency_ms": model_usage.get("latency_ms"),
+        "prompt_tokens_est": prompt_tokens_est,
+        "prompt_budget": budget.report,
+        "compress": _sum_usage_tokens(compress_usages),
+    }
+    if model_usage.get("router"):
+        usage["router"] = model_usage["router"]
+    if model_usage.get("mock"):
+        usage["mock"] = True
 
     article = Article(
         user_id=user_id,
@@ -540,10 +702,15 @@ def generate_article(db: Session, req: GenerationRequest, *, user_id: int | None
         template_version=tpl.version,
         llm_provider=llm_provider,
         llm_model=llm_model,
-        elapsed_ms=elapsed_ms,
-        usage=None,
+        usage=usage,
     )
-    db.add(article)
+    with timer.stage("persist"):
+        db.add(article)
+        db.flush()
+
+    # 中文说明：persist 阶段只统计 INSERT（flush）耗时；timings 在 commit 前回填到同一行
+    article.elapsed_ms = timer.total_ms()
+    article.usage = {**usage, "timings_ms": {**timer.timings, "total": article.elapsed_ms}}
     db.commit()
     db.refresh(article)
     return article
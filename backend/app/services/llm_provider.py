@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
 import os
 import time
 from typing import Any, Dict, Optional
@@ -8,22 +9,121 @@ from requests import RequestException, Timeout
 from sqlalchemy.orm import Session
 
 from app.core.config import get_settings
-from app.services.api_key_pool import pick_api_key
+from app.services.api_key_pool import (
+    ERROR_NETWORK,
+    ERROR_TIMEOUT,
+    classify_http_status,
+    pick_api_key,
+    report_key_failure,
+    report_key_success,
+)
+from app.services.prompt_budget import estimate_text_tokens
+from app.services.rate_limiter import rate_limited
+
+
+@dataclass
+class LLMResult:
+    """模型调用结果：文本 + 结构化用量。
+
+    usage 字段约定：
+    - provider/model：实际调用的供应商与模型（model 以接口返回为准）
+    - prompt_tokens/completion_tokens/total_tokens：接口返回的真实 token 用量（缺失时为 None）
+    - attempts：实际发出的模型请求数（单个供应商一次调用只发一次请求；provider=router 时含故障切换与对冲）
+    - retries：attempts - 1，即首个请求之外额外发出的请求数
+    - ttfb_ms：首字节耗时（非流式调用为响应头到达的耗时）
+    - latency_ms：整次调用耗时（不含限流排队）
+    - queued_ms：限流排队耗时
+    """
+
+    text: str
+    usage: Dict[str, Any] = field(default_factory=dict)
 
 
 class LLMProvider(ABC):
     """多模型供应商抽象类"""
 
     @abstractmethod
+    def generate_with_usage(self, prompt: str, **kwargs: Any) -> LLMResult:
+        """根据 prompt 生成文本，并返回结构化用量"""
+
     def generate(self, prompt: str, **kwargs: Any) -> str:
         """根据 prompt 生成文本"""
+        return self.generate_with_usage(prompt, **kwargs).text
+
+
+def _mock_result(provider: str, prompt: str) -> LLMResult:
+    return LLMResult(
+        text=f"[{provider} mock] {prompt}".strip(),
+        usage={
+            "provider": provider,
+            "model": None,
+            "prompt_tokens": None,
+            "completion_tokens": None,
+            "total_tokens": None,
+            "attempts": 0,
+            "retries": 0,
+            "ttfb_ms": 0,
+            "latency_ms": 0,
+            "mock": True,
+        },
+    )
+
+
+def _request_tokens(prompt: str, max_tokens: Any, provider: str) -> int:
+    """限流 tpm 计数口径：prompt 估算 token + 本次允许的最大输出 token。"""
+    try:
+        out_tokens = int(max_tokens or 0)
+    except (TypeError, ValueError):
+        out_tokens = 0
+    return estimate_text_tokens(prompt, provider) + out_tokens
+
+
+def _build_usage(
+    data: Dict[str, Any],
+    *,
+    provider: str,
+    model: Optional[str],
+    resp: requests.Response,
+    t0: float,
+    queued_ms: int = 0,
+) -> Dict[str, Any]:
+    """从 OpenAI 兼容响应中提取 usage，并补充耗时信息。"""
+    raw = data.get("usage") if isinstance(data.get("usage"), dict) else {}
+
+    def _int_or_none(v: Any) -> Optional[int]:
+        try:
+            return int(v) if v is not None else None
+        except (TypeError, ValueError):
+            return None
+
+    prompt_tokens = _int_or_none(raw.get("prompt_tokens"))
+    completion_tokens = _int_or_none(raw.get("completion_tokens"))
+    total_tokens = _int_or_none(raw.get("total_tokens"))
+    if total_tokens is None and prompt_tokens is not None and completion_tokens is not None:
+        total_tokens = prompt_tokens + completion_tokens
+
+    elapsed = getattr(resp, "elapsed", None)
+    ttfb_ms = int(elapsed.total_seconds() * 1000) if elapsed is not None else None
+
+    return {
+        "provider": provider,
+        "model": str(data.get("model") or model or "") or None,
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": total_tokens,
+        "attempts": 1,
+        "retries": 0,
+        "ttfb_ms": ttfb_ms,
+        "latency_ms": int((time.perf_counter() - t0) * 1000),
+        "queued_ms": int(queued_ms or 0),
+    }
 
 
 class OpenAIProvider(LLMProvider):
     def __init__(self, *, db: Session | None = None):
         self._db = db
 
-    def generate(self, prompt: str, **kwargs: Any) -> str:
+    def generate_with_usage(self, prompt: str, **kwargs: Any) -> LLMResult:
         settings = get_settings()
 
         # 中文说明：测试环境下默认避免外网依赖。
@@ -38,12 +138,14 @@ class OpenAIProvider(LLMProvider):
 
         # 1) 优先从 API Key 池取 key + 额外配置
         api_key = None
+        key_id = None
         key_from_pool = False
         extra: Dict[str, Any] = {}
         if self._db is not None:
             k = pick_api_key(self._db, "openai", mark_used=True)
             if k:
                 api_key = k.key
+                key_id = k.id
                 key_from_pool = True
                 if isinstance(getattr(k, "extra", None), dict):
                     extra = k.extra or {}
@@ -52,12 +154,12 @@ class OpenAIProvider(LLMProvider):
         api_key = api_key or settings.MODEL_API_KEY_OPENAI
 
         if os.getenv("PYTEST_CURRENT_TEST") and (not mock_disabled) and (not key_from_pool):
-            return f"[openai mock] {prompt}".strip()
+            return _mock_result("openai", prompt)
 
         if not api_key:
             # 中文说明：为了本地体验不强依赖真实 OpenAI Key，提供可控的 mock 兜底。
             if (settings.ENV or "dev") != "prod" and not mock_disabled:
-                return f"[openai mock] {prompt}".strip()
+                return _mock_result("openai", prompt)
             raise ValueError("缺少 OpenAI API Key，请在 API Key 池(openai) 或环境变量 MODEL_API_KEY_OPENAI 配置")
 
         base_url = str(extra.get("base_url") or settings.MODEL_OPENAI_API_BASE or "").rstrip("/")
@@ -83,20 +185,25 @@ class OpenAIProvider(LLMProvider):
         timeout = int(extra.get("timeout") or settings.MODEL_OPENAI_TIMEOUT or 60)
         verify = bool(extra.get("verify") if "verify" in extra else settings.MODEL_OPENAI_VERIFY)
 
-        try:
-            resp = requests.post(
-                f"{base_url}/chat/completions",
-                headers={"Authorization": f"Bearer {api_key}"},
-                json=payload,
-                timeout=timeout,
-                verify=verify,
-            )
-        except Timeout as exc:
-            raise ValueError("OpenAI 请求超时，请稍后重试或缩短生成字数") from exc
-        except RequestException as exc:
-            raise ValueError(f"OpenAI 请求异常: {exc}") from exc
+        with rate_limited("openai", key_id=key_id, extra=extra, tokens=_request_tokens(prompt, max_tokens, "openai")) as ticket:
+            t0 = time.perf_counter()
+            try:
+                resp = requests.post(
+                    f"{base_url}/chat/completions",
+                    headers={"Authorization": f"Bearer {api_key}"},
+                    json=payload,
+                    timeout=timeout,
+                    verify=verify,
+                )
+            except Timeout as exc:
+                report_key_failure(key_id, ERROR_TIMEOUT)
+                raise ValueError("OpenAI 请求超时，请稍后重试或缩短生成字数") from exc
+            except RequestException as exc:
+                report_key_failure(key_id, ERROR_NETWORK)
+                raise ValueError(f"OpenAI 请求异常: {exc}") from exc
 
         if resp.status_code >= 300:
+            report_key_failure(key_id, classify_http_status(resp.status_code), retry_after=resp.headers.get("Retry-After"))
             raise ValueError(f"OpenAI 请求失败: {resp.status_code} {resp.text}")
 
         data = resp.json()
@@ -108,7 +215,8 @@ class OpenAIProvider(LLMProvider):
         )
         if not content:
             raise ValueError("OpenAI 返回内容为空")
-        return content
+        report_key_success(key_id)
+        return LLMResult(text=content, usage=_build_usage(data, provider="openai", model=model, resp=resp, t0=t0, queued_ms=ticket["queued_ms"]))
 
 
 class MoonshotProvider(LLMProvider):
@@ -121,10 +229,11 @@ class MoonshotProvider(LLMProvider):
     def __init__(self, *, db: Session | None = None):
         self._db = db
 
-    def generate(self, prompt: str, **kwargs: Any) -> str:
+    def generate_with_usage(self, prompt: str, **kwargs: Any) -> LLMResult:
         settings = get_settings()
 
         api_key = None
+        key_id = None
         extra: Dict[str, Any] = {}
         if self._db is not None:
             k = pick_api_key(self._db, "moonshot", mark_used=True)
@@ -132,6 +241,7 @@ class MoonshotProvider(LLMProvider):
                 k = pick_api_key(self._db, "kimi", mark_used=True)
             if k:
                 api_key = k.key
+                key_id = k.id
                 if isinstance(getattr(k, "extra", None), dict):
                     extra = k.extra or {}
 
@@ -159,20 +269,25 @@ class MoonshotProvider(LLMProvider):
         timeout = int(extra.get("timeout") or 60)
         verify = bool(extra.get("verify") if "verify" in extra else True)
 
-        try:
-            resp = requests.post(
-                f"{base_url}/chat/completions",
-                headers={"Authorization": f"Bearer {api_key}"},
-                json=payload,
-                timeout=timeout,
-                verify=verify,
-            )
-        except Timeout as exc:
-            raise ValueError("Moonshot(Kimi) 请求超时，请稍后重试或缩短生成字数") from exc
-        except RequestException as exc:
-            raise ValueError(f"Moonshot(Kimi) 请求异常: {exc}") from exc
+        with rate_limited("moonshot", key_id=key_id, extra=extra, tokens=_request_tokens(prompt, max_tokens, "moonshot")) as ticket:
+            t0 = time.perf_counter()
+            try:
+                resp = requests.post(
+                    f"{base_url}/chat/completions",
+                    headers={"Authorization": f"Bearer {api_key}"},
+                    json=payload,
+                    timeout=timeout,
+                    verify=verify,
+                )
+            except Timeout as exc:
+                report_key_failure(key_id, ERROR_TIMEOUT)
+                raise ValueError("Moonshot(Kimi) 请求超时，请稍后重试或缩短生成字数") from exc
+            except RequestException as exc:
+                report_key_failure(key_id, ERROR_NETWORK)
+                raise ValueError(f"Moonshot(Kimi) 请求异常: {exc}") from exc
 
         if resp.status_code >= 300:
+            report_key_failure(key_id, classify_http_status(resp.status_code), retry_after=resp.headers.get("Retry-After"))
             raise ValueError(f"Moonshot(Kimi) 请求失败: {resp.status_code} {resp.text}")
 
         data = resp.json()
@@ -184,17 +299,19 @@ class MoonshotProvider(LLMProvider):
         )
         if not content:
             raise ValueError("Moonshot(Kimi) 返回内容为空")
-        return content
+        report_key_success(key_id)
+        return LLMResult(text=content, usage=_build_usage(data, provider="moonshot", model=model, resp=resp, t0=t0, queued_ms=ticket["queued_ms"]))
 
 
 class AliProvider(LLMProvider):
     def __init__(self, *, db: Session | None = None):
         self._db = db
 
-    def generate(self, prompt: str, **kwargs: Any) -> str:
+    def generate_with_usage(self, prompt: str, **kwargs: Any) -> LLMResult:
         settings = get_settings()
 
         api_key = None
+        key_id = None
         extra: Dict[str, Any] = {}
         if self._db is not None:
             # 兼容多种别名，方便前端/配置使用
@@ -207,6 +324,7 @@ class AliProvider(LLMProvider):
                 k = pick_api_key(self._db, "qwen", mark_used=True)
             if k:
                 api_key = k.key
+                key_id = k.id
                 if isinstance(getattr(k, "extra", None), dict):
                     extra = k.extra or {}
 
@@ -234,20 +352,25 @@ class AliProvider(LLMProvider):
         timeout = int(extra.get("timeout") or 60)
         verify = bool(extra.get("verify") if "verify" in extra else True)
 
-        try:
-            resp = requests.post(
-                f"{base_url}/chat/completions",
-                headers={"Authorization": f"Bearer {api_key}"},
-                json=payload,
-                timeout=timeout,
-                verify=verify,
-            )
-        except Timeout as exc:
-            raise ValueError("通义千问请求超时，请稍后重试或缩短生成字数") from exc
-        except RequestException as exc:
-            raise ValueError(f"通义千问请求异常: {exc}") from exc
+        with rate_limited("ali", key_id=key_id, extra=extra, tokens=_request_tokens(prompt, max_tokens, "ali")) as ticket:
+            t0 = time.perf_counter()
+            try:
+                resp = requests.post(
+                    f"{base_url}/chat/completions",
+                    headers={"Authorization": f"Bearer {api_key}"},
+                    json=payload,
+                    timeout=timeout,
+                    verify=verify,
+                )
+            except Timeout as exc:
+                report_key_failure(key_id, ERROR_TIMEOUT)
+                raise ValueError("通义千问请求超时，请稍后重试或缩短生成字数") from exc
+            except RequestException as exc:
+                report_key_failure(key_id, ERROR_NETWORK)
+                raise ValueError(f"通义千问请求异常: {exc}") from exc
 
         if resp.status_code >= 300:
+            report_key_failure(key_id, classify_http_status(resp.status_code), retry_after=resp.headers.get("Retry-After"))
             raise ValueError(f"通义千问请求失败: {resp.status_code} {resp.text}")
 
         data = resp.json()
@@ -259,7 +382,8 @@ class AliProvider(LLMProvider):
         )
         if not content:
             raise ValueError("通义千问返回内容为空")
-        return content
+        report_key_success(key_id)
+        return LLMResult(text=content, usage=_build_usage(data, provider="ali", model=model, resp=resp, t0=t0, queued_ms=ticket["queued_ms"]))
 
 
 _BAIDU_TOKEN_CACHE: dict[str, tuple[str, float]] = {}
@@ -338,10 +462,11 @@ class BaiduProvider(LLMProvider):
     def __init__(self, *, db: Session | None = None):
         self._db = db
 
-    def generate(self, prompt: str, **kwargs: Any) -> str:
+    def generate_with_usage(self, prompt: str, **kwargs: Any) -> LLMResult:
         settings = get_settings()
 
         api_key = None
+        key_id = None
         client_id = None
         client_secret = None
         extra: Dict[str, Any] = {}
@@ -368,6 +493,7 @@ class BaiduProvider(LLMProvider):
                 # - APIKey 直连：k.key 为千帆 API Key（bce-v3/...）。
                 # - OAuth 兼容：k.key 为 client_id。
                 api_key = (k.key or "").strip() or None
+                key_id = k.id
                 client_id = api_key
                 if isinstance(getattr(k, "extra", None), dict):
                     extra = k.extra or {}
@@ -381,7 +507,7 @@ class BaiduProvider(LLMProvider):
         key_from_pool = self._db is not None and api_key is not None
 
         if os.getenv("PYTEST_CURRENT_TEST") and (not mock_disabled) and (not key_from_pool):
-            return f"[baidu mock] {prompt}".strip()
+            return _mock_result("baidu", prompt)
 
         # 兜底：环境变量
         api_key = api_key or (settings.MODEL_API_KEY_BAIDU or None)
@@ -453,20 +579,25 @@ class BaiduProvider(LLMProvider):
             if appid:
                 headers["appid"] = appid
 
-            try:
-                resp = requests.post(
-                    f"{base_url}/chat/completions",
-                    headers=headers,
-                    json=payload,
-                    timeout=timeout,
-                    verify=verify,
-                )
-            except Timeout as exc:
-                raise ValueError("百度千帆请求超时，请稍后重试或缩短生成字数") from exc
-            except RequestException as exc:
-                raise ValueError(f"百度千帆请求异常: {exc}") from exc
+            with rate_limited("baidu", key_id=key_id, extra=extra, tokens=_request_tokens(prompt, max_tokens, "baidu")) as ticket:
+                t0 = time.perf_counter()
+                try:
+                    resp = requests.post(
+                        f"{base_url}/chat/completions",
+                        headers=headers,
+                        json=payload,
+                        timeout=timeout,
+                        verify=verify,
+                    )
+                except Timeout as exc:
+                    report_key_failure(key_id, ERROR_TIMEOUT)
+                    raise ValueError("百度千帆请求超时，请稍后重试或缩短生成字数") from exc
+                except RequestException as exc:
+                    report_key_failure(key_id, ERROR_NETWORK)
+                    raise ValueError(f"百度千帆请求异常: {exc}") from exc
 
             if resp.status_code >= 300:
+                report_key_failure(key_id, classify_http_status(resp.status_code), retry_after=resp.headers.get("Retry-After"))
                 raise ValueError(f"百度千帆请求失败: {resp.status_code} {resp.text}")
 
             data = resp.json() or {}
@@ -478,7 +609,8 @@ class BaiduProvider(LLMProvider):
             content = (content or "").strip()
             if not content:
                 raise ValueError(f"百度千帆返回内容为空: {data}")
-            return content
+            report_key_success(key_id)
+            return LLMResult(text=content, usage=_build_usage(data, provider="baidu", model=model, resp=resp, t0=t0, queued_ms=ticket["queued_ms"]))
 
         # 2) 兼容：OAuth + Workshop chat（仅在显式启用时使用）
         if not api_key:
@@ -509,20 +641,25 @@ class BaiduProvider(LLMProvider):
         }
 
         url2 = f"{api_base}/rpc/2.0/ai_custom/v1/wenxinworkshop/chat/{model}"
-        try:
-            resp2 = requests.post(
-                url2,
-                params={"access_token": access_token},
-                json=payload2,
-                timeout=timeout,
-                verify=verify,
-            )
-        except Timeout as exc:
-            raise ValueError("百度文心请求超时，请稍后重试或缩短生成字数") from exc
-        except RequestException as exc:
-            raise ValueError(f"百度文心请求异常: {exc}") from exc
+        with rate_limited("baidu", key_id=key_id, extra=extra, tokens=_request_tokens(prompt, max_tokens, "baidu")) as ticket:
+            t0 = time.perf_counter()
+            try:
+                resp2 = requests.post(
+                    url2,
+                    params={"access_token": access_token},
+                    json=payload2,
+                    timeout=timeout,
+                    verify=verify,
+                )
+            except Timeout as exc:
+                report_key_failure(key_id, ERROR_TIMEOUT)
+                raise ValueError("百度文心请求超时，请稍后重试或缩短生成字数") from exc
+            except RequestException as exc:
+                report_key_failure(key_id, ERROR_NETWORK)
+                raise ValueError(f"百度文心请求异常: {exc}") from exc
 
         if resp2.status_code >= 300:
+            report_key_failure(key_id, classify_http_status(resp2.status_code), retry_after=resp2.headers.get("Retry-After"))
             raise ValueError(f"百度文心请求失败: {resp2.status_code} {resp2.text}")
 
         data2 = resp2.json() or {}
@@ -532,7 +669,8 @@ class BaiduProvider(LLMProvider):
         content2 = (data2.get("result") or "").strip()
         if not content2:
             raise ValueError(f"百度文心返回内容为空: {data2}")
-        return content2
+        report_key_success(key_id)
+        return LLMResult(text=content2, usage=_build_usage(data2, provider="baidu", model=model, resp=resp2, t0=t0, queued_ms=ticket["queued_ms"]))
 
 
 class AzureOpenAIProvider(LLMProvider):
@@ -541,10 +679,11 @@ class AzureOpenAIProvider(LLMProvider):
     def __init__(self, *, db: Session | None = None):
         self._db = db
 
-    def generate(self, prompt: str, **kwargs: Any) -> str:
+    def generate_with_usage(self, prompt: str, **kwargs: Any) -> LLMResult:
         settings = get_settings()
 
         api_key = None
+        key_id = None
         extra: Dict[str, Any] = {}
         if self._db is not None:
             k = pick_api_key(self._db, "azure_openai", mark_used=True)
@@ -553,6 +692,7 @@ class AzureOpenAIProvider(LLMProvider):
                 k = pick_api_key(self._db, "azure", mark_used=True)
             if k:
                 api_key = k.key
+                key_id = k.id
                 if isinstance(getattr(k, "extra", None), dict):
                     extra = k.extra or {}
 
@@ -581,21 +721,26 @@ class AzureOpenAIProvider(LLMProvider):
 
         url = f"{endpoint}/openai/deployments/{deployment}/chat/completions"
 
-        try:
-            resp = requests.post(
-                url,
-                params={"api-version": api_version},
-                headers={"api-key": api_key},
-                json=payload,
-                timeout=timeout,
-                verify=verify,
-            )
-        except Timeout as exc:
-            raise ValueError("Azure OpenAI 请求超时，请稍后重试或缩短生成字数") from exc
-        except RequestException as exc:
-            raise ValueError(f"Azure OpenAI 请求异常: {exc}") from exc
+        with rate_limited("azure_openai", key_id=key_id, extra=extra, tokens=_request_tokens(prompt, max_tokens, "azure_openai")) as ticket:
+            t0 = time.perf_counter()
+            try:
+                resp = requests.post(
+                    url,
+                    params={"api-version": api_version},
+                    headers={"api-key": api_key},
+                    json=payload,
+                    timeout=timeout,
+                    verify=verify,
+                )
+            except Timeout as exc:
+                report_key_failure(key_id, ERROR_TIMEOUT)
+                raise ValueError("Azure OpenAI 请求超时，请稍后重试或缩短生成字数") from exc
+            except RequestException as exc:
+                report_key_failure(key_id, ERROR_NETWORK)
+                raise ValueError(f"Azure OpenAI 请求异常: {exc}") from exc
 
         if resp.status_code >= 300:
+            report_key_failure(key_id, classify_http_status(resp.status_code), retry_after=resp.headers.get("Retry-After"))
             raise ValueError(f"Azure OpenAI 请求失败: {resp.status_code} {resp.text}")
 
         data = resp.json()
@@ -607,7 +752,8 @@ class AzureOpenAIProvider(LLMProvider):
         )
         if not content:
             raise ValueError("Azure OpenAI 返回内容为空")
-        return content
+        report_key_success(key_id)
+        return LLMResult(text=content, usage=_build_usage(data, provider="azure_openai", model=deployment, resp=resp, t0=t0, queued_ms=ticket["queued_ms"]))
 
 
 def _estimate_tokens(length: Optional[int]) -> int:
@@ -624,15 +770,17 @@ class DeepSeekProvider(LLMProvider):
     def __init__(self, *, db: Session | None = None):
         self._db = db
 
-    def generate(self, prompt: str, **kwargs: Any) -> str:
+    def generate_with_usage(self, prompt: str, **kwargs: Any) -> LLMResult:
         settings = get_settings()
 
         api_key = None
+        key_id = None
         extra: Dict[str, Any] = {}
         if self._db is not None:
             k = pick_api_key(self._db, "deepseek", mark_used=True)
             if k:
                 api_key = k.key
+                key_id = k.id
                 if isinstance(getattr(k, "extra", None), dict):
                     extra = k.extra or {}
 
@@ -654,20 +802,25 @@ class DeepSeekProvider(LLMProvider):
             "max_tokens": int(max_tokens),
         }
 
-        try:
-            resp = requests.post(
-                f"{api_base}/v1/chat/completions",
-                headers={"Authorization": f"Bearer {api_key}"},
-                json=payload,
-                timeout=timeout,
-                verify=verify,
-            )
-        except Timeout as exc:
-            raise ValueError("DeepSeek 请求超时，请稍后重试或缩短生成字数") from exc
-        except RequestException as exc:
-            raise ValueError(f"DeepSeek 请求异常: {exc}") from exc
+        with rate_limited("deepseek", key_id=key_id, extra=extra, tokens=_request_tokens(prompt, max_tokens, "deepseek")) as ticket:
+            t0 = time.perf_counter()
+            try:
+                resp = requests.post(
+                    f"{api_base}/v1/chat/completions",
+                    headers={"Authorization": f"Bearer {api_key}"},
+                    json=payload,
+                    timeout=timeout,
+                    verify=verify,
+                )
+            except Timeout as exc:
+                report_key_failure(key_id, ERROR_TIMEOUT)
+                raise ValueError("DeepSeek 请求超时，请稍后重试或缩短生成字数") from exc
+            except RequestException as exc:
+                report_key_failure(key_id, ERROR_NETWORK)
+                raise ValueError(f"DeepSeek 请求异常: {exc}") from exc
 
         if resp.status_code >= 300:
+            report_key_failure(key_id, classify_http_status(resp.status_code), retry_after=resp.headers.get("Retry-After"))
             raise ValueError(f"DeepSeek 请求失败: {resp.status_code} {resp.text}")
 
         data = resp.json()
@@ -679,7 +832,8 @@ class DeepSeekProvider(LLMProvider):
         )
         if not content:
             raise ValueError("DeepSeek 返回内容为空")
-        return content
+        report_key_success(key_id)
+        return LLMResult(text=content, usage=_build_usage(data, provider="deepseek", model=model, resp=resp, t0=t0, queued_ms=ticket["queued_ms"]))
 
 
 def get_provider(provider: str | None = None, *, db: Session | None = None) -> LLMProvider:
@@ -698,6 +852,11 @@ def get_provider(provider: str | None = None, *, db: Session | None = None) -> L
         return BaiduProvider(db=db)
     if name in {"deepseek"}:
         return DeepSeekProvider(db=db)
+    if name in {"router", "auto"}:
+        # 延迟导入：llm_router 依赖本模块
+        from app.services.llm_router import RoutingProvider
+
+        return RoutingProvider(db=db)
     raise ValueError(f"不支持的模型供应商: {name}")
 
 
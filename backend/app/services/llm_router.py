@@ -0,0 +1,234 @@
+"""多供应商自适应路由（延迟感知 + 故障切换 + 对冲请求）。
+
+中文说明：
+- provider=router（或 auto）时启用；在 API Key 池新增一条 provider=router 的记录，key 可随意填写，
+  路由配置放在 extra 中，例如：
+  {
+    "providers": ["deepseek", "moonshot", "ali"],   # 参与路由的供应商（按优先级）
+    "hedge": true,                                   # 是否启用对冲请求
+    "hedge_after_ms": 8000,                          # 样本不足时的对冲等待阈值
+    "min_samples": 5,                                # 样本数达到后才使用 p95 作为对冲阈值
+    "max_attempts": 3                                # 最多尝试的供应商数（含对冲）
+  }
+- 也可用环境变量 MODEL_ROUTER_PROVIDERS=deepseek,moonshot 作为兜底配置。
+- 每个供应商维护进程内滚动窗口（最近 N 次调用）的 p50/p95 延迟与错误率，请求优先发给“最健康”的供应商；
+  首选供应商超过其 p95 仍未返回时，再并发请求第二个供应商，谁先成功用谁。
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Dict, Optional
+
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.core.config import get_settings
+from app.services.api_key_pool import pick_api_key
+from app.services.llm_provider import LLMProvider, LLMResult, get_provider
+
+
+ROUTER_PROVIDER_NAMES = {"router", "auto"}
+
+_DEFAULT_WINDOW = 50
+_DEFAULT_MIN_SAMPLES = 5
+_DEFAULT_HEDGE_AFTER_MS = 8000
+
+# 中文说明：对冲请求的“输家”无法中断（requests 不支持取消），因此使用进程级线程池，避免 with 退出时阻塞等待。
+_EXECUTOR = ThreadPoolExecutor(max_workers=16, thread_name_prefix="llm-router")
+
+
+def _percentile(sorted_values: list[int], q: float) -> Optional[int]:
+    if not sorted_values:
+        return None
+    idx = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+    return sorted_values[idx]
+
+
+class _ProviderStats:
+    """单个供应商的滚动窗口统计（线程安全）。"""
+
+    def __init__(self, window: int) -> None:
+        self._samples: deque[tuple[int, bool]] = deque(maxlen=max(5, int(window)))
+        self._lock = threading.Lock()
+
+    def record(self, latency_ms: int, ok: bool) -> None:
+        with self._lock:
+            self._samples.append((int(latency_ms), bool(ok)))
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            samples = list(self._samples)
+        ok_lat = sorted(lat for lat, ok in samples if ok)
+        errors = sum(1 for _, ok in samples if not ok)
+        return {
+            "samples": len(samples),
+            "p50_ms": _percentile(ok_lat, 0.5),
+            "p95_ms": _percentile(ok_lat, 0.95),
+            "error_rate": (errors / len(samples)) if samples else 0.0,
+        }
+
+
+_STATS: dict[str, _ProviderStats] = {}
+_STATS_LOCK = threading.Lock()
+
+
+def _stats_for(name: str, window: int = _DEFAULT_WINDOW) -> _ProviderStats:
+    with _STATS_LOCK:
+        st = _STATS.get(name)
+        if st is None:
+            st = _ProviderStats(window)
+            _STATS[name] = st
+        return st
+
+
+def get_router_stats() -> dict[str, dict]:
+    """返回各供应商的滚动统计（便于排障/展示）。"""
+    with _STATS_LOCK:
+        names = list(_STATS.keys())
+    return {n: _stats_for(n).snapshot() for n in names}
+
+
+def _health_score(snap: Dict[str, Any], min_samples: int) -> float:
+    """分数越低越健康。
+
+    - 样本不足：返回 0（优先探索，尽快积累样本）
+    - 错误率按倍数惩罚 p50；错误率过半的供应商直接排到最后
+    """
+    if int(snap.get("samples") or 0) < min_samples:
+        return 0.0
+    err = float(snap.get("error_rate") or 0.0)
+    p50 = float(snap.get("p50_ms") or 0.0) or 1.0
+    score = p50 * (1.0 + 4.0 * err)
+    if err >= 0.5:
+        score += 1e9
+    return score
+
+
+class RoutingProvider(LLMProvider):
+    """包装多个供应商的路由 Provider。"""
+
+    def __init__(self, *, db: Session | None = None):
+        self._db = db
+
+    def _load_config(self) -> Dict[str, Any]:
+        extra: Dict[str, Any] = {}
+        if self._db is not None:
+            # 中文说明：只读取路由配置、不据此发起调用，不占用半开探测名额
+            k = pick_api_key(self._db, "router", mark_used=False, probe=False)
+            if k and isinstance(getattr(k, "extra", None), dict):
+                extra = dict(k.extra or {})
+
+        providers = extra.get("providers")
+        if isinstance(providers, str):
+            providers = [p for p in providers.split(",")]
+        if not providers:
+            env = getattr(get_settings(), "MODEL_ROUTER_PROVIDERS", "") or ""
+            providers = [p for p in env.split(",")]
+        names: list[str] = []
+        for p in providers or []:
+            n = str(p or "").strip().lower()
+            if n and n not in ROUTER_PROVIDER_NAMES and n not in names:
+                names.append(n)
+        if not names:
+            raise ValueError("路由供应商未配置：请在 API Key 池(router) extra.providers 或环境变量 MODEL_ROUTER_PROVIDERS 配置")
+
+        extra["providers"] = names
+        return extra
+
+    def _session_factory(self):
+        if self._db is None:
+            return None
+        # 中文说明：对冲请求在线程中执行，Session 不是线程安全的；每个线程使用同一 engine 的独立 Session
+        return sessionmaker(autocommit=False, autoflush=False, bind=self._db.get_bind(), future=True)
+
+    def _submit(self, name: str, factory, prompt: str, kwargs: Dict[str, Any], window: int) -> Future:
+        def _run() -> LLMResult:
+            db = factory() if factory is not None else None
+            t0 = time.perf_counter()
+            try:
+                result = get_provider(name, db=db).generate_with_usage(prompt, **kwargs)
+            except Exception:
+                _stats_for(name, window).record(int((time.perf_counter() - t0) * 1000), False)
+                raise
+            finally:
+                if db is not None:
+                    db.close()
+            _stats_for(name, window).record(int((time.perf_counter() - t0) * 1000), True)
+            return result
+
+        return _EXECUTOR.submit(_run)
+
+    def generate_with_usage(self, prompt: str, **kwargs: Any) -> LLMResult:
+        cfg = self._load_config()
+        window = int(cfg.get("window") or _DEFAULT_WINDOW)
+        min_samples = int(cfg.get("min_samples") or _DEFAULT_MIN_SAMPLES)
+        hedge = bool(cfg.get("hedge", True))
+        hedge_after_ms = int(cfg.get("hedge_after_ms") or _DEFAULT_HEDGE_AFTER_MS)
+        names: list[str] = cfg["providers"]
+        max_attempts = max(1, min(len(names), int(cfg.get("max_attempts") or len(names))))
+
+        snaps = {n: _stats_for(n, window).snapshot() for n in names}
+        ranked = sorted(names, key=lambda n: (_health_score(snaps[n], min_samples), names.index(n)))
+        candidates = ranked[:max_attempts]
+
+        factory = self._session_factory()
+        t0 = time.perf_counter()
+        pending: dict[Future, str] = {}
+        errors: list[str] = []
+        hedged = False
+        next_idx = 0
+
+        def _launch() -> Optional[str]:
+            nonlocal next_idx
+            if next_idx >= len(candidates):
+                return None
+            name = candidates[next_idx]
+            next_idx += 1
+            pending[self._submit(name, factory, prompt, kwargs, window)] = name
+            return name
+
+        primary = _launch()
+        p95 = snaps[primary].get("p95_ms")
+        hedge_wait_s = (
+            float(p95) if (p95 and int(snaps[primary].get("samples") or 0) >= min_samples) else float(hedge_after_ms)
+        ) / 1000.0
+
+        while pending:
+            can_hedge = hedge and not hedged and next_idx < len(candidates)
+            done, _ = wait(list(pending.keys()), timeout=hedge_wait_s if can_hedge else None, return_when=FIRST_COMPLETED)
+
+            if not done:
+                # 首选供应商超过 p95 仍未返回：发起对冲请求
+                hedged = _launch() is not None
+                continue
+
+            for fut in done:
+                name = pending.pop(fut)
+                try:
+                    result = fut.result()
+                except Exception as exc:
+                    errors.append(f"{name}: {exc}")
+                    continue
+
+                usage = dict(result.usage or {})
+                usage["provider"] = usage.get("provider") or name
+                # 中文说明：next_idx 为已发出的供应商请求数（首选 + 故障切换 + 对冲，含仍在途被放弃的）
+                usage["attempts"] = next_idx
+                usage["retries"] = max(0, next_idx - 1)
+                usage["router"] = {
+                    "selected": name,
+                    "candidates": candidates,
+                    "hedged": hedged,
+                    "errors": errors,
+                    "latency_ms": int((time.perf_counter() - t0) * 1000),
+                }
+                return LLMResult(text=result.text, usage=usage)
+
+            # 已发出的请求全部失败：故障切换到下一个供应商
+            if not pending:
+                _launch()
+
+        raise ValueError("所有路由供应商均调用失败：" + "；".join(errors))
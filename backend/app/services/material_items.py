@@ -0,0 +1,242 @@
+"""素材条目批量写入。
+
+中文说明：
+- 原“批量追加”逐条 add、提交后再逐条 refresh（每条一次 SELECT），且不做去重；
+- 这里先整批规范化文本并计算 text_hash（批内重复直接跳过），再用一条多行 INSERT 写入；
+- 去重由 (pack_id, text_hash) 唯一索引在写入时保证：冲突行忽略（INSERT IGNORE / ON CONFLICT DO NOTHING），
+  并发的“加入素材包”请求不会再写入重复条目；
+- 支持 RETURNING 的数据库（SQLite/PostgreSQL/MariaDB）直接取回新写入行的 ID；
+  MySQL 不支持 RETURNING，先按 hash 集合查一次已存在条目，写入后再按 hash 查一次 ID；
+- 往返次数与条目数无关；Core 写入绕过了 ORM 事件，需手动同步检索词项（material_search.index_items）。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+from datetime import datetime
+from typing import Any, Iterable, Optional
+
+from sqlalchemy import func, inspect
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.db.upsert import build_upsert
+from app.models.material_item import MaterialItem
+from app.services.material_search import delete_item_terms, index_items
+
+
+logger = logging.getLogger("uvicorn.error")
+
+UNIQUE_HASH_INDEX = "ux_material_items_pack_hash"
+# 中文说明：单条 INSERT 的最大行数，避免超长 SQL / 超出驱动参数上限
+_INSERT_CHUNK = 500
+
+
+def norm_text(s: str) -> str:
+    return " ".join((s or "").strip().split())
+
+
+def hash_item(item_type: str, text: str) -> str:
+    raw = f"{(item_type or '').strip().lower()}|{norm_text(text)}".encode("utf-8")
+    return hashlib.md5(raw).hexdigest()
+
+
+def prepare_rows(items: Iterable[Any], *, pack_id: int, user_id: Optional[int]) -> list[dict[str, Any]]:
+    """把 MaterialItemCreate（或同字段对象）整批转换为待插入行，跳过空文本与批内重复。"""
+    now = datetime.now()
+    rows: list[dict[str, Any]] = []
+    seen: set[str] = set()
+    for it in items:
+        text = norm_text(getattr(it, "text", None) or "")
+        if not text:
+            continue
+        item_type = (getattr(it, "item_type", None) or "").strip().lower()
+        text_hash = hash_item(item_type, text)
+        if text_hash in seen:
+            continue
+        seen.add(text_hash)
+        rows.append(
+            {
+                "user_id": user_id,
+                "pack_id": pack_id,
+                "item_type": item_type,
+                "text": text,
+                "text_hash": text_hash,
+                "source_url": getattr(it, "source_url", None),
+                "source_content_id": getattr(it, "source_content_id", None),
+                "source_event_id": getattr(it, "source_event_id", None),
+                "meta": getattr(it, "meta", None),
+                "created_at": now,
+            }
+        )
+    return rows
+
+
+def existing_hashes(db: Session, pack_id: int, hashes: Iterable[str]) -> set[str]:
+    hs = list(set(hashes))
+    if not hs:
+        return set()
+    rows = (
+        db.query(MaterialItem.text_hash)
+        .filter(MaterialItem.pack_id == pack_id, MaterialItem.text_hash.in_(hs))
+        .all()
+    )
+    return {r[0] for r in rows}
+
+
+def _insert_rows(db: Session, rows: list[dict[str, Any]]) -> dict[str, int]:
+    """多行 INSERT（唯一键冲突的行忽略），返回本次新写入的 {text_hash: id}。"""
+    table = MaterialItem.__table__
+    conn = db.connection()
+    returning = bool(conn.dialect.insert_returning)
+    ids: dict[str, int] = {}
+    for i in range(0, len(rows), _INSERT_CHUNK):
+        chunk = rows[i : i + _INSERT_CHUNK]
+        stmt = build_upsert(conn.dialect, table, chunk, index_elements=["pack_id", "text_hash"])
+        if returning:
+            for rid, text_hash in conn.execute(stmt.returning(table.c.id, table.c.text_hash)):
+                ids[text_hash] = int(rid)
+        else:
+            conn.execute(stmt)
+    if not returning:
+        pack_id = rows[0]["pack_id"]
+        q = (
+            db.query(MaterialItem.text_hash, func.max(MaterialItem.id))
+            .filter(MaterialItem.pack_id == pack_id, MaterialItem.text_hash.in_([r["text_hash"] for r in rows]))
+            .group_by(MaterialItem.text_hash)
+        )
+        ids.update({h: int(rid) for h, rid in q.all()})
+    return ids
+
+
+def bulk_create_items(
+    db: Session, items: Iterable[Any], *, pack_id: int, user_id: Optional[int]
+) -> list[dict[str, Any]]:
+    """批量追加素材条目（调用方负责提交）；与包内已有条目重复的跳过，返回新写入的行（含 id）。"""
+    rows = prepare_rows(items, pack_id=pack_id, user_id=user_id)
+    if not rows:
+        return []
+    if not db.get_bind().dialect.insert_returning:
+        # 中文说明：无 RETURNING 时无法区分“新写入/已存在”，先排除已存在的 hash（并发下仍由唯一索引兜底）
+        exists = existing_hashes(db, pack_id, [r["text_hash"] for r in rows])
+        rows = [r for r in rows if r["text_hash"] not in exists]
+        if not rows:
+            return []
+
+    ids = _insert_rows(db, rows)
+    created = []
+    for r in rows:
+        rid = ids.get(r["text_hash"])
+        if rid is not None:
+            created.append({**r, "id": rid})
+    index_items(db, [(r["id"], r["text"]) for r in created])
+    return created
+
+
+def recompute_hashes(db: Session, batch_size: int = 1000) -> int:
+    """按当前 item_type + text 重算全部条目的 text_hash，返回修正条数；调用方负责提交。
+
+    中文说明：历史版本修改条目类型时未重算 hash，库里可能存在“类型已变、hash 仍是旧类型”的条目；
+    直接按 (pack_id, text_hash) 去重会把它误判为另一类型条目的重复而删除，因此去重前必须先修正。
+    """
+    fixed = 0
+    last_id = 0
+    while True:
+        rows = (
+            db.query(MaterialItem.id, MaterialItem.item_type, MaterialItem.text, MaterialItem.text_hash)
+            .filter(MaterialItem.id > last_id)
+            .order_by(MaterialItem.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not rows:
+            break
+        changes = []
+        for r in rows:
+            h = hash_item(r.item_type, r.text)
+            if h != r.text_hash:
+                changes.append({"id": r.id, "text_hash": h})
+        if changes:
+            db.bulk_update_mappings(MaterialItem, changes)
+            fixed += len(changes)
+        last_id = rows[-1].id
+    return fixed
+
+
+def duplicate_pack_ids(db: Session) -> list[int]:
+    """存在 (pack_id, text_hash) 重复条目的素材包 ID（升序）。"""
+    rows = (
+        db.query(MaterialItem.pack_id)
+        .group_by(MaterialItem.pack_id, MaterialItem.text_hash)
+        .having(func.count(MaterialItem.id) > 1)
+        .all()
+    )
+    return sorted({int(r[0]) for r in rows})
+
+
+def dedupe_existing_items(db: Session) -> list[int]:
+    """清理历史重复条目（同包同类型同文本保留最新一条），返回被删除的条目 ID；调用方负责提交。
+
+    中文说明：调用前需先 recompute_hashes，保证 text_hash 与 item_type/text 一致。
+    """
+    dup_groups = (
+        db.query(MaterialItem.pack_id, MaterialItem.text_hash, func.max(MaterialItem.id))
+        .group_by(MaterialItem.pack_id, MaterialItem.text_hash)
+        .having(func.count(MaterialItem.id) > 1)
+        .all()
+    )
+    removed: list[int] = []
+    for pack_id, text_hash, keep_id in dup_groups:
+        ids = [
+            r[0]
+            for r in db.query(MaterialItem.id).filter(
+                MaterialItem.pack_id == pack_id,
+                MaterialItem.text_hash == text_hash,
+                MaterialItem.id != keep_id,
+            )
+        ]
+        if not ids:
+            continue
+        logger.warning(
+            "[material_items] 素材包 %s 重复条目（保留 #%s），删除：%s", pack_id, keep_id, ids
+        )
+        delete_item_terms(db, item_ids=ids)
+        db.query(MaterialItem).filter(MaterialItem.id.in_(ids)).delete(synchronize_session=False)
+        removed.extend(ids)
+    return removed
+
+
+def ensure_unique_hash_ready(db: Session) -> int:
+    """唯一索引尚未建立（升级前的库）时修正 hash 并清理历史重复条目，使 ensure_schema 能补建索引。
+
+    中文说明：会删除用户数据，因此受 MATERIAL_DEDUPE_ON_STARTUP 控制（默认关闭：只修正 hash，
+    有重复则列出涉及的素材包并告警，唯一索引补建失败，由管理员对这些素材包执行去重后重启）；
+    开启时被删除的条目 ID 逐组记录到日志。
+    返回删除条数。
+    """
+    insp = inspect(db.get_bind())
+    if "material_items" not in set(insp.get_table_names()):
+        return 0
+    names = {i.get("name") for i in insp.get_indexes("material_items")}
+    names |= {u.get("name") for u in insp.get_unique_constraints("material_items")}
+    if UNIQUE_HASH_INDEX in names:
+        return 0
+    fixed = recompute_hashes(db)
+    if fixed:
+        logger.info("[material_items] 已修正 text_hash 与类型/文本不一致的条目 %s 条", fixed)
+    if not get_settings().MATERIAL_DEDUPE_ON_STARTUP:
+        pack_ids = duplicate_pack_ids(db)
+        if pack_ids:
+            logger.warning(
+                "[material_items] 素材包 %s 存在重复条目，唯一索引 %s 无法建立；"
+                "请对这些素材包执行“去重”（POST /materials/packs/{id}/dedupe）后重启，"
+                "或设置 MATERIAL_DEDUPE_ON_STARTUP=true 由启动流程清理",
+                pack_ids,
+                UNIQUE_HASH_INDEX,
+            )
+        return 0
+    removed = dedupe_existing_items(db)
+    if removed:
+        logger.warning("[material_items] 建立唯一索引前已清理重复素材条目 %s 条", len(removed))
+    return len(removed)
@@ -0,0 +1,316 @@
+"""素材条目 / 素材包全文检索。
+
+中文说明：
+- 原实现用 text LIKE '%kw%' + COUNT(*)，素材选择器每敲一次键就全表扫描一次；
+- MySQL：使用 FULLTEXT(ngram) 索引，MATCH ... AGAINST（BOOLEAN MODE）检索并按相关度排序；
+- 其它数据库（SQLite/单测）：使用 material_item_terms 倒排表兜底——中文按二元组、英文数字按词切分，
+  条目增删改时通过 ORM 事件同步词项；绕过 ORM 的批量写入/删除需显式调用 index_items / delete_item_terms；
+- 结果支持相关度排序、关键字高亮片段与游标分页（按 (score, id) 续页）。
+"""
+
+from __future__ import annotations
+
+import base64
+import html
+import json
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Iterable, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import and_, case, delete, desc, event, func, insert, literal, or_, select
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.dialects.mysql import match
+from sqlalchemy.orm import Query, Session
+
+from app.models.material_item import MaterialItem
+from app.models.material_item_term import MaterialItemTerm
+from app.models.material_pack import MaterialPack
+
+
+_CJK_RE = re.compile(r"[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+")
+_WORD_RE = re.compile(r"[0-9a-z]+")
+_TERM_MAX_LEN = 32
+# 中文说明：MySQL BOOLEAN MODE 的操作符字符，拼接查询前需剔除
+_BOOLEAN_OPS_RE = re.compile(r"[+\-<>()~*\"@]+")
+# MySQL ngram_token_size 默认 2：短于该长度的关键字无法命中全文索引，回退为 LIKE
+_NGRAM_TOKEN_SIZE = 2
+# 相关度分数参与排序/游标比较时保留的小数位
+_SCORE_DIGITS = 6
+
+
+def tokenize(text: Optional[str]) -> Counter:
+    """切分词项：连续中文按二元组（单字成词时保留单字），英文/数字按词（小写）。"""
+    t = (text or "").lower()
+    terms: Counter = Counter()
+    for m in _CJK_RE.finditer(t):
+        run = m.group()
+        if len(run) == 1:
+            terms[run] += 1
+            continue
+        for i in range(len(run) - 1):
+            terms[run[i : i + 2]] += 1
+    for m in _WORD_RE.finditer(t):
+        terms[m.group()[:_TERM_MAX_LEN]] += 1
+    return terms
+
+
+def _query_tokens(keyword: str) -> list[str]:
+    return [tok for tok in _BOOLEAN_OPS_RE.sub(" ", (keyword or "").strip()).split() if tok]
+
+
+def _use_fulltext(db: Session) -> bool:
+    return db.get_bind().dialect.name == "mysql"
+
+
+# ---------- 倒排表同步（非 MySQL） ----------
+
+
+def _term_rows(item_id: int, text: Optional[str]) -> list[dict[str, Any]]:
+    return [{"item_id": item_id, "term": term, "tf": tf} for term, tf in tokenize(text).items()]
+
+
+def index_items(db: Session, items: Iterable[tuple[int, Optional[str]]]) -> None:
+    """为 (item_id, text) 重建词项；用于绕过 ORM 事件的批量写入。MySQL 下为空操作。"""
+    if _use_fulltext(db):
+        return
+    pairs = list(items)
+    if not pairs:
+        return
+    db.execute(delete(MaterialItemTerm).where(MaterialItemTerm.item_id.in_([i for i, _ in pairs])))
+    rows = [r for item_id, text in pairs for r in _term_rows(item_id, text)]
+    if rows:
+        db.execute(insert(MaterialItemTerm), rows)
+
+
+def delete_item_terms(db: Session, *, item_ids: Optional[list[int]] = None, pack_id: Optional[int] = None) -> None:
+    """删除条目词项；批量删除条目（query.delete）前调用。MySQL 下为空操作。"""
+    if _use_fulltext(db):
+        return
+    if item_ids is not None:
+        if item_ids:
+            db.execute(delete(MaterialItemTerm).where(MaterialItemTerm.item_id.in_(item_ids)))
+        return
+    if pack_id is not None:
+        sub = select(MaterialItem.id).where(MaterialItem.pack_id == pack_id)
+        db.execute(delete(MaterialItemTerm).where(MaterialItemTerm.item_id.in_(sub)))
+
+
+def ensure_term_index(db: Session, batch_size: int = 500) -> int:
+    """倒排表为空而条目已存在时（升级前的历史数据）全量补建词项；返回补建条目数。MySQL 下为空操作。"""
+    if _use_fulltext(db):
+        return 0
+    if db.query(MaterialItemTerm.id).first() is not None:
+        return 0
+    built = 0
+    last_id = 0
+    while True:
+        rows = (
+            db.query(MaterialItem.id, MaterialItem.text)
+            .filter(MaterialItem.id > last_id)
+            .order_by(MaterialItem.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not rows:
+            break
+        index_items(db, [(r.id, r.text) for r in rows])
+        built += len(rows)
+        last_id = rows[-1].id
+    return built
+
+
+def _reindex_one(connection, item_id: int, text: Optional[str]) -> None:
+    connection.execute(delete(MaterialItemTerm).where(MaterialItemTerm.item_id == item_id))
+    rows = _term_rows(item_id, text)
+    if rows:
+        connection.execute(insert(MaterialItemTerm), rows)
+
+
+@event.listens_for(MaterialItem, "after_insert")
+def _on_item_insert(mapper, connection, target: MaterialItem) -> None:
+    if connection.dialect.name != "mysql" and target.id is not None:
+        _reindex_one(connection, target.id, target.text)
+
+
+@event.listens_for(MaterialItem, "after_update")
+def _on_item_update(mapper, connection, target: MaterialItem) -> None:
+    if connection.dialect.name == "mysql" or target.id is None:
+        return
+    if sa_inspect(target).attrs.text.history.has_changes():
+        _reindex_one(connection, target.id, target.text)
+
+
+@event.listens_for(MaterialItem, "before_delete")
+def _on_item_delete(mapper, connection, target: MaterialItem) -> None:
+    if connection.dialect.name != "mysql" and target.id is not None:
+        connection.execute(delete(MaterialItemTerm).where(MaterialItemTerm.item_id == target.id))
+
+
+# ---------- 游标与高亮 ----------
+
+
+def encode_cursor(score: float, item_id: int) -> str:
+    raw = json.dumps([score, int(item_id)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[Any, int]:
+    try:
+        raw = base64.urlsafe_b64decode((cursor + "=" * (-len(cursor) % 4)).encode("ascii")).decode("utf-8")
+        score, item_id = json.loads(raw)
+        return score, int(item_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="cursor 无效")
+
+
+def highlight(text: Optional[str], keyword: Optional[str], max_len: int = 220) -> Optional[str]:
+    """生成命中片段：截取首个命中附近的文本，HTML 转义后用 <mark> 包裹命中词；无命中返回 None。"""
+    t = text or ""
+    tokens = sorted({tok for tok in _query_tokens(keyword or "")}, key=len, reverse=True)
+    if not t or not tokens:
+        return None
+    pattern = re.compile("|".join(re.escape(tok) for tok in tokens), re.IGNORECASE)
+    first = pattern.search(t)
+    if not first:
+        return None
+    start = max(0, first.start() - max_len // 3)
+    end = min(len(t), start + max_len)
+    snippet = t[start:end]
+    out: list[str] = []
+    pos = 0
+    for m in pattern.finditer(snippet):
+        out.append(html.escape(snippet[pos : m.start()]))
+        out.append(f"<mark>{html.escape(m.group())}</mark>")
+        pos = m.end()
+    out.append(html.escape(snippet[pos:]))
+    return ("..." if start > 0 else "") + "".join(out) + ("..." if end < len(t) else "")
+
+
+# ---------- 检索 ----------
+
+
+@dataclass
+class SearchPage:
+    total: int
+    rows: list[tuple[MaterialItem, float]]
+    next_cursor: Optional[str]
+
+
+def _fallback_hits(tokens: list[str]):
+    """倒排表命中子查询：每个关键字都需命中（中文取二元组、英文按词前缀），score 为命中词频之和。"""
+    # 中文说明：按 (匹配方式, 词项) 去重，关键字重复或切出相同二元组时只算一个必需条件
+    required: dict[tuple[str, str], Any] = {}
+    for tok in tokens:
+        terms = list(tokenize(tok).keys())
+        if not terms:
+            continue
+        if _CJK_RE.fullmatch(tok.lower()) is None and len(terms) == 1:
+            # 中文说明：英文/数字关键字按前缀匹配（输入过程中的半个单词也能命中）
+            required.setdefault(("prefix", terms[0]), MaterialItemTerm.term.like(f"{terms[0]}%"))
+        else:
+            for term in terms:
+                required.setdefault(("eq", term), MaterialItemTerm.term == term)
+    if not required:
+        return None
+    conds = list(required.values())
+    # 中文说明：每个必需条件各自统计命中行数（同一词项行可同时满足多个条件，如前缀 ab 与 abc），全部 > 0 才算命中
+    return (
+        select(MaterialItemTerm.item_id.label("item_id"), func.sum(MaterialItemTerm.tf).label("score"))
+        .where(or_(*conds))
+        .group_by(MaterialItemTerm.item_id)
+        .having(and_(*[func.sum(case((c, 1), else_=0)) > 0 for c in conds]))
+        .subquery()
+    )
+
+
+def search_material_items(
+    db: Session,
+    base: Query,
+    keyword: Optional[str],
+    *,
+    limit: int,
+    offset: int = 0,
+    cursor: Optional[str] = None,
+) -> SearchPage:
+    """在已按权限/素材包/类型过滤的 base 查询上做关键字检索。
+
+    - 无关键字：按创建先后（id）倒序，游标为 (0, id)；
+    - 有关键字：按相关度倒序，游标为 (score, id)；传入 cursor 时忽略 offset。
+
+    中文说明：相关度统一取 ROUND(score, 6) 参与排序、比较与游标编码，
+    避免 MATCH 浮点分数经 JSON 往返后等值比较失配导致翻页漏行/重复。
+    """
+    tokens = _query_tokens(keyword or "")
+    if not tokens:
+        q = base
+        if cursor:
+            _, cur_id = decode_cursor(cursor)
+            q = q.filter(MaterialItem.id < cur_id)
+        total = base.order_by(None).with_entities(func.count(MaterialItem.id)).scalar() or 0
+        q = q.order_by(desc(MaterialItem.id))
+        if not cursor and offset:
+            q = q.offset(offset)
+        items = q.limit(limit + 1).all()
+        has_more = len(items) > limit
+        items = items[:limit]
+        next_cursor = encode_cursor(0, items[-1].id) if has_more and items else None
+        return SearchPage(total=total, rows=[(it, 0.0) for it in items], next_cursor=next_cursor)
+
+    short = [tok for tok in tokens if len(tok) < _NGRAM_TOKEN_SIZE]
+    long_tokens = [tok for tok in tokens if len(tok) >= _NGRAM_TOKEN_SIZE]
+    fulltext = _use_fulltext(db)
+    if not fulltext:
+        # 中文说明：倒排表切不出词项的关键字（假名、标点、emoji 等）同样退化为 LIKE，不能当作“无条件”
+        short += [tok for tok in long_tokens if not tokenize(tok)]
+        long_tokens = [tok for tok in long_tokens if tokenize(tok)]
+    q = base
+    for tok in short:
+        # 中文说明：单字关键字全文索引无法命中，退化为 LIKE（已叠加其它关键字条件，扫描范围有限）
+        q = q.filter(MaterialItem.text.like(f"%{tok}%"))
+
+    score_col: Any = literal(0)
+    if fulltext and long_tokens:
+        against = " ".join(f'+"{tok}"' for tok in long_tokens)
+        score_col = match(MaterialItem.text, against=against).in_boolean_mode()
+        q = q.filter(score_col > 0)
+    elif long_tokens:
+        hits = _fallback_hits(long_tokens)
+        if hits is not None:
+            q = q.join(hits, hits.c.item_id == MaterialItem.id)
+            score_col = hits.c.score
+    rank_col = func.round(score_col, _SCORE_DIGITS)
+
+    total = q.order_by(None).with_entities(func.count(MaterialItem.id)).scalar() or 0
+
+    page_q = q.add_columns(rank_col.label("score"))
+    if cursor:
+        cur_score, cur_id = decode_cursor(cursor)
+        cur_score = round(float(cur_score or 0), _SCORE_DIGITS)
+        page_q = page_q.filter(
+            or_(rank_col < cur_score, and_(rank_col == cur_score, MaterialItem.id < cur_id))
+        )
+    page_q = page_q.order_by(desc(rank_col), desc(MaterialItem.id))
+    if not cursor and offset:
+        page_q = page_q.offset(offset)
+    rows = [(it, float(score or 0)) for it, score in page_q.limit(limit + 1).all()]
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = encode_cursor(rows[-1][1], rows[-1][0].id) if has_more and rows else None
+    return SearchPage(total=total, rows=rows, next_cursor=next_cursor)
+
+
+def filter_packs(db: Session, q: Query, keyword: str) -> Query:
+    """素材包关键字过滤：MySQL 走 FULLTEXT(name, description)，其它数据库回退 LIKE（素材包数量小）。"""
+    tokens = _query_tokens(keyword)
+    if not tokens:
+        return q
+    long_tokens = [tok for tok in tokens if len(tok) >= _NGRAM_TOKEN_SIZE]
+    if _use_fulltext(db) and len(long_tokens) == len(tokens):
+        against = " ".join(f'+"{tok}"' for tok in tokens)
+        return q.filter(match(MaterialPack.name, MaterialPack.description, against=against).in_boolean_mode() > 0)
+    for tok in tokens:
+        kw = f"%{tok}%"
+        q = q.filter((MaterialPack.name.like(kw)) | (MaterialPack.description.like(kw)))
+    return q
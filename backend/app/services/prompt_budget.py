@@ -0,0 +1,223 @@
+"""Prompt Token 预算。
+
+中文说明：
+- 在本地粗略估算 Prompt 的 token 数（不同供应商的分词器对中文的切分粒度差异较大，这里按供应商给出经验系数）；
+- 若安装了 tiktoken，OpenAI/Azure 会优先使用真实分词器；其余供应商使用经验系数估算；
+- 按优先级对素材条目与参考来源排序、截断，使最终 Prompt 落在配置的 token 预算内。
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+from typing import Optional
+
+from app.core.config import get_settings
+
+
+# 中文说明：每个供应商的经验系数：(每个 CJK 字符的 token 数, 每个其它字符的 token 数)
+# - DeepSeek 官方口径：1 个中文字符约 0.6 token，1 个英文字符约 0.3 token
+# - 通义/Kimi：中文约 1.5~1.7 字/ token
+# - 文心：中文约 1.3 字/ token
+# - OpenAI(cl100k/o200k)：中文约 0.7~1.1 token/字，这里按偏保守的 1.0 估算
+_PROVIDER_TOKEN_RATIOS: dict[str, tuple[float, float]] = {
+    "deepseek": (0.6, 0.3),
+    "ali": (0.65, 0.27),
+    "moonshot": (0.65, 0.27),
+    "baidu": (0.77, 0.27),
+    "openai": (1.0, 0.27),
+    "azure_openai": (1.0, 0.27),
+}
+_DEFAULT_TOKEN_RATIO = (1.0, 0.3)
+
+_PROVIDER_ALIASES = {
+    "azure": "azure_openai",
+    "dashscope": "ali",
+    "tongyi": "ali",
+    "kimi": "moonshot",
+    "wenxin": "baidu",
+    "qianfan": "baidu",
+}
+
+_CJK_RE = re.compile(r"[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff00-\uffef]")
+
+# 中文说明：素材分组的保留优先级（数值越小越优先保留）：事实优先于要点。
+# 这只决定预算不足时先丢哪些条目，与 Prompt 中的分组展示顺序（补充/要点/事实/引用/来源）无关。
+MATERIAL_GROUP_PRIORITY: dict[str, int] = {
+    "note": 0,
+    "fact": 1,
+    "bullet": 2,
+    "quote": 3,
+    "source": 4,
+}
+
+_TRUNCATED_SUFFIX = "…"
+
+
+def _normalize_provider(provider: Optional[str]) -> str:
+    key = (provider or get_settings().DEFAULT_MODEL_PROVIDER or "").strip().lower()
+    return _PROVIDER_ALIASES.get(key, key)
+
+
+def _tiktoken_encoder(provider: str):
+    """OpenAI/Azure 可选使用 tiktoken；未安装时返回 None。"""
+    if provider not in {"openai", "azure_openai"}:
+        return None
+    try:
+        import tiktoken  # type: ignore
+    except ImportError:
+        return None
+    try:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+
+def estimate_text_tokens(text: str, provider: Optional[str] = None) -> int:
+    """估算一段文本在指定供应商下的 token 数（本地估算，不请求远端）。"""
+    t = text or ""
+    if not t:
+        return 0
+
+    prov = _normalize_provider(provider)
+    enc = _tiktoken_encoder(prov)
+    if enc is not None:
+        try:
+            return len(enc.encode(t))
+        except Exception:
+            pass
+
+    cjk_ratio, other_ratio = _PROVIDER_TOKEN_RATIOS.get(prov, _DEFAULT_TOKEN_RATIO)
+    cjk = len(_CJK_RE.findall(t))
+    other = len(t) - cjk
+    return int(cjk * cjk_ratio + other * other_ratio + 0.999)
+
+
+def truncate_to_tokens(text: str, max_tokens: int, provider: Optional[str] = None) -> str:
+    """将文本截断到不超过 max_tokens（二分查找字符长度，末尾追加省略号）。"""
+    t = text or ""
+    if max_tokens <= 0:
+        return ""
+    if estimate_text_tokens(t, provider) <= max_tokens:
+        return t
+
+    lo, hi = 0, len(t)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if estimate_text_tokens(t[:mid] + _TRUNCATED_SUFFIX, provider) <= max_tokens:
+            lo = mid
+        else:
+            hi = mid - 1
+    if lo <= 0:
+        return ""
+    return t[:lo].rstrip() + _TRUNCATED_SUFFIX
+
+
+@dataclass
+class BudgetEntry:
+    """参与预算分配的一条内容（素材行或参考来源）。"""
+
+    text: str
+    group: str = "note"
+    order: int = 0
+
+
+@dataclass
+class PromptBudgetResult:
+    materials: list[BudgetEntry] = field(default_factory=list)
+    sources: list[str] = field(default_factory=list)
+    report: dict = field(default_factory=dict)
+
+
+def get_prompt_token_budget() -> int:
+    return int(getattr(get_settings(), "PROMPT_TOKEN_BUDGET", 0) or 0)
+
+
+def fit_prompt_budget(
+    materials: list[BudgetEntry],
+    sources: list[str],
+    *,
+    provider: Optional[str],
+    base_tokens: int,
+    budget_tokens: Optional[int] = None,
+) -> PromptBudgetResult:
+    """按预算挑选素材与参考来源。
+
+    规则：
+    - 预算 <= 0 时不做裁剪，只统计估算值；
+    - 素材优先于参考来源；素材按分组优先级（我的补充 > 事实 > 要点 > 引用 > 来源）+ 原始顺序排序；
+    - 放不下的条目：剩余预算不小于 PROMPT_BUDGET_MIN_ENTRY_TOKENS 时截断保留，否则丢弃；
+    - 返回的素材保持原始顺序，便于按分组重新拼装。
+    """
+    settings = get_settings()
+    budget = get_prompt_token_budget() if budget_tokens is None else int(budget_tokens or 0)
+    min_entry = max(1, int(getattr(settings, "PROMPT_BUDGET_MIN_ENTRY_TOKENS", 40) or 40))
+
+    # 中文说明：每条内容在 Prompt 中还会带上换行/列表符号，这里统一按 2 token 计入
+    line_overhead = 2
+
+    report = {
+        "budget_tokens": budget,
+        "base_tokens": int(base_tokens),
+        "materials_total": len(materials),
+        "materials_kept": 0,
+        "materials_truncated": 0,
+        "materials_dropped": 0,
+        "sources_total": len(sources),
+        "sources_kept": 0,
+        "sources_truncated": 0,
+        "sources_dropped": 0,
+    }
+
+    if budget <= 0:
+        report["materials_kept"] = len(materials)
+        report["sources_kept"] = len(sources)
+        return PromptBudgetResult(materials=list(materials), sources=list(sources), report=report)
+
+    remaining = budget - int(base_tokens)
+
+    def _take(text: str) -> tuple[Optional[str], bool]:
+        nonlocal remaining
+        cost = estimate_text_tokens(text, provider) + line_overhead
+        if cost <= remaining:
+            remaining -= cost
+            return text, False
+        room = remaining - line_overhead
+        if room >= min_entry:
+            cut = truncate_to_tokens(text, room, provider)
+            if cut:
+                remaining -= estimate_text_tokens(cut, provider) + line_overhead
+                return cut, True
+        return None, False
+
+    ranked = sorted(
+        enumerate(materials),
+        key=lambda p: (MATERIAL_GROUP_PRIORITY.get(p[1].group, len(MATERIAL_GROUP_PRIORITY)), p[1].order, p[0]),
+    )
+    kept: dict[int, BudgetEntry] = {}
+    for idx, entry in ranked:
+        text, truncated = _take(entry.text)
+        if text is None:
+            report["materials_dropped"] += 1
+            continue
+        if truncated:
+            report["materials_truncated"] += 1
+        kept[idx] = BudgetEntry(text=text, group=entry.group, order=entry.order)
+
+    kept_sources: list[str] = []
+    for s in sources:
+        text, truncated = _take(s)
+        if text is None:
+            report["sources_dropped"] += 1
+            continue
+        if truncated:
+            report["sources_truncated"] += 1
+        kept_sources.append(text)
+
+    report["materials_kept"] = len(kept)
+    report["sources_kept"] = len(kept_sources)
+    return PromptBudgetResult(
+        materials=[kept[i] for i in sorted(kept)],
+        sources=kept_sources,
+        report=report,
+    )
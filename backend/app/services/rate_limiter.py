@@ -0,0 +1,329 @@
+"""外部接口并发/速率限制（按供应商 + 按 key）。
+
+中文说明：
+- 并发（max_inflight）：同一 scope 同时在途的请求数上限；使用带过期时间的租约，进程崩溃不会永久占用名额；
+- 速率（rpm/tpm）：令牌桶，每分钟请求数 / 每分钟 token 数；一次调用涉及的所有桶（供应商/key × rpm/tpm）
+  原子地“全部扣减或全部不扣”，任一桶不足时不会白白消耗其它桶的令牌；
+- 名额不足时排队等待（轮询 + 退避），超过等待期限才报错，而不是立刻失败触发 429 风暴；
+- 默认使用 Redis（多进程/多实例共享），Redis 不可用或 pytest 下自动降级为进程内实现。
+
+限额配置（0 表示不限制）：
+- 供应商级：环境变量 RATE_LIMIT_PROVIDER_LIMITS（JSON），如 {"deepseek": {"max_inflight": 8, "rpm": 300}}
+- key 级：API Key 池 extra.max_inflight / extra.rpm / extra.tpm / extra.limit_wait_seconds；
+  未配置时使用 RATE_LIMIT_KEY_MAX_INFLIGHT / RATE_LIMIT_KEY_RPM / RATE_LIMIT_KEY_TPM
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Iterator, Optional
+
+from app.core.config import get_settings
+from app.services.redis_client import get_redis, redis_key
+
+
+logger = logging.getLogger("uvicorn.error")
+
+
+class RateLimitTimeout(ValueError):
+    """排队超过等待期限仍未获得名额。"""
+
+
+@dataclass
+class LimitSpec:
+    max_inflight: int = 0
+    rpm: int = 0
+    tpm: int = 0
+
+    def is_empty(self) -> bool:
+        return self.max_inflight <= 0 and self.rpm <= 0 and self.tpm <= 0
+
+
+def key_fingerprint(key: str | None) -> str:
+    """用于限流 scope 的 key 指纹（不直接把明文 key 写进 Redis）。"""
+    k = (key or "").strip()
+    if not k:
+        return "env"
+    return hashlib.sha1(k.encode("utf-8")).hexdigest()[:12]
+
+
+def limit_key_id(pool_key_id: Optional[int], key: str | None) -> Any:
+    """限流 scope 的 key 标识：API Key 池中的 key 用池 id（与 LLM 供应商一致，同一 key 只有一个身份），
+    数据源自带/环境变量 key 用明文指纹。"""
+    return pool_key_id if pool_key_id is not None else key_fingerprint(key)
+
+
+def _int(v: Any) -> int:
+    try:
+        return max(0, int(v or 0))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _provider_limits_from_settings(provider: str) -> LimitSpec:
+    raw = getattr(get_settings(), "RATE_LIMIT_PROVIDER_LIMITS", "") or ""
+    if not raw.strip():
+        return LimitSpec()
+    try:
+        data = json.loads(raw)
+    except Exception:
+        logger.warning("[rate_limiter] RATE_LIMIT_PROVIDER_LIMITS 不是有效 JSON，已忽略")
+        return LimitSpec()
+    item = data.get(provider) if isinstance(data, dict) else None
+    if not isinstance(item, dict):
+        return LimitSpec()
+    return LimitSpec(_int(item.get("max_inflight")), _int(item.get("rpm")), _int(item.get("tpm")))
+
+
+def _key_limits(extra: Optional[dict]) -> LimitSpec:
+    settings = get_settings()
+    e = extra if isinstance(extra, dict) else {}
+    return LimitSpec(
+        _int(e.get("max_inflight") if "max_inflight" in e else getattr(settings, "RATE_LIMIT_KEY_MAX_INFLIGHT", 0)),
+        _int(e.get("rpm") if "rpm" in e else getattr(settings, "RATE_LIMIT_KEY_RPM", 0)),
+        _int(e.get("tpm") if "tpm" in e else getattr(settings, "RATE_LIMIT_KEY_TPM", 0)),
+    )
+
+
+class InMemoryLimiterBackend:
+    """进程内实现（本地开发/单测，或 Redis 不可用时降级）。"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._leases: dict[str, dict[str, float]] = {}
+        self._buckets: dict[str, tuple[float, float]] = {}
+
+    def try_acquire_slot(self, scope: str, limit: int, token: str, lease_seconds: int) -> bool:
+        now = time.time()
+        with self._lock:
+            leases = self._leases.setdefault(scope, {})
+            for t, exp in list(leases.items()):
+                if exp <= now:
+                    leases.pop(t, None)
+            if len(leases) >= limit:
+                return False
+            leases[token] = now + lease_seconds
+            return True
+
+    def release_slot(self, scope: str, token: str) -> None:
+        with self._lock:
+            self._leases.get(scope, {}).pop(token, None)
+
+    def try_take_all(self, buckets: list[tuple[str, int, int]]) -> float:
+        """令牌桶 [(scope, capacity, cost)]：全部足够时一起扣减并返回 0；否则都不扣，返回建议等待秒数。"""
+        now = time.time()
+        with self._lock:
+            refilled = []
+            wait = 0.0
+            for scope, capacity, cost in buckets:
+                rate = capacity / 60.0
+                cost = min(cost, capacity)
+                tokens, ts = self._buckets.get(scope, (float(capacity), now))
+                tokens = min(float(capacity), tokens + (now - ts) * rate)
+                refilled.append((scope, tokens, cost))
+                if tokens < cost:
+                    wait = max(wait, (cost - tokens) / rate)
+            for scope, tokens, cost in refilled:
+                self._buckets[scope] = (tokens - cost if wait <= 0 else tokens, now)
+            return wait
+
+
+_SLOT_ACQUIRE_LUA = """
+local now = tonumber(ARGV[1])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now)
+if redis.call('ZCARD', KEYS[1]) >= tonumber(ARGV[2]) then
+  return 0
+end
+redis.call('ZADD', KEYS[1], now + tonumber(ARGV[3]), ARGV[4])
+redis.call('PEXPIRE', KEYS[1], tonumber(ARGV[3]))
+return 1
+"""
+
+# 中文说明：KEYS[i] 对应 ARGV[2i]=capacity、ARGV[2i+1]=cost；全部足够才一起扣减
+_BUCKET_TAKE_ALL_LUA = """
+local now = tonumber(ARGV[1])
+local levels = {}
+local wait_ms = 0
+for i, key in ipairs(KEYS) do
+  local capacity = tonumber(ARGV[2 * i])
+  local cost = tonumber(ARGV[2 * i + 1])
+  local rate = capacity / 60000.0
+  local data = redis.call('HMGET', key, 'tokens', 'ts')
+  local tokens = tonumber(data[1])
+  local ts = tonumber(data[2])
+  if tokens == nil then
+    tokens = capacity
+    ts = now
+  end
+  tokens = math.min(capacity, tokens + (now - ts) * rate)
+  levels[i] = tokens
+  if tokens < cost then
+    wait_ms = math.max(wait_ms, math.ceil((cost - tokens) / rate))
+  end
+end
+for i, key in ipairs(KEYS) do
+  local tokens = levels[i]
+  if wait_ms == 0 then
+    tokens = tokens - tonumber(ARGV[2 * i + 1])
+  end
+  redis.call('HSET', key, 'tokens', tokens, 'ts', now)
+  redis.call('PEXPIRE', key, 120000)
+end
+return wait_ms
+"""
+
+
+class RedisLimiterBackend:
+    """Redis 实现：Lua 脚本保证“检查 + 占用”原子性；Redis 异常时降级到 fallback。"""
+
+    def __init__(self, client, *, fallback: InMemoryLimiterBackend | None = None) -> None:
+        self._redis = client
+        self._fallback = fallback or InMemoryLimiterBackend()
+        self._slot_script = client.register_script(_SLOT_ACQUIRE_LUA)
+        self._bucket_script = client.register_script(_BUCKET_TAKE_ALL_LUA)
+
+    def try_acquire_slot(self, scope: str, limit: int, token: str, lease_seconds: int) -> bool:
+        try:
+            now_ms = int(time.time() * 1000)
+            ok = self._slot_script(
+                keys=[redis_key("ratelimit", "inflight", scope)],
+                args=[now_ms, limit, int(lease_seconds * 1000), token],
+            )
+            return bool(int(ok or 0))
+        except Exception:
+            return self._fallback.try_acquire_slot(scope, limit, token, lease_seconds)
+
+    def release_slot(self, scope: str, token: str) -> None:
+        try:
+            self._redis.zrem(redis_key("ratelimit", "inflight", scope), token)
+        except Exception:
+            self._fallback.release_slot(scope, token)
+
+    def try_take_all(self, buckets: list[tuple[str, int, int]]) -> float:
+        try:
+            args: list[Any] = [int(time.time() * 1000)]
+            for _, capacity, cost in buckets:
+                args.extend([capacity, min(cost, capacity)])
+            wait_ms = self._bucket_script(
+                keys=[redis_key("ratelimit", "bucket", scope) for scope, _, _ in buckets],
+                args=args,
+            )
+            return float(wait_ms or 0) / 1000.0
+        except Exception:
+            return self._fallback.try_take_all(buckets)
+
+
+_BACKEND = None
+_BACKEND_LOCK = threading.Lock()
+
+
+def _get_backend():
+    global _BACKEND
+    if _BACKEND is not None:
+        return _BACKEND
+    with _BACKEND_LOCK:
+        if _BACKEND is None:
+            client = get_redis()
+            _BACKEND = RedisLimiterBackend(client) if client is not None else InMemoryLimiterBackend()
+    return _BACKEND
+
+
+@contextmanager
+def rate_limited(
+    provider: str,
+    *,
+    key_id: Any = None,
+    extra: Optional[dict] = None,
+    tokens: int = 0,
+    wait_seconds: Optional[float] = None,
+    lease_seconds: int = 300,
+) -> Iterator[dict]:
+    """在限额内执行一次外部调用。
+
+    用法：
+        with rate_limited("deepseek", key_id=k.id, extra=k.extra, tokens=est) as ticket:
+            resp = requests.post(...)
+
+    - key_id：key 的稳定标识（API Key 池 id，或 key_fingerprint(明文)）；None 表示环境变量 key
+    - tokens：本次调用预估 token（用于 tpm）；0 表示不计 tpm
+    - 返回的 ticket 含 queued_ms（排队耗时），便于写入 usage
+    """
+
+    settings = get_settings()
+    prov = (provider or "").strip().lower() or "unknown"
+    e = extra if isinstance(extra, dict) else {}
+    if wait_seconds is None:
+        wait_seconds = float(
+            e.get("limit_wait_seconds") or getattr(settings, "RATE_LIMIT_WAIT_SECONDS", 30) or 30
+        )
+
+    scopes: list[tuple[str, LimitSpec]] = [
+        (prov, _provider_limits_from_settings(prov)),
+        (f"{prov}:{key_id if key_id is not None else 'env'}", _key_limits(extra)),
+    ]
+    scopes = [(s, spec) for s, spec in scopes if not spec.is_empty()]
+
+    ticket = {"queued_ms": 0}
+    if not scopes:
+        yield ticket
+        return
+
+    buckets: list[tuple[str, int, int]] = []
+    for scope, spec in scopes:
+        if spec.rpm > 0:
+            buckets.append((f"{scope}:rpm", spec.rpm, 1))
+        if spec.tpm > 0 and tokens > 0:
+            buckets.append((f"{scope}:tpm", spec.tpm, int(tokens)))
+
+    backend = _get_backend()
+    token = uuid.uuid4().hex
+    held: list[str] = []
+    t0 = time.perf_counter()
+    deadline = time.monotonic() + max(0.0, float(wait_seconds))
+    backoff = 0.05
+
+    def _release_all() -> None:
+        for s in held:
+            backend.release_slot(s, token)
+        held.clear()
+
+    try:
+        while True:
+            wait_hint = 0.0
+            ok = True
+            for scope, spec in scopes:
+                if spec.max_inflight > 0 and scope not in held:
+                    if backend.try_acquire_slot(scope, spec.max_inflight, token, lease_seconds):
+                        held.append(scope)
+                    else:
+                        # 中文说明：后一个 scope 名额不足时，已拿到的前序名额也一并释放，排队期间不占用
+                        ok = False
+                        _release_all()
+                        break
+            if ok:
+                # 中文说明：并发名额到手后再扣速率令牌（所有桶原子扣减）；不足则释放名额重新排队，避免占着名额空等
+                if buckets:
+                    wait_hint = backend.try_take_all(buckets)
+                if wait_hint <= 0:
+                    break
+                _release_all()
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise RateLimitTimeout(f"{prov} 调用排队超时（{float(wait_seconds):g}s 内未获得并发/速率名额），请稍后重试")
+            sleep_s = min(remaining, max(backoff, wait_hint)) * (0.8 + 0.4 * random.random())
+            time.sleep(sleep_s)
+            backoff = min(1.0, backoff * 2)
+
+        ticket["queued_ms"] = int((time.perf_counter() - t0) * 1000)
+        yield ticket
+    finally:
+        _release_all()
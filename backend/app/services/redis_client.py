@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import os
+import threading
+from typing import Optional
+
+import redis
+
+from app.core.config import get_settings
+
+
+_CLIENTS: dict[bool, redis.Redis] = {}
+_LOCK = threading.Lock()
+
+
+def get_redis(*, decode_responses: bool = True) -> Optional[redis.Redis]:
+    """获取进程内共享的 Redis 客户端（连接池复用）。
+
+    中文说明：
+    - pytest 环境或未配置 REDIS_URL 时返回 None，调用方应降级为进程内实现；
+    - 这里只负责构建客户端，不做连通性检查；调用方需自行捕获 Redis 异常并降级（同 token_cache 的约定）。
+    """
+
+    if os.getenv("PYTEST_CURRENT_TEST"):
+        return None
+
+    redis_url = (getattr(get_settings(), "REDIS_URL", None) or "").strip()
+    if not redis_url:
+        return None
+
+    key = bool(decode_responses)
+    client = _CLIENTS.get(key)
+    if client is not None:
+        return client
+    with _LOCK:
+        client = _CLIENTS.get(key)
+        if client is None:
+            client = redis.Redis.from_url(
+                redis_url,
+                decode_responses=key,
+                socket_connect_timeout=2,
+                socket_timeout=5,
+            )
+            _CLIENTS[key] = client
+    return client
+
+
+def redis_key(*parts: object) -> str:
+    """统一的 key 前缀（与 token_cache 保持一致：auto_media:）。"""
+    return "auto_media:" + ":".join(str(p) for p in parts)
@@ -5,6 +5,7 @@ from typing import Iterable
 from sqlalchemy.orm import Session
 
 from app.models.role import Role
+from app.services import auth_cache
 
 
 DEFAULT_ADMIN_MENUS: list[str] = [
@@ -62,13 +63,24 @@ def get_role_menus(db: Session, role_key: str | None) -> list[str]:
     if not key:
         return []
 
+    cached = auth_cache.get_role_menus(key)
+    if cached is not None:
+        return cached
+
+    gen = auth_cache.generation()
+    menus = _load_role_menus(db, key)
+    auth_cache.put_role_menus(key, menus, gen)
+    return menus
+
+
+def _load_role_menus(db: Session, key: str) -> list[str]:
     row = db.query(Role).filter(Role.key == key).first()
     if not row:
         # 中文说明：兼容 roles 表尚未初始化的场景（如部分测试/首次启动）
         if key.lower() == "admin":
-            return DEFAULT_ADMIN_MENUS
+            return list(DEFAULT_ADMIN_MENUS)
         if key.lower() == "editor":
-            return DEFAULT_EDITOR_MENUS
+            return list(DEFAULT_EDITOR_MENUS)
         return []
 
     menus = row.menus or []
@@ -0,0 +1,274 @@
+"""运行互斥锁（带心跳续约的租约锁）。
+
+中文说明：
+- 同一资源（如某个数据源）同一时刻只允许一个执行者运行：手动触发、定时调度、任务重试之间互斥；
+- 租约带过期时间，执行期间由后台心跳线程续约；进程崩溃后租约自然过期，不会永久锁死；
+- 锁的值中保存本次运行信息（开始时间、触发来源、进程等），并发触发方可据此“报告正在进行的运行”；
+- 释放/续约都校验 token，避免误删别人的锁；
+- 续约遇到 Redis 暂时性错误时持续重试，直到租约按 TTL 真正过期；确认失去租约（token 不符/已过期）后
+  标记为丢失，执行方在提交前调用 ensure_lease 检查并中止，避免与后来的运行并发写入；
+- 默认使用 Redis（多进程/多实例共享），Redis 不可用或 pytest 下降级为进程内实现（同 rate_limiter 的约定）。
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from app.core.config import get_settings
+from app.services.redis_client import get_redis, redis_key
+
+
+logger = logging.getLogger("uvicorn.error")
+
+
+class RunInProgress(RuntimeError):
+    """资源已有正在进行的运行。"""
+
+    def __init__(self, name: str, info: Optional[dict] = None) -> None:
+        self.name = name
+        self.info = dict(info or {})
+        started = self.info.get("started_at") or "-"
+        source = self.info.get("source") or "-"
+        super().__init__(f"已有正在进行的运行（开始于 {started}，触发来源 {source}），请稍后查看结果")
+
+
+class RunLeaseLost(RuntimeError):
+    """运行期间租约已丢失（过期或被他人占用），本次运行不应再提交结果。"""
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        super().__init__(f"运行租约已丢失（{name}），已中止本次运行")
+
+
+_RENEW_LUA = """
+local v = redis.call('GET', KEYS[1])
+if not v then
+  return 0
+end
+if cjson.decode(v)['token'] ~= ARGV[1] then
+  return 0
+end
+redis.call('PEXPIRE', KEYS[1], tonumber(ARGV[2]))
+return 1
+"""
+
+_RELEASE_LUA = """
+local v = redis.call('GET', KEYS[1])
+if not v then
+  return 0
+end
+if cjson.decode(v)['token'] ~= ARGV[1] then
+  return 0
+end
+return redis.call('DEL', KEYS[1])
+"""
+
+
+class _InMemoryLockBackend:
+    """进程内实现（本地开发/单测，或 Redis 不可用时降级）。"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._items: dict[str, tuple[str, dict, float]] = {}
+
+    def _alive(self, name: str) -> Optional[tuple[str, dict, float]]:
+        item = self._items.get(name)
+        if item and item[2] <= time.time():
+            self._items.pop(name, None)
+            return None
+        return item
+
+    def acquire(self, name: str, token: str, info: dict, ttl_ms: int) -> Optional[dict]:
+        with self._lock:
+            item = self._alive(name)
+            if item is not None:
+                return item[1]
+            self._items[name] = (token, info, time.time() + ttl_ms / 1000.0)
+            return None
+
+    def renew(self, name: str, token: str, ttl_ms: int) -> bool:
+        with self._lock:
+            item = self._alive(name)
+            if item is None or item[0] != token:
+                return False
+            self._items[name] = (token, item[1], time.time() + ttl_ms / 1000.0)
+            return True
+
+    def owns(self, name: str, token: str) -> bool:
+        with self._lock:
+            item = self._alive(name)
+            return item is not None and item[0] == token
+
+    def release(self, name: str, token: str) -> None:
+        with self._lock:
+            item = self._items.get(name)
+            if item and item[0] == token:
+                self._items.pop(name, None)
+
+    def get(self, name: str) -> Optional[dict]:
+        with self._lock:
+            item = self._alive(name)
+            return dict(item[1]) if item else None
+
+
+class _RedisLockBackend:
+    """Redis 实现：SET NX PX 获取租约，Lua 脚本校验 token 后续约/释放；Redis 异常时降级到 fallback。"""
+
+    def __init__(self, client, *, fallback: _InMemoryLockBackend | None = None) -> None:
+        self._redis = client
+        self._fallback = fallback or _InMemoryLockBackend()
+        self._renew_script = client.register_script(_RENEW_LUA)
+        self._release_script = client.register_script(_RELEASE_LUA)
+
+    @staticmethod
+    def _key(name: str) -> str:
+        return redis_key("run_lock", name)
+
+    def acquire(self, name: str, token: str, info: dict, ttl_ms: int) -> Optional[dict]:
+        try:
+            payload = json.dumps({"token": token, "info": info}, ensure_ascii=False)
+            if self._redis.set(self._key(name), payload, nx=True, px=ttl_ms):
+                return None
+            current = self.get(name)
+            # 中文说明：SET 失败后锁恰好过期（GET 为空）时，按“已被占用”处理，由调用方稍后重试
+            return current if current is not None else {}
+        except Exception:
+            return self._fallback.acquire(name, token, info, ttl_ms)
+
+    def renew(self, name: str, token: str, ttl_ms: int) -> bool:
+        """续约成功返回 True，确认已失去租约返回 False；Redis 暂时性错误原样抛出，由心跳重试。"""
+        try:
+            return bool(int(self._renew_script(keys=[self._key(name)], args=[token, ttl_ms]) or 0))
+        except Exception:
+            # 中文说明：只有获取时就降级到进程内的租约才由 fallback 续约；Redis 中的租约不能据 fallback 判定丢失
+            if self._fallback.owns(name, token):
+                return self._fallback.renew(name, token, ttl_ms)
+            raise
+
+    def release(self, name: str, token: str) -> None:
+        try:
+            self._release_script(keys=[self._key(name)], args=[token])
+        except Exception:
+            self._fallback.release(name, token)
+
+    def get(self, name: str) -> Optional[dict]:
+        try:
+            raw = self._redis.get(self._key(name))
+        except Exception:
+            return self._fallback.get(name)
+        if not raw:
+            return None
+        try:
+            data = json.loads(raw)
+        except Exception:
+            return {}
+        info = data.get("info") if isinstance(data, dict) else None
+        return dict(info) if isinstance(info, dict) else {}
+
+
+_BACKEND = None
+_BACKEND_LOCK = threading.Lock()
+# 中文说明：run_id -> (锁名称, 租约丢失标记)，运行结束后移除
+_LOST: dict[str, tuple[str, threading.Event]] = {}
+
+
+def _get_backend():
+    global _BACKEND
+    if _BACKEND is not None:
+        return _BACKEND
+    with _BACKEND_LOCK:
+        if _BACKEND is None:
+            client = get_redis()
+            _BACKEND = _RedisLockBackend(client) if client is not None else _InMemoryLockBackend()
+    return _BACKEND
+
+
+def get_run_info(name: str) -> Optional[dict]:
+    """返回正在进行的运行信息；没有运行中的租约时返回 None。"""
+    return _get_backend().get(name)
+
+
+def ensure_lease(run: Optional[dict]) -> None:
+    """run 为 run_lease 返回的运行信息；其租约已丢失时抛出 RunLeaseLost（提交结果前调用）。"""
+    if not run:
+        return
+    entry = _LOST.get(str(run.get("run_id") or ""))
+    if entry is not None and entry[1].is_set():
+        raise RunLeaseLost(entry[0])
+
+
+@contextmanager
+def run_lease(name: str, *, info: Optional[dict] = None, ttl_seconds: Optional[int] = None) -> Iterator[dict]:
+    """在租约锁内执行；已被占用时抛出 RunInProgress（携带正在进行的运行信息）。
+
+    用法：
+        with run_lease(f"datasource:{ds.id}", info={"source": "schedule"}) as run:
+            ...
+
+    - ttl_seconds：租约时长，心跳每 ttl/3 续约一次；默认 RUN_LOCK_TTL_SECONDS
+    - 返回的 run 为写入锁中的运行信息（含 run_id / started_at / host / pid）
+    - 续约失败（租约丢失）不会打断执行，执行方在提交结果前用 ensure_lease(run) 检查
+    """
+
+    ttl = int(ttl_seconds or getattr(get_settings(), "RUN_LOCK_TTL_SECONDS", 120) or 120)
+    ttl_ms = max(1000, ttl * 1000)
+    token = uuid.uuid4().hex
+    run = {
+        "run_id": uuid.uuid4().hex[:12],
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "host": socket.gethostname(),
+        "pid": os.getpid(),
+        **(info or {}),
+    }
+
+    backend = _get_backend()
+    current = backend.acquire(name, token, run, ttl_ms)
+    if current is not None:
+        raise RunInProgress(name, current)
+
+    stop = threading.Event()
+    lost = threading.Event()
+    _LOST[run["run_id"]] = (name, lost)
+
+    def _heartbeat() -> None:
+        interval = max(0.5, ttl_ms / 3000.0)
+        retry_interval = max(0.5, interval / 4)
+        # 中文说明：租约到期时间以最近一次成功续约发起前的时刻计算（保守）
+        renewed_at = time.monotonic()
+        wait = interval
+        while not stop.wait(wait):
+            attempt_at = time.monotonic()
+            try:
+                ok = backend.renew(name, token, ttl_ms)
+            except Exception as exc:
+                if attempt_at - renewed_at >= ttl_ms / 1000.0:
+                    lost.set()
+                    logger.warning("[run_lock] %s 续约持续失败，租约已过期：%s", name, exc)
+                    return
+                logger.warning("[run_lock] %s 续约失败，稍后重试：%s", name, exc)
+                wait = retry_interval
+                continue
+            if not ok:
+                lost.set()
+                logger.warning("[run_lock] %s 租约已丢失（已过期或被他人占用）", name)
+                return
+            renewed_at = attempt_at
+            wait = interval
+
+    hb = threading.Thread(target=_heartbeat, name=f"run-lock-{name}", daemon=True)
+    hb.start()
+    try:
+        yield run
+    finally:
+        stop.set()
+        hb.join(timeout=1)
+        _LOST.pop(run["run_id"], None)
+        backend.release(name, token)
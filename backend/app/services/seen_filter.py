@@ -0,0 +1,133 @@
+"""数据源跨运行的“已抓取 URL”布隆过滤器。
+
+中文说明：
+- 链接发现阶段用它在任何网络请求之前跳过以往已入库的子页面；
+- 布隆过滤器只会误判“已见过”（概率由 error_rate 控制），不会漏判；误判的代价是偶尔少抓一篇，
+  需要补抓时可用 force=true 触发（force 时不使用过滤器）；
+- 按数据源持久化到 Redis（一个 hash：m/k/n/bits），容量约 20 万条、误判率 0.1% 时约 350KB；
+- 同一数据源的运行由运行互斥锁串行化，因此整体读出、运行结束时整体写回即可；
+- Redis 不可用或 pytest 下降级为进程内实现。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import math
+import threading
+from typing import Optional
+
+from app.core.config import get_settings
+from app.services.redis_client import get_redis, redis_key
+
+
+logger = logging.getLogger("uvicorn.error")
+
+
+_LOCAL: dict[str, tuple[int, int, int, bytes]] = {}
+_LOCAL_LOCK = threading.Lock()
+
+
+class BloomFilter:
+    """定长位图 + 双重哈希的布隆过滤器。"""
+
+    def __init__(self, capacity: int, error_rate: float, *, bits: Optional[bytes] = None, count: int = 0) -> None:
+        capacity = max(1000, int(capacity))
+        error_rate = min(0.5, max(1e-6, float(error_rate)))
+        self.m = int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.k = max(1, int(round(self.m / capacity * math.log(2))))
+        self.capacity = capacity
+        nbytes = (self.m + 7) // 8
+        self.bits = bytearray(bits) if bits is not None and len(bits) == nbytes else bytearray(nbytes)
+        self.count = int(count) if bits is not None and len(bits) == nbytes else 0
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode("utf-8", "ignore"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.k):
+            yield (h1 + i * h2) % self.m
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[p >> 3] & (1 << (p & 7)) for p in self._positions(item))
+
+    def add(self, item: str) -> bool:
+        """加入元素；返回是否为新元素（按过滤器判断）。"""
+        added = False
+        for p in self._positions(item):
+            mask = 1 << (p & 7)
+            if not self.bits[p >> 3] & mask:
+                self.bits[p >> 3] |= mask
+                added = True
+        if added:
+            self.count += 1
+        return added
+
+
+class SeenUrlFilter:
+    """单个数据源的已抓取 URL 过滤器（加载/判断/写回）。"""
+
+    def __init__(self, datasource_id: int, cfg: Optional[dict] = None) -> None:
+        settings = get_settings()
+        c = cfg.get("seen_filter") if isinstance(cfg, dict) else None
+        c = c if isinstance(c, dict) else {}
+        self.enabled = bool(c.get("enabled", True))
+        capacity = int(c.get("capacity") or getattr(settings, "CRAWL_SEEN_FILTER_CAPACITY", 200000) or 200000)
+        error_rate = float(c.get("error_rate") or getattr(settings, "CRAWL_SEEN_FILTER_ERROR_RATE", 0.001) or 0.001)
+        self.datasource_id = int(datasource_id)
+        self._key = redis_key("seen_filter", "datasource", self.datasource_id)
+        self._dirty = False
+        self.bloom = self._load(capacity, error_rate) if self.enabled else None
+
+    def _load(self, capacity: int, error_rate: float) -> BloomFilter:
+        empty = BloomFilter(capacity, error_rate)
+        stored: Optional[tuple[int, int, int, bytes]] = None
+        client = get_redis(decode_responses=False)
+        if client is not None:
+            try:
+                data = client.hgetall(self._key)
+                if data:
+                    stored = (int(data[b"m"]), int(data[b"k"]), int(data[b"n"]), bytes(data[b"bits"]))
+            except Exception:
+                client = None
+        if client is None:
+            with _LOCAL_LOCK:
+                stored = _LOCAL.get(self._key)
+        if not stored:
+            return empty
+        m, k, n, bits = stored
+        if m != empty.m or k != empty.k:
+            # 中文说明：容量/误判率配置变化后位图不兼容，重新开始积累
+            logger.info("[seen_filter] ds=%s 过滤器参数变化，重建", self.datasource_id)
+            return empty
+        return BloomFilter(capacity, error_rate, bits=bits, count=n)
+
+    def __contains__(self, url: str) -> bool:
+        return self.bloom is not None and url in self.bloom
+
+    def add(self, url: str) -> None:
+        if self.bloom is not None and url and self.bloom.add(url):
+            self._dirty = True
+
+    def save(self) -> None:
+        if self.bloom is None or not self._dirty:
+            return
+        b = self.bloom
+        if b.count > b.capacity:
+            logger.warning(
+                "[seen_filter] ds=%s 已记录 %s 条，超过容量 %s，误判率会上升；可调大 seen_filter.capacity",
+                self.datasource_id,
+                b.count,
+                b.capacity,
+            )
+        client = get_redis(decode_responses=False)
+        if client is not None:
+            try:
+                client.hset(self._key, mapping={"m": b.m, "k": b.k, "n": b.count, "bits": bytes(b.bits)})
+                self._dirty = False
+                return
+            except Exception:
+                pass
+        with _LOCAL_LOCK:
+            _LOCAL[self._key] = (b.m, b.k, b.count, bytes(b.bits))
+        self._dirty = False
@@ -0,0 +1,176 @@
+"""首页统计计数器。
+
+中文说明：
+- 原 /dashboard/stats 每次加载都对 articles / data_source_contents 做 5 次 COUNT(*)，其中“今日抓取”需扫描整表；
+- 这里按 (指标, 用户, 时间桶) 维护计数：写入文章/抓取记录时在同一事务内累加（session after_flush 汇总后批量 upsert），
+  删除时扣减，读取为按唯一键的 O(1) 查询；
+- 绕过 ORM 的批量删除（如删除数据源时清理抓取记录）不会触发扣减，由定时任务 reconcile_counters 周期性按真实表重算校准；
+- 计数表尚未按真实表校准过（首次升级，历史数据不在增量里）时，读取方会先做一次校准。
+"""
+
+from __future__ import annotations
+
+import logging
+from collections import Counter
+from datetime import date, datetime, time, timedelta
+from typing import Optional
+
+from sqlalchemy import event, func, update
+from sqlalchemy.orm import Session
+
+from app.db.upsert import build_upsert
+from app.models.article import Article
+from app.models.datasource_content import DataSourceContent
+from app.models.stat_counter import StatCounter
+
+
+logger = logging.getLogger("uvicorn.error")
+
+METRIC_ARTICLES = "articles"
+METRIC_CRAWL_RECORDS = "crawl_records"
+TOTAL_BUCKET = "total"
+GLOBAL_SCOPE = 0
+# 中文说明：校准标记行（scope=-1，value 为最近一次校准的时间戳）；没有标记说明计数表尚未按真实表初始化
+_RECONCILED_SCOPE = -1
+
+# 中文说明：指标 -> (模型, 用户列, 时间列)
+_TRACKED = {
+    Article: (METRIC_ARTICLES, "user_id", "created_at"),
+    DataSourceContent: (METRIC_CRAWL_RECORDS, "user_id", "fetched_at"),
+}
+_METRIC_SOURCES = {
+    METRIC_ARTICLES: (Article, Article.user_id, Article.created_at),
+    METRIC_CRAWL_RECORDS: (DataSourceContent, DataSourceContent.user_id, DataSourceContent.fetched_at),
+}
+
+# 日桶保留天数：校准时清理更早的日桶
+_DAY_BUCKET_RETENTION_DAYS = 60
+
+
+def _day_bucket(d: date) -> str:
+    return d.isoformat()
+
+
+def _keys_for(metric: str, user_id: Optional[int], ts: Optional[datetime]) -> list[tuple[str, int, str]]:
+    day = _day_bucket((ts or datetime.now()).date())
+    scopes = [GLOBAL_SCOPE] + ([int(user_id)] if user_id else [])
+    return [(metric, scope, bucket) for scope in scopes for bucket in (TOTAL_BUCKET, day)]
+
+
+def apply_deltas(session: Session, deltas: Counter) -> None:
+    """把计数增量批量 upsert 到 stat_counters（与调用方同一事务）。"""
+    rows = [
+        {"metric": m, "scope_user_id": s, "bucket": b, "value": v, "updated_at": datetime.now()}
+        for (m, s, b), v in deltas.items()
+        if v
+    ]
+    if not rows:
+        return
+    conn = session.connection()
+    stmt = build_upsert(
+        conn.dialect,
+        StatCounter.__table__,
+        rows,
+        index_elements=["metric", "scope_user_id", "bucket"],
+        set_fn=lambda new: {"value": StatCounter.__table__.c.value + new.value, "updated_at": new.updated_at},
+    )
+    conn.execute(stmt)
+
+
+@event.listens_for(Session, "after_flush")
+def _count_on_flush(session: Session, flush_context) -> None:
+    deltas: Counter = Counter()
+    for objs, sign in ((session.new, 1), (session.deleted, -1)):
+        for obj in objs:
+            spec = _TRACKED.get(type(obj))
+            if spec is None:
+                continue
+            metric, user_attr, ts_attr = spec
+            for key in _keys_for(metric, getattr(obj, user_attr, None), getattr(obj, ts_attr, None)):
+                deltas[key] += sign
+    if deltas:
+        apply_deltas(session, deltas)
+
+
+def _read(db: Session, metric: str, scope: int, buckets: list[str]) -> dict[str, int]:
+    rows = (
+        db.query(StatCounter.bucket, StatCounter.value)
+        .filter(StatCounter.metric == metric, StatCounter.scope_user_id == scope, StatCounter.bucket.in_(buckets))
+        .all()
+    )
+    return {b: int(v or 0) for b, v in rows}
+
+
+def get_counts(db: Session, metric: str, user_id: Optional[int] = None, day: Optional[date] = None) -> tuple[int, int]:
+    """返回 (总数, 当日数)；user_id 为 None 表示全局。"""
+    scope = int(user_id) if user_id else GLOBAL_SCOPE
+    today = _day_bucket(day or date.today())
+    values = _read(db, metric, scope, [TOTAL_BUCKET, today])
+    if not _read(db, metric, _RECONCILED_SCOPE, [TOTAL_BUCKET]):
+        # 中文说明：计数表尚未初始化（首次升级时已有历史数据，增量只覆盖升级后的写入），先按真实表校准一次
+        reconcile_counters(db, metrics=[metric])
+        db.commit()
+        values = _read(db, metric, scope, [TOTAL_BUCKET, today])
+    return values.get(TOTAL_BUCKET, 0), values.get(today, 0)
+
+
+def _set_absolute(db: Session, metric: str, bucket: str, counts: dict[int, int]) -> None:
+    db.execute(
+        update(StatCounter)
+        .where(StatCounter.metric == metric, StatCounter.bucket == bucket)
+        .values(value=0, updated_at=datetime.now())
+    )
+    rows = [
+        {"metric": metric, "scope_user_id": scope, "bucket": bucket, "value": int(v), "updated_at": datetime.now()}
+        for scope, v in counts.items()
+    ]
+    if not rows:
+        return
+    conn = db.connection()
+    conn.execute(
+        build_upsert(
+            conn.dialect,
+            StatCounter.__table__,
+            rows,
+            index_elements=["metric", "scope_user_id", "bucket"],
+            set_fn=lambda new: {"value": new.value, "updated_at": new.updated_at},
+        )
+    )
+
+
+def _grouped_counts(db: Session, metric: str, start: Optional[datetime], end: Optional[datetime]) -> dict[int, int]:
+    model, user_col, ts_col = _METRIC_SOURCES[metric]
+    q = db.query(user_col, func.count(model.id))
+    if start is not None:
+        q = q.filter(ts_col >= start)
+    if end is not None:
+        q = q.filter(ts_col < end)
+    counts: dict[int, int] = {}
+    total = 0
+    for uid, n in q.group_by(user_col).all():
+        total += int(n or 0)
+        if uid:
+            counts[int(uid)] = int(n or 0)
+    counts[GLOBAL_SCOPE] = total
+    return counts
+
+
+def reconcile_counters(db: Session, *, metrics: Optional[list[str]] = None, days: int = 2) -> dict:
+    """按真实表重算总数与最近 days 天的日桶（覆盖写），并清理过期日桶；调用方负责提交。"""
+    today = date.today()
+    result: dict[str, dict] = {}
+    for metric in metrics or list(_METRIC_SOURCES.keys()):
+        totals = _grouped_counts(db, metric, None, None)
+        for offset in range(days):
+            d = today - timedelta(days=offset)
+            start = datetime.combine(d, time.min)
+            _set_absolute(db, metric, _day_bucket(d), _grouped_counts(db, metric, start, start + timedelta(days=1)))
+        _set_absolute(db, metric, TOTAL_BUCKET, {**totals, _RECONCILED_SCOPE: int(datetime.now().timestamp())})
+        result[metric] = {"total": totals.get(GLOBAL_SCOPE, 0)}
+
+    cutoff = _day_bucket(today - timedelta(days=_DAY_BUCKET_RETENTION_DAYS))
+    db.query(StatCounter).filter(StatCounter.bucket != TOTAL_BUCKET, StatCounter.bucket < cutoff).delete(
+        synchronize_session=False
+    )
+    logger.info("[stat_counters] 已校准 %s", result)
+    return result
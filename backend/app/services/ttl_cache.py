@@ -0,0 +1,112 @@
+"""短 TTL 的 JSON 结果缓存（Redis 优先，进程内兜底）。
+
+中文说明：
+- 用于列表总数、统计数字等“允许短暂不精确”的读多写少结果，避免每次请求都回源数据库；
+- 值按 JSON 序列化存储，调用方只放可 JSON 化的简单结构；
+- Redis 不可用或 pytest 下降级为进程内字典（带过期时间、条数上限与总字符数上限；
+  单条超过总上限 1/8 的值不进本地缓存，避免页面 HTML 之类的大值把进程内存撑满）；
+- 与其它模块一致，Redis 异常一律降级，不影响主流程。
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+import time
+from typing import Any, Optional
+
+from app.services.redis_client import get_redis, redis_key
+
+
+_LOCAL: dict[str, tuple[str, float]] = {}
+_LOCAL_LOCK = threading.Lock()
+_LOCAL_MAX_ITEMS = 2048
+# 中文说明：进程内兜底缓存的总字符数上限（约数十 MB），以及单条上限
+_LOCAL_MAX_CHARS = 16_000_000
+_LOCAL_MAX_ENTRY_CHARS = _LOCAL_MAX_CHARS // 8
+_local_chars = 0
+
+
+def cache_key(*parts: object) -> str:
+    return redis_key("cache", *parts)
+
+
+def _local_pop(key: str) -> None:
+    """调用方需持有 _LOCAL_LOCK。"""
+    global _local_chars
+    item = _LOCAL.pop(key, None)
+    if item:
+        _local_chars -= len(item[0])
+
+
+def _local_get(key: str) -> Optional[str]:
+    with _LOCAL_LOCK:
+        item = _LOCAL.get(key)
+        if not item:
+            return None
+        if item[1] <= time.time():
+            _local_pop(key)
+            return None
+        return item[0]
+
+
+def _local_set(key: str, raw: str, ttl_seconds: int) -> None:
+    global _local_chars
+    now = time.time()
+    with _LOCAL_LOCK:
+        _local_pop(key)
+        if len(raw) > _LOCAL_MAX_ENTRY_CHARS:
+            return
+        if len(_LOCAL) >= _LOCAL_MAX_ITEMS or _local_chars + len(raw) > _LOCAL_MAX_CHARS:
+            for k in [k for k, (_, exp) in _LOCAL.items() if exp <= now]:
+                _local_pop(k)
+            while _LOCAL and (len(_LOCAL) >= _LOCAL_MAX_ITEMS or _local_chars + len(raw) > _LOCAL_MAX_CHARS):
+                _local_pop(next(iter(_LOCAL)))
+        _LOCAL[key] = (raw, now + ttl_seconds)
+        _local_chars += len(raw)
+
+
+def cache_get_json(key: str) -> Any:
+    """读取缓存；未命中/已过期/解析失败返回 None。"""
+    raw: Optional[str] = None
+    client = get_redis()
+    if client is not None:
+        try:
+            raw = client.get(key)
+        except Exception:
+            client = None
+    if client is None:
+        raw = _local_get(key)
+    if not raw:
+        return None
+    try:
+        return json.loads(raw)
+    except Exception:
+        return None
+
+
+def cache_set_json(key: str, value: Any, ttl_seconds: int) -> None:
+    ttl_seconds = max(1, int(ttl_seconds))
+    raw = json.dumps(value, ensure_ascii=False, default=str)
+    client = get_redis()
+    if client is not None:
+        try:
+            client.set(key, raw, ex=ttl_seconds)
+            return
+        except Exception:
+            pass
+    _local_set(key, raw, ttl_seconds)
+
+
+def cache_delete(*keys: str) -> None:
+    if not keys:
+        return
+    client = get_redis()
+    if client is not None:
+        try:
+            client.delete(*keys)
+        except Exception:
+            pass
+    with _LOCAL_LOCK:
+        for k in keys:
+            _local_pop(k)
@@ -0,0 +1,136 @@
+"""URL 规范化。
+
+中文说明：
+- 同一篇文章常以多种 URL 形式出现：追踪参数（utm_*、spm 等）、#锚点、末尾斜杠、主机名大小写、参数顺序不同；
+- 链接发现/判重前统一做规范化，避免对同一页面重复抓取与重复入库；
+- 数据源可通过 config.canonical 调整规则：
+  {
+    "strip_params": ["from", "share_*"],   # 额外剔除的参数（支持前缀通配 *）
+    "keep_params": ["spm"],                # 即使命中默认剔除规则也保留的参数
+    "strip_trailing_slash": true,          # 去掉路径末尾斜杠（根路径除外），默认 true
+    "lowercase_path": false                # 路径是否转小写（仅大小写不敏感的站点开启），默认 false
+  }
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Callable, Iterable, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+
+# 中文说明：默认剔除的追踪/来源参数（前缀通配用 *）
+DEFAULT_STRIP_PARAMS: tuple[str, ...] = (
+    "utm_*",
+    "spm",
+    "spm_id_from",
+    "scm",
+    "fbclid",
+    "gclid",
+    "msclkid",
+    "yclid",
+    "mc_cid",
+    "mc_eid",
+    "_hsenc",
+    "_hsmkt",
+    "share_token",
+    "share_source",
+    "share_medium",
+    "wfr",
+    "isappinstalled",
+)
+
+_DEFAULT_PORTS = {"http": "80", "https": "443"}
+_MULTI_SLASH_RE = re.compile(r"/{2,}")
+
+
+def _param_matcher(patterns: Iterable[str]) -> Callable[[str], bool]:
+    exact: set[str] = set()
+    prefixes: list[str] = []
+    for p in patterns:
+        name = str(p or "").strip().lower()
+        if not name:
+            continue
+        if name.endswith("*"):
+            prefixes.append(name[:-1])
+        else:
+            exact.add(name)
+
+    def _match(key: str) -> bool:
+        k = key.lower()
+        return k in exact or any(k.startswith(pre) for pre in prefixes)
+
+    return _match
+
+
+def canonicalize_url(
+    url: str,
+    *,
+    strip_params: Optional[Iterable[str]] = None,
+    keep_params: Optional[Iterable[str]] = None,
+    strip_trailing_slash: bool = True,
+    lowercase_path: bool = False,
+) -> str:
+    """返回 URL 的规范形式；无法解析时原样返回。"""
+    raw = (url or "").strip()
+    if not raw:
+        return raw
+    try:
+        parts = urlsplit(raw)
+    except ValueError:
+        return raw
+    scheme = (parts.scheme or "").lower()
+    if scheme not in {"http", "https"}:
+        return raw
+
+    host = (parts.hostname or "").lower().rstrip(".")
+    netloc = host
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    if port is not None and str(port) != _DEFAULT_PORTS.get(scheme):
+        netloc = f"{host}:{port}"
+    if parts.username:
+        auth = parts.username + (f":{parts.password}" if parts.password else "")
+        netloc = f"{auth}@{netloc}"
+
+    path = _MULTI_SLASH_RE.sub("/", parts.path or "/")
+    if lowercase_path:
+        path = path.lower()
+    if strip_trailing_slash and len(path) > 1 and path.endswith("/"):
+        path = path.rstrip("/") or "/"
+
+    should_strip = _param_matcher(list(DEFAULT_STRIP_PARAMS) + list(strip_params or []))
+    should_keep = _param_matcher(keep_params or [])
+    query_items = [
+        (k, v)
+        for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if should_keep(k) or not should_strip(k)
+    ]
+    query = urlencode(sorted(query_items), doseq=True)
+
+    # 中文说明：#锚点只影响页面内定位，统一丢弃（hash 路由站点的 #! 例外）
+    fragment = parts.fragment if parts.fragment.startswith("!") else ""
+    return urlunsplit((scheme, netloc, path, query, fragment))
+
+
+def canonicalizer_from_config(cfg: Optional[dict]) -> Callable[[str], str]:
+    """根据数据源 config.canonical 构建规范化函数。"""
+    c = cfg.get("canonical") if isinstance(cfg, dict) else None
+    c = c if isinstance(c, dict) else {}
+    strip = c.get("strip_params") if isinstance(c.get("strip_params"), list) else []
+    keep = c.get("keep_params") if isinstance(c.get("keep_params"), list) else []
+    strip_slash = bool(c.get("strip_trailing_slash", True))
+    lower_path = bool(c.get("lowercase_path", False))
+
+    def _canon(url: str) -> str:
+        return canonicalize_url(
+            url,
+            strip_params=strip,
+            keep_params=keep,
+            strip_trailing_slash=strip_slash,
+            lowercase_path=lower_path,
+        )
+
+    return _canon
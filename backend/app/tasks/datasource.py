@@ -5,7 +5,9 @@ from datetime import datetime, timedelta
 from celery import shared_task
 from sqlalchemy.orm import Session
 
-from app.services.datasource_service import DataSourceService
+from app.core.config import get_settings
+from app.services.datasource_service import DataSourceService, get_datasource_running
+from app.services.run_lock import RunInProgress
 from app.db.session import SessionLocal
 from app.models.datasource import DataSource
 
@@ -25,17 +27,29 @@ def _compute_next_run(cron_expr: str | None, start_dt: datetime) -> datetime | N
         return None
 
 
-@shared_task(name="app.tasks.datasource.trigger_datasource_task")
+@shared_task(
+    name="app.tasks.datasource.trigger_datasource_task",
+    acks_late=True,
+    reject_on_worker_lost=True,
+)
 def trigger_datasource_task(ds_id: int, force: bool = False) -> dict:
-    """异步任务：触发单个数据源抓取（供手动/调度调用）。"""
+    """异步任务：触发单个数据源抓取（供手动/调度调用）。
+
+    中文说明：任务执行完才确认（acks_late）；worker 崩溃时任务会被重新投递，
+    重投后的运行从抓取队列检查点继续（见 crawl_frontier）。
+    """
     db: Session = SessionLocal()
     try:
         ds = db.query(DataSource).filter(DataSource.id == ds_id).first()
         if not ds:
             return {"status": "not_found", "id": ds_id}
         service = DataSourceService(db)
-        service.run_datasource(ds, force=force, current_user=None)
+        service.run_datasource(ds, force=force, current_user=None, source="task")
         return {"status": "ok", "id": ds_id}
+    except RunInProgress as exc:
+        # 中文说明：同一数据源已有运行（手动触发/上一轮调度/任务重试），不重复抓取，只报告正在进行的运行
+        db.rollback()
+        return {"status": "in_progress", "id": ds_id, "run": exc.info}
     except Exception as exc:
         db.rollback()
         return {"status": "error", "id": ds_id, "error": str(exc)}
@@ -43,12 +57,58 @@ def trigger_datasource_task(ds_id: int, force: bool = False) -> dict:
         db.close()
 
 
+def _task_route_options(cfg: dict | None) -> dict:
+    """单个数据源的投递参数：队列/优先级可在数据源 config.queue / config.priority 中覆盖。"""
+    settings = get_settings()
+    cfg = cfg if isinstance(cfg, dict) else {}
+    queue = str(cfg.get("queue") or "").strip() or settings.DATASOURCE_TASK_QUEUE
+    try:
+        priority = int(cfg.get("priority")) if cfg.get("priority") is not None else settings.DATASOURCE_TASK_PRIORITY
+    except (TypeError, ValueError):
+        priority = settings.DATASOURCE_TASK_PRIORITY
+    return {"queue": queue, "priority": max(0, min(9, priority))}
+
+
+def _backfill_next_run_at(db: Session, now: datetime) -> int:
+    """为启用定时但 next_run_at 为空的数据源补算下次时间（历史数据/外部直接改库的兜底）。"""
+    rows = (
+        db.query(DataSource.id, DataSource.schedule_cron, DataSource.last_run_at)
+        .filter(DataSource.enable_schedule.is_(True))
+        .filter(DataSource.next_run_at.is_(None))
+        .filter(DataSource.schedule_cron.isnot(None))
+        .filter(DataSource.schedule_cron != "")
+        .all()
+    )
+    updated = 0
+    for ds_id, cron_str, last_run_at in rows:
+        # 中文说明：先校验 cron（无效表达式返回 None，跳过，不能让它立即到期）；
+        # 从未运行过的数据源立即到期，运行过的按上次运行时间推算
+        next_run = _compute_next_run(str(cron_str).strip(), last_run_at or now)
+        if next_run is None:
+            continue
+        if not last_run_at:
+            next_run = now
+        db.query(DataSource).filter(DataSource.id == ds_id, DataSource.next_run_at.is_(None)).update(
+            {DataSource.next_run_at: next_run}, synchronize_session=False
+        )
+        updated += 1
+    if updated:
+        db.commit()
+    return updated
+
+
 @shared_task(name="app.tasks.datasource.scan_and_trigger_datasources")
 def scan_and_trigger_datasources() -> dict:
     """
     每分钟扫描启用定时的数据源：
-    - 满足 enable_schedule 且 schedule_cron 不为空
-    - 当 next_run_at 到期（<= now）或未设置 next_run_at 时，触发抓取
+    - 只查询 enable_schedule 且 next_run_at <= now 的数据源（走 ix_data_sources_schedule_due 索引）
+    - 对到期数据源投递 trigger_datasource_task
+
+    中文说明：
+    - next_run_at 在新建/修改/每次运行后都会维护，扫描不再加载全部数据源、也不逐个计算 cron；
+    - 扫描只投影需要的列，不加载 config（含 _last_trigger 报告）；投递参数只为到期的数据源读取 config；
+    - 入队前用条件更新（next_run_at 仍为旧值）把 next_run_at 推进到下一个时间点，
+      既避免抓取尚未结束时重复投递，也避免多个 beat 实例同时扫描时重复认领。
     """
     import logging
     logger = logging.getLogger(__name__)
@@ -59,65 +119,70 @@ def scan_and_trigger_datasources() -> dict:
     skipped: list[dict] = []
     errors: list[dict] = []
     total_scanned = 0
-    skipped_not_due = 0
+    backfilled = 0
     
     try:
-        # 过滤掉空 cron 或未启用的
-        ds_list = (
-            db.query(DataSource)
+        backfilled = _backfill_next_run_at(db, now)
+
+        due_rows = (
+            db.query(DataSource.id, DataSource.name, DataSource.schedule_cron, DataSource.next_run_at)
             .filter(DataSource.enable_schedule.is_(True))
-            .filter(DataSource.schedule_cron.isnot(None))
-            .filter(DataSource.schedule_cron != "")
+            .filter(DataSource.next_run_at.isnot(None))
+            .filter(DataSource.next_run_at <= now)
+            .order_by(DataSource.next_run_at.asc())
             .all()
         )
-        total_scanned = len(ds_list)
+        total_scanned = len(due_rows)
         
-        service = DataSourceService(db)
-        for ds in ds_list:
+        for ds_id, name, cron_expr, due_at in due_rows:
             try:
-                # 再次校验 cron 字符串有效性
-                cron_str = str(ds.schedule_cron).strip()
+                cron_str = str(cron_expr or "").strip()
                 if not cron_str:
-                    skipped.append({"id": ds.id, "name": ds.name, "reason": "empty_cron"})
+                    db.query(DataSource).filter(DataSource.id == ds_id).update(
+                        {DataSource.next_run_at: None}, synchronize_session=False
+                    )
+                    db.commit()
+                    skipped.append({"id": ds_id, "name": name, "reason": "empty_cron"})
                     continue
-                
-                # 如果未预先计算 next_run_at，则用 last_run_at（或当前）推算
-                base_dt = ds.next_run_at or ds.last_run_at or now
-                next_run = ds.next_run_at or _compute_next_run(cron_str, base_dt)
-                
-                if not next_run:
-                    skipped.append({"id": ds.id, "name": ds.name, "reason": "next_run_none"})
+
+                running = get_datasource_running(ds_id)
+                if running is not None:
+                    skipped.append({"id": ds_id, "name": name, "reason": "in_progress", "run": running})
                     continue
-                
-                if next_run > now:
-                    skipped_not_due += 1
-                    skipped.append(
-                        {
-                            "id": ds.id,
-                            "name": ds.name,
-                            "reason": "not_due",
-                            "next_run_at": next_run.isoformat(),
-                        }
-                    )
+
+                # 先占住本轮：next_run_at 推进到下一个时间点（任务执行完成后 run_datasource 会再按完成时间重算）
+                claimed = (
+                    db.query(DataSource)
+                    .filter(DataSource.id == ds_id, DataSource.next_run_at == due_at)
+                    .update({DataSource.next_run_at: _compute_next_run(cron_str, now)}, synchronize_session=False)
+                )
+                db.commit()
+                if not claimed:
+                    skipped.append({"id": ds_id, "name": name, "reason": "claimed_by_other"})
                     continue
-                
-                logger.info(f"[Scheduler] Triggering datasource {ds.id} ({ds.name}), due at {next_run}")
-                service.run_datasource(ds, force=False, current_user=None)
-                triggered.append(ds.id)
+
+                cfg = db.query(DataSource.config).filter(DataSource.id == ds_id).scalar()
+                options = _task_route_options(cfg)
+                logger.info(
+                    f"[Scheduler] Enqueue datasource {ds_id} ({name}), due at {due_at}, "
+                    f"queue={options['queue']} priority={options['priority']}"
+                )
+                trigger_datasource_task.apply_async(args=[ds_id], kwargs={"force": False}, **options)
+                triggered.append(ds_id)
             except Exception as exc:
                 db.rollback()
-                logger.error(f"[Scheduler] Error triggering datasource {ds.id}: {str(exc)}")
-                errors.append({"id": ds.id, "name": ds.name, "error": str(exc)})
+                logger.error(f"[Scheduler] Error enqueueing datasource {ds_id}: {str(exc)}")
+                errors.append({"id": ds_id, "name": name, "error": str(exc)})
     finally:
         db.close()
     
     result = {
         "scanned": total_scanned,
+        "backfilled": backfilled,
         "triggered": triggered,
-        "skipped_not_due": skipped_not_due,
         "skipped": skipped,
         "errors": errors,
         "timestamp": now.isoformat()
     }
-    logger.info(f"[Scheduler] Scan complete: {len(triggered)} triggered, {skipped_not_due} skipped, {len(errors)} errors.")
+    logger.info(f"[Scheduler] Scan complete: {len(triggered)} enqueued, {len(skipped)} skipped, {len(errors)} errors.")
     return result
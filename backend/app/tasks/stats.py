@@ -0,0 +1,24 @@
+from __future__ import annotations
+
+from datetime import datetime
+
+from celery import shared_task
+
+from app.db.session import SessionLocal
+from app.services.stat_counters import reconcile_counters
+
+
+@shared_task(name="app.tasks.stats.reconcile_stat_counters_task")
+def reconcile_stat_counters_task() -> dict:
+    """Celery 任务：按真实表校准首页统计计数（修正批量删除等绕过增量维护的偏差）。"""
+
+    db = SessionLocal()
+    try:
+        result = reconcile_counters(db)
+        db.commit()
+        return {"status": "ok", "metrics": result, "timestamp": datetime.now().isoformat()}
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
@@ -25,7 +25,7 @@ Write-Host "Starting celery worker ..."
 Start-Process -WorkingDirectory $backend -FilePath "powershell" -ArgumentList @(
   "-NoExit",
   "-Command",
-  "python -m celery -A app.celery_app.celery_app worker -l info -P solo"
+  "python -m celery -A app.celery_app.celery_app worker -l info -P solo -Q default,datasource"
 )
 
 if ($Beat) {
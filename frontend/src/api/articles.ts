@@ -3,6 +3,7 @@ import type {
   Article,
   ArticleAiEditRequest,
   ArticleAiEditResponse,
+  ArticleListResponse,
   ArticleUpdate,
   DeleteResponse,
   GenerationRequest,
@@ -13,8 +14,19 @@ import type {
 export const generateArticle = (payload: GenerationRequest) =>
   http.post<Article>("/generate/article", payload).then((r) => r.data);
 
-export const listArticles = () =>
-  http.get<Article[]>("/generate/articles").then((r) => r.data);
+export interface ArticleListParams {
+  keyword?: string;
+  provider?: string;
+  material_pack_id?: number;
+  start_date?: string;
+  end_date?: string;
+  limit?: number;
+  offset?: number;
+  cursor?: string;
+}
+
+export const listArticles = (params: ArticleListParams = {}) =>
+  http.get<ArticleListResponse>("/generate/articles", { params }).then((r) => r.data);
 
 export const getArticle = (id: number) =>
   http.get<Article>(`/generate/articles/${id}`).then((r) => r.data);
@@ -7,6 +7,7 @@ export interface CrawlRecordListParams {
   end_date?: string;
   limit?: number;
   offset?: number;
+  cursor?: string;
 }
 
 export const listCrawlRecords = (params: CrawlRecordListParams) =>
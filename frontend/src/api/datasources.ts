@@ -1,5 +1,5 @@
 import http from "./http";
-import type { DataSource } from "@/types";
+import type { DataSource, DataSourceRun } from "@/types";
 
 export interface CreateDataSourcePayload {
   name: string;
@@ -26,3 +26,6 @@ export const deleteDataSource = (id: number) =>
 
 export const triggerDataSource = (id: number, force: boolean = false) =>
   http.post<DataSource>(`/datasources/${id}/trigger`, null, { params: { force } }).then((r) => r.data);
+
+export const listDataSourceRuns = (id: number, limit: number = 20) =>
+  http.get<DataSourceRun[]>(`/datasources/${id}/runs`, { params: { limit } }).then((r) => r.data);
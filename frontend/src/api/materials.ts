@@ -52,6 +52,7 @@ export const searchMaterialItems = (params?: {
   item_type?: string;
   limit?: number;
   offset?: number;
+  cursor?: string;
 }) =>
   http
     .get<MaterialItemSearchResponse>("/materials/items/search", { params })
@@ -2,8 +2,9 @@ import http from "./http";
 
 /**
  * 获取页面预览 HTML（用于元素选择器）
+ * 后端按 (URL, 引擎) 短时缓存；refresh=true 时忽略缓存重新抓取
  */
-export const getPagePreviewHtml = (params: { url: string; use_playwright?: boolean }) =>
+export const getPagePreviewHtml = (params: { url: string; use_playwright?: boolean; refresh?: boolean }) =>
   http
     .get<string>("/utils/page-preview", {
       params,
@@ -20,6 +21,7 @@ export const discoverLinks = (params: {
   limit?: number;
   use_playwright?: boolean;
   css_selector?: string;
+  refresh?: boolean;
 }) =>
   http
     .get<{ links: string[] }>("/utils/discover-links", {
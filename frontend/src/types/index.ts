@@ -1,3 +1,22 @@
+export interface DataSourceRun {
+  id: number;
+  datasource_id: number;
+  run_id?: string | null;
+  source: string;
+  force: boolean;
+  status: string;
+  started_at: string;
+  finished_at?: string | null;
+  elapsed_ms?: number | null;
+  timings?: Record<string, number> | null;
+  ingested: number;
+  dedup_skipped: number;
+  empty_skipped: number;
+  fetch_failed: number;
+  skipped_details?: Array<Record<string, unknown>> | null;
+  error?: string | null;
+}
+
 export interface DataSource {
   id: number;
   name: string;
@@ -9,6 +28,8 @@ export interface DataSource {
   last_run_at?: string | null;
   next_run_at?: string | null;
   created_at: string;
+  // 仅手动触发接口返回：本次运行报告
+  last_run?: DataSourceRun | null;
 }
 
 export interface ArticleUpdate {
@@ -79,6 +100,27 @@ export interface Article {
   created_at: string;
 }
 
+// 文章列表项：轻量投影（正文等大字段需通过 getArticle 获取）
+export interface ArticleListItem {
+  id: number;
+  title: string;
+  summary?: string | null;
+  llm_provider?: string | null;
+  llm_model?: string | null;
+  material_pack_id?: number | null;
+  material_item_count: number;
+  source_ref_count: number;
+  created_at: string;
+}
+
+export interface ArticleListResponse {
+  total: number;
+  limit: number;
+  offset: number;
+  next_cursor?: string | null;
+  items: ArticleListItem[];
+}
+
 export interface PromptTemplate {
   id: number;
   name?: string | null;
@@ -213,11 +255,18 @@ export interface MaterialItemBatchCreateRequest {
   items: MaterialItemCreate[];
 }
 
+export interface MaterialItemSearchHit extends MaterialItem {
+  score?: number;
+  // 命中片段（后端已 HTML 转义，命中词以 <mark> 包裹）
+  highlight?: string | null;
+}
+
 export interface MaterialItemSearchResponse {
   total: number;
   limit: number;
   offset: number;
-  items: MaterialItem[];
+  next_cursor?: string | null;
+  items: MaterialItemSearchHit[];
 }
 
 export interface DedupeResponse {
@@ -244,6 +293,7 @@ export interface CrawlRecordListResponse {
   total: number;
   limit: number;
   offset: number;
+  next_cursor?: string | null;
   items: CrawlRecord[];
 }
 
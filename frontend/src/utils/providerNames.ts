@@ -14,6 +14,7 @@ export const PROVIDER_CN_MAP: Record<string, string> = {
   kimi: "Kimi",
   baidu: "文心一言",
   wenxin: "文心一言",
+  router: "自动路由",
 };
 
 export const getProviderCn = (p: string) => {
@@ -52,6 +53,7 @@ export const MODEL_PROVIDER_OPTIONS = [
   "kimi",
   "azure_openai",
   "baidu",
+  "router",
 ] as const;
 
 export const API_KEY_PROVIDER_OPTIONS = [
@@ -66,4 +68,5 @@ export const API_KEY_PROVIDER_OPTIONS = [
   "moonshot",
   "kimi",
   "baidu",
+  "router",
 ] as const;